@@ -1,17 +1,31 @@
 from langgraph.graph import StateGraph, START, END
-from langchain_openai import ChatOpenAI
+from langgraph.types import StreamWriter
 from typing_extensions import TypedDict
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel, Field
 from prompts import *
 from tools import *
 from dotenv import load_dotenv
+from llm_cache import configure_llm_cache
+from llm_registry import get_chain, get_llm
+from chunking import chunk_preprocessed_code, merge_suggestions
+from utils import render_code
+from comment_filter import prefilter_comments, get_filter_mode, filter_stats
+from suggestion_stream import stream_suggestions
+from comment_index import diff_comments
+from task_retrieval import get_task_context_index
+from review_state import ReviewState, files_changed_since, get_review_state_store, index_hunks, plan_incremental_review
+from line_index import anchor_suggestions
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
 from os import getenv
+import asyncio
+import time
 
 from rich import print as pp
 
 load_dotenv()
+configure_llm_cache()
 
 
 class Answered(BaseModel):
@@ -27,20 +41,13 @@ class ListSuggestion(BaseModel):
     suggestions: list[Answered] = Field(description="List of suggestions")
 
 
-api_key = getenv("OPENAI_API_KEY")
+# Chains come from the process-wide registry, built once and sharing one pooled HTTP client
+llm = get_llm("gpt-4o-mini")
 
-llm = ChatOpenAI(
-    api_key=api_key,
-    model="gpt-4o-mini"
-)
-
-parser = JsonOutputParser(pydantic_object=ListSuggestion)
-
-create_initial_comments_prompt = PromptTemplate.from_template(prompt_full_code_template)
-filter_comments_prompt = PromptTemplate.from_template(prompt_filter_comments)
-
-filter_comments_chain = filter_comments_prompt | llm | parser
-create_initial_comments_chain = create_initial_comments_prompt | llm | parser
+create_initial_comments_chain, parser = get_chain(prompt_full_code_template, "gpt-4o-mini", ListSuggestion)
+filter_comments_chain, _ = get_chain(prompt_filter_comments, "gpt-4o-mini", ListSuggestion)
+# Same review chain returning the raw completion, parsed incrementally by suggestion_stream
+stream_initial_comments_chain, _ = get_chain(prompt_full_code_template, "gpt-4o-mini", parser="str")
 
 
 class InputState(TypedDict):
@@ -48,6 +55,13 @@ class InputState(TypedDict):
     pull_request_link: str  # link to pull request
     notion_doc_id: str  # page_id for notion doc
     notion_db_id: str  # db_id for notion doc
+    head_sha: str  # optional, incremental reviews only: head commit already known, read from the pull request otherwise
+    fetch_backend: str  # optional, "rest" (default) or "git" to read the diff from a local mirror
+    chunk_tokens: int  # optional, token budget of the code reviewed in one LLM call
+    max_concurrency: int  # optional, number of code batches reviewed at the same time
+    stream_suggestions: bool  # optional, emit every suggestion as soon as it is generated (stream_mode="custom")
+    incremental: bool  # optional, review only hunks changed since the last review of the pull request
+    raw_code: list  # optional, files of the pull request ({"filename", "content"}), skips the GitHub fetch
 
 
 class OutputState(TypedDict):
@@ -61,73 +75,282 @@ class OverallState(TypedDict):
     pull_request_link: str  # link to pull request
     notion_doc_id: str  # page_id for notion doc
     notion_db_id: str  # db_id for notion doc
+    head_sha: str  # optional, incremental reviews only: head commit already known, read from the pull request otherwise
+    fetch_backend: str  # optional, "rest" (default) or "git" to read the diff from a local mirror
+    chunk_tokens: int  # optional, token budget of the code reviewed in one LLM call
+    max_concurrency: int  # optional, number of code batches reviewed at the same time
+    stream_suggestions: bool  # optional, emit every suggestion as soon as it is generated (stream_mode="custom")
+    incremental: bool  # optional, review only hunks changed since the last review of the pull request
 
     raw_code: list  # raw code from pull request
-    preprocessed_code: list  # line assigned code
+    preprocessed_code: list  # line assigned code (code_lines.PreprocessedFile), rendered with utils.render_code for the prompt
+    review_code: list  # incremental reviews only: the preprocessed code restricted to new or changed hunks
+    carried_comments: list  # incremental reviews only: previous comments on unchanged hunks
     initial_comments: list  # comments from the first try
     dropped_comments: list  # deleted engineering or non informative comments
     filtered_comments: list  # final set of comments that model generated
     tech_task_description: List[Document]  # technical task information
 
 
-def get_tech_task_description(state: OverallState) -> OverallState:
-    state['tech_task_description'] = get_notion_docs(database_id=state["notion_db_id"], page_id=state['notion_doc_id'])
-    return state
+# The GitHub and Notion fetches run in parallel branches of the graph, so every node returns only the keys
+# it updates: two branches writing the whole state in the same step would conflict.
+def get_tech_task_description(state: InputState) -> dict:
+    return {'tech_task_description': get_notion_docs(database_id=state["notion_db_id"], page_id=state['notion_doc_id'])}
 
 
-def get_raw_code(state: InputState) -> OverallState:
-    state['raw_code'] = get_pull_request_content(state["pull_request_link"])
-    return state
+def get_raw_code(state: InputState) -> dict:
+    # Code passed in the input (e.g. from data.json) is reviewed without fetching the pull request
+    if state.get("raw_code"):
+        return {'raw_code': state["raw_code"]}
+    return {'raw_code': get_pull_request_content(state["pull_request_link"], backend=state.get("fetch_backend", "rest"))}
 
 
-def preprocessing_code(state: OverallState):
-    state['preprocessed_code'] = preprocessing_code_pr(state["raw_code"])
-    return state
+async def aget_tech_task_description(state: InputState) -> dict:
+    return {'tech_task_description': await aget_notion_docs(database_id=state["notion_db_id"], page_id=state['notion_doc_id'])}
 
 
-def generate_comment_invoke(state: OverallState):
-    # Create Comments for PR
-    first_round_comments_generated = create_initial_comments_chain.invoke({
-        "code": state["preprocessed_code"],
-        "context": state['tech_task_description'],
-        "format_instructions": parser.get_format_instructions()
-    })
+async def aget_raw_code(state: InputState) -> dict:
+    if state.get("raw_code"):
+        return {'raw_code': state["raw_code"]}
+    return {'raw_code': await aget_pull_request_content(state["pull_request_link"], backend=state.get("fetch_backend", "rest"))}
+
+
+def preprocessing_code(state: OverallState) -> dict:
+    return {'preprocessed_code': preprocessing_code_pr(state["raw_code"])}
+
+
+def plan_review(state: OverallState) -> dict:
+    # Incremental review: only the hunks changed since the last review of the pull request go to the model
+    # review_code None means the whole preprocessed code is reviewed
+    if not state.get("incremental"):
+        return {'review_code': None}
+
+    # Webhook deliveries carry the head, other reviews read it from the pull request
+    head_sha = state.get("head_sha") or get_pull_request_head_sha(
+        state["pull_request_link"], backend=state.get("fetch_backend", "rest")
+    )
+
+    previous = get_review_state_store().get(state["pull_request_link"])
+    if previous is None:
+        return {'review_code': None, 'head_sha': head_sha}
+
+    if head_sha == previous.head_sha:
+        logger.info(f"{state['pull_request_link']} at {head_sha} was already reviewed.")
+        return {'review_code': [], 'carried_comments': previous.comments, 'head_sha': head_sha}
+
+    changed_files = None
+    if previous.head_sha:
+        # The commits pushed after the reviewed head tell which files can have new hunks
+        commits = get_pull_request_commits_content(state["pull_request_link"], backend=state.get("fetch_backend", "rest"))
+        changed_files = files_changed_since(commits, previous.head_sha)
+
+    review_code, carried_comments = plan_incremental_review(state["preprocessed_code"], previous, changed_files)
+    return {'review_code': review_code, 'carried_comments': carried_comments, 'head_sha': head_sha}
+
+
+async def aplan_review(state: OverallState) -> dict:
+    return await asyncio.to_thread(plan_review, state)
+
+
+def save_review_state(state: OverallState) -> dict:
+    # Carried comments were filtered in an earlier review, they are added back after the filter
+    if not state.get("incremental"):
+        return {'filtered_comments': state["filtered_comments"]}
 
-    state['initial_comments'] = first_round_comments_generated
+    # Carried comments moved with their hunks, their diff positions are resolved again
+    carried_comments, _ = anchor_suggestions(state.get("carried_comments") or [], state["preprocessed_code"])
+    comments = carried_comments + (state["filtered_comments"] or {}).get("suggestions", [])
+    get_review_state_store().put(
+        state["pull_request_link"],
+        ReviewState(head_sha=state.get("head_sha"), hunks=index_hunks(state["preprocessed_code"]), comments=comments)
+    )
+    return {'filtered_comments': {"suggestions": comments}}
 
-    return state
 
+def get_review_batches(state: OverallState) -> List[dict]:
+    """
+    Splits the preprocessed code into token-bounded batches, each one becomes a review chain input.
+    TASK_CONTEXT_TOKENS bounds the task description retrieved for a batch, 0 passes the whole description.
+    """
+    max_tokens = state.get("chunk_tokens") or int(getenv("REVIEW_CHUNK_TOKENS", "12000"))
+    review_code = state["preprocessed_code"] if state.get("review_code") is None else state["review_code"]
+    # Only the parts of the task description relevant to the files of a batch go into its prompt
+    context_tokens = int(getenv("TASK_CONTEXT_TOKENS", "1500"))
+    # The description is split and indexed once, every batch only scores its sections
+    context_index = get_task_context_index(state['tech_task_description']) if context_tokens > 0 else None
+    return [
+        {
+            "code": render_code(batch),
+            "context": context_index.select(batch, max_tokens=context_tokens)
+            if context_index is not None else state['tech_task_description'],
+            "format_instructions": parser.get_format_instructions()
+        }
+        for batch in chunk_preprocessed_code(review_code, max_tokens=max_tokens)
+    ]
 
-def filter_comment_invoke(state: OverallState) -> OutputState:
-    # Filter Comments
+
+def get_review_concurrency(state: OverallState) -> int:
+    return state.get("max_concurrency") or int(getenv("REVIEW_MAX_CONCURRENCY", "4"))
+
+
+def stream_review_batches(batches: List[dict], writer: StreamWriter, concurrency: int) -> List[dict]:
+    """
+    Reviews the batches with streaming completions, every suggestion is written to the graph stream as soon as
+    its JSON object is closed.
+
+    Returns:
+        List[dict]: The ListSuggestion dictionary of every batch.
+    """
+
+    def review(batch_index: int) -> dict:
+        suggestions = []
+        for suggestion in stream_suggestions(stream_initial_comments_chain, batches[batch_index]):
+            writer({"suggestion": suggestion, "batch": batch_index})
+            suggestions.append(suggestion)
+        return {"suggestions": suggestions}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(review, range(len(batches))))
+
+
+def generate_comment_invoke(state: OverallState, writer: StreamWriter):
+    # Create Comments for PR, large PRs are reviewed in batches concurrently
+    batches = get_review_batches(state)
+    if state.get("stream_suggestions"):
+        results = stream_review_batches(batches, writer, get_review_concurrency(state))
+    else:
+        results = create_initial_comments_chain.batch(batches, config={"max_concurrency": get_review_concurrency(state)})
+
+    return {'initial_comments': results[0] if len(results) == 1 else merge_suggestions(results)}
+
+
+def prepare_filter_comments(state: OverallState):
+    """
+    Runs the local comment filter and selects the suggestions that still need the LLM filter.
+
+    Returns:
+        tuple: The local filter result and the suggestions to send to the LLM (empty to skip the call).
+    """
+    suggestions = (state["initial_comments"] or {}).get("suggestions", [])
+    if get_filter_mode() == "llm":
+        return None, suggestions
+
+    prefiltered = prefilter_comments(suggestions)
+    if get_filter_mode() == "local":
+        # Ambiguous comments are kept without asking the LLM
+        prefiltered.kept.extend(prefiltered.ambiguous)
+        prefiltered.ambiguous = []
+    return prefiltered, prefiltered.ambiguous
+
+
+def filter_comment_result(state: OverallState, prefiltered, sent: list, llm_response: Optional[dict], seconds: Optional[float]) -> dict:
+    """Combines the local and LLM filter results into the state update and records the filter statistics."""
+    llm_kept = (llm_response or {}).get("suggestions", [])
+    kept = llm_kept if prefiltered is None else prefiltered.kept + llm_kept
+    dropped = ([] if prefiltered is None else prefiltered.dropped) + diff_comments(sent, llm_kept)
+
+    filter_stats.record(len(state["initial_comments"].get("suggestions", [])), len(sent), seconds)
+    logger.info(f"Filter kept {len(kept)} and dropped {len(dropped)} comments. {filter_stats.summary()}")
+
+    # Comments on files or lines outside the diff cannot be posted, the others get their diff position
+    kept, rejected = anchor_suggestions(kept, state["preprocessed_code"])
+    return {'filtered_comments': {"suggestions": kept}, 'dropped_comments': dropped + rejected}
+
+
+def filter_comment_invoke(state: OverallState) -> dict:
+    # Filter Comments, the LLM only sees the comments the local filter could not decide on
+    prefiltered, sent = prepare_filter_comments(state)
+    if not sent:
+        return filter_comment_result(state, prefiltered, sent, None, None)
+
+    start = time.perf_counter()
     filtered_comments_response = filter_comments_chain.invoke({
-        "comments": state["initial_comments"],
+        "comments": {"suggestions": sent},
         "format_instructions": parser.get_format_instructions()
     })
+    return filter_comment_result(state, prefiltered, sent, filtered_comments_response, time.perf_counter() - start)
 
-    state['filtered_comments'] = filtered_comments_response
 
-    state['dropped_comments'] = [comment for comment in state['initial_comments'] if
-                                 comment not in state['filtered_comments']]
+async def afilter_comment_invoke(state: OverallState) -> dict:
+    # Filter Comments, the LLM only sees the comments the local filter could not decide on
+    prefiltered, sent = prepare_filter_comments(state)
+    if not sent:
+        return filter_comment_result(state, prefiltered, sent, None, None)
 
-    return state
+    start = time.perf_counter()
+    filtered_comments_response = await filter_comments_chain.ainvoke({
+        "comments": {"suggestions": sent},
+        "format_instructions": parser.get_format_instructions()
+    })
+    return filter_comment_result(state, prefiltered, sent, filtered_comments_response, time.perf_counter() - start)
 
 
+# I/O nodes have a sync and an async implementation: graph.invoke() runs the former, graph.ainvoke() the latter
 builder = StateGraph(OverallState, input=InputState, output=OutputState)
-builder.add_node("GitHub PR", get_raw_code)
-builder.add_node("Get Tech Task Description", get_tech_task_description)
+builder.add_node("GitHub PR", RunnableLambda(get_raw_code, afunc=aget_raw_code))
+builder.add_node("Get Tech Task Description", RunnableLambda(get_tech_task_description, afunc=aget_tech_task_description))
 builder.add_node("Assign Lines", preprocessing_code)
+# A plain function node gets the stream writer of graph.stream(..., stream_mode="custom") as its writer argument.
+# graph.ainvoke() runs it in a worker thread, its batches are still reviewed concurrently
 builder.add_node("Generate Comments", generate_comment_invoke)
-builder.add_node("Filter Comments", filter_comment_invoke)
+builder.add_node("Filter Comments", RunnableLambda(filter_comment_invoke, afunc=afilter_comment_invoke))
+builder.add_node("Plan Review", RunnableLambda(plan_review, afunc=aplan_review))
+builder.add_node("Save Review State", save_review_state)
 
+# The PR and the task description are fetched concurrently, line assignment starts as soon as the PR arrives
+# and comment generation waits for both branches
 builder.add_edge(START, "GitHub PR")
-builder.add_edge("GitHub PR", "Get Tech Task Description")
-builder.add_edge("Get Tech Task Description", "Assign Lines")
-builder.add_edge("Assign Lines", "Generate Comments")
+builder.add_edge(START, "Get Tech Task Description")
+builder.add_edge("GitHub PR", "Assign Lines")
+builder.add_edge("Assign Lines", "Plan Review")
+builder.add_edge(["Plan Review", "Get Tech Task Description"], "Generate Comments")
 builder.add_edge("Generate Comments", "Filter Comments")
-builder.add_edge("Filter Comments", END)
+builder.add_edge("Filter Comments", "Save Review State")
+builder.add_edge("Save Review State", END)
 
 graph = builder.compile()
 
-pp(graph.invoke({"pull_request_link": "https://github.com/CorporationX/god_bless/pull/14060",
-                 "notion_doc_id": "120ffd2db62a805893e2e14363c7b31e", "notion_db_id": "120ffd2db62a800b843bd72e82ec59b1"}))
+
+async def areview_pull_requests(inputs: List[dict], concurrency: int = 20) -> List[dict]:
+    """
+    Reviews many pull requests concurrently in one event loop with graph.ainvoke().
+
+    Args:
+        inputs (List[dict]): Graph inputs, one per pull request (see InputState).
+        concurrency (int): Maximum number of reviews in flight at the same time.
+
+    Returns:
+        List[dict]: Graph outputs in the order of the inputs, or the exception raised for a failed review.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def review(graph_input: dict) -> dict:
+        async with semaphore:
+            return await graph.ainvoke(graph_input)
+
+    return await asyncio.gather(*(review(graph_input) for graph_input in inputs), return_exceptions=True)
+
+
+def stream_pull_request_review(graph_input: dict) -> Iterator[dict]:
+    """
+    Reviews a pull request and yields every suggestion as soon as the review model has generated it,
+    followed by the final graph output.
+
+    Args:
+        graph_input (dict): Graph input (see InputState).
+
+    Yields:
+        dict: {"suggestion": ..., "batch": ...} events, then {"output": <graph output>}.
+    """
+    output = None
+    for mode, chunk in graph.stream({**graph_input, "stream_suggestions": True}, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield chunk
+        else:
+            output = chunk
+    yield {"output": {key: output.get(key) for key in OutputState.__annotations__}}
+
+
+if __name__ == "__main__":
+    pp(graph.invoke({"pull_request_link": "https://github.com/CorporationX/god_bless/pull/14060",
+                     "notion_doc_id": "120ffd2db62a805893e2e14363c7b31e", "notion_db_id": "120ffd2db62a800b843bd72e82ec59b1"}))
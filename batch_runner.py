@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from logger_setup import logger
+from dataset_store import get_dataset_store
+
+load_dotenv()
+
+
+def load_checkpoint(output_path: str) -> Set[str]:
+    """
+    Reads the URLs of the pull requests already reviewed successfully from a JSONL results file.
+    A line cut short by an interrupted run is ignored, its pull request is reviewed again.
+
+    Args:
+        output_path (str): Path of the JSONL results file.
+
+    Returns:
+        Set[str]: URLs of the completed pull requests.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Ignoring an incomplete line in {output_path}.")
+                continue
+            if record.get("status") == "ok":
+                done.add(record["url"])
+    return done
+
+
+class CheckpointWriter:
+    """Appends results to a JSONL file, one line per pull request, flushed to disk as soon as it is written."""
+
+    def __init__(self, output_path: str):
+        """
+        Args:
+            output_path (str): Path of the JSONL results file.
+        """
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(output_path, "a+", encoding="utf-8")
+        self._lock = threading.Lock()
+
+        # Terminate a line cut short by an interrupted run, so that it does not swallow the next record
+        if self._file.tell() > 0:
+            self._file.seek(self._file.tell() - 1)
+            if self._file.read(1) != "\n":
+                self._file.write("\n")
+
+    def write(self, record: Dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def review_dataset_pull_request(pull_request: Dict, notion_db_id: Optional[str], notion_doc_id: Optional[str]) -> Dict:
+    """
+    Runs the review graph for a pull request of the dataset, with the code stored in the dataset.
+
+    Args:
+        pull_request (Dict): A dataset entry with "url" and "content".
+        notion_db_id (Optional[str]): Notion database of the task descriptions.
+        notion_doc_id (Optional[str]): Notion page of the task description.
+
+    Returns:
+        Dict: The graph output.
+    """
+    # Imported lazily, building the graph sets up the LLM clients
+    from agent_graph import graph
+
+    return graph.invoke({
+        "pull_request_link": pull_request["url"],
+        "notion_db_id": notion_db_id,
+        "notion_doc_id": notion_doc_id,
+        "raw_code": pull_request["content"]
+    })
+
+
+def run_batch(
+        pull_requests: List[Dict],
+        output_path: str,
+        concurrency: int = 4,
+        review_fn: Callable[[Dict], Dict] = None
+) -> Dict[str, int]:
+    """
+    Reviews pull requests concurrently and checkpoints every result to a JSONL file. Pull requests already
+    reviewed successfully in the file are skipped, so an interrupted run resumes where it stopped and failed
+    pull requests are retried.
+
+    Args:
+        pull_requests (List[Dict]): Dataset entries with "url", "task_name" and "content".
+        output_path (str): Path of the JSONL results file.
+        concurrency (int): Number of pull requests reviewed at the same time.
+        review_fn (Callable[[Dict], Dict]): Reviews one dataset entry, the review graph with the
+            NOTION_DB_ID/NOTION_DOC_ID task description by default.
+
+    Returns:
+        Dict[str, int]: Numbers of "skipped", "ok" and "error" pull requests.
+    """
+    if review_fn is None:
+        notion_db_id, notion_doc_id = os.getenv("NOTION_DB_ID"), os.getenv("NOTION_DOC_ID")
+        review_fn = lambda pull_request: review_dataset_pull_request(pull_request, notion_db_id, notion_doc_id)
+
+    done = load_checkpoint(output_path)
+    pending = [pull_request for pull_request in pull_requests if pull_request["url"] not in done]
+    counts = {"skipped": len(pull_requests) - len(pending), "ok": 0, "error": 0}
+    logger.info(f"Reviewing {len(pending)} pull requests, {counts['skipped']} already done in {output_path}.")
+
+    writer = CheckpointWriter(output_path)
+    counts_lock = threading.Lock()
+
+    def review(pull_request: Dict) -> None:
+        start = time.perf_counter()
+        record = {"url": pull_request["url"], "task_name": pull_request.get("task_name")}
+        try:
+            record.update(status="ok", output=review_fn(pull_request))
+        except Exception as e:
+            logger.error(f"Review of {pull_request['url']} failed: {e}")
+            record.update(status="error", error=str(e))
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        writer.write(record)
+        with counts_lock:
+            counts[record["status"]] += 1
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            list(executor.map(review, pending))
+    finally:
+        writer.close()
+
+    logger.info(f"Batch finished in {time.perf_counter() - start:.1f}s: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Review every pull request of a dataset file.")
+    arg_parser.add_argument("dataset", help="JSON dataset, e.g. data.json")
+    arg_parser.add_argument("--output", default="results.jsonl", help="JSONL file the results are appended to.")
+    arg_parser.add_argument("--concurrency", type=int, default=4)
+    arg_parser.add_argument("--limit", type=int, default=None, help="Review only the first N pull requests.")
+    args = arg_parser.parse_args()
+
+    store = get_dataset_store(args.dataset)
+    # Entries collected as commit patches are reconstructed into files first
+    dataset = [dict(pull_request, content=store.get_files(index))
+               for index, pull_request in enumerate(store.pull_requests[:args.limit])]
+
+    print(run_batch(dataset, args.output, args.concurrency))
@@ -0,0 +1,137 @@
+"""
+Compares patching.apply_patch with the previous list insert/pop implementation of utils.apply_diff:
+checks that both give identical files for commit histories built from the files in data.json, as files added by the
+pull request and as files modified by it, and times them on synthetic thousand-line patches.
+
+Run from the repository root:
+    python -m benchmarks.apply_diff [path/to/data.json]
+"""
+import difflib
+import json
+import random
+import re
+import sys
+import time
+from typing import List
+
+from patching import apply_patch
+
+
+def legacy_apply_diff(content, diff) -> str:
+    """The previous utils.apply_diff, kept here as the baseline."""
+    content_lines = content.splitlines()
+    line_index = 0
+    for line in diff.splitlines():
+        if line.startswith('@@'):
+            match = re.match(r'@@ -\d+(,\d+)? \+(\d+)(,\d+)? @@', line)
+            if match:
+                line_index = int(match.group(2)) - 1
+        elif line.startswith('+'):
+            content_lines.insert(line_index, "+" + line[1:])
+            line_index += 1
+        elif line.startswith('-'):
+            if line_index < len(content_lines):
+                content_lines.pop(line_index)
+        else:
+            line_index += 1
+    return '\n'.join(content_lines)
+
+
+def make_patch(old: List[str], new: List[str]) -> str:
+    """Unified diff of two versions of a file in the GitHub "patch" format (no ---/+++ lines)."""
+    return "\n".join(list(difflib.unified_diff(old, new, lineterm="", n=3))[2:])
+
+
+def mutate(lines: List[str], rng: random.Random, edits: int) -> List[str]:
+    """Inserts, deletes and replaces random lines."""
+    lines = list(lines)
+    for _ in range(edits):
+        index = rng.randrange(len(lines) + 1)
+        action = rng.random()
+        if action < 0.4 or not lines:
+            lines.insert(index, f"    int added{rng.randrange(10 ** 6)} = {index};")
+        elif action < 0.7:
+            del lines[min(index, len(lines) - 1)]
+        else:
+            lines[min(index, len(lines) - 1)] = f"    // changed {rng.randrange(10 ** 6)}"
+    return lines
+
+
+def replay(versions: List[List[str]], apply, base: List[str] = ()) -> str:
+    """
+    Reconstructs the last version from the patches between consecutive versions, starting from an empty file
+    like dataset_store.reconstruct_files. The first patch is made against base, the file before the pull request.
+    """
+    content = ""
+    previous = list(base)
+    for version in versions:
+        content = apply(content, make_patch(previous, version))
+        previous = version
+    return content
+
+
+def check_dataset(path: str) -> None:
+    """
+    Replays commit histories built from the files of data.json with both implementations:
+    - files added by the pull request: the history starts from an empty file, both must give the last version;
+    - files that existed before the pull request: the first patch has context the empty file lacks, as for the
+      per-commit patches dataset.collect_pull_request stores, both must give the same (partial) content.
+    """
+    with open(path, "r") as f:
+        pull_requests = json.load(f)
+
+    rng = random.Random(0)
+    files = added_mismatches = modified_mismatches = by_position = 0
+    new_apply = lambda content, diff: apply_patch(content, diff).content
+    for pull_request in pull_requests:
+        for file in pull_request["content"]:
+            lines = [line[1:] for line in file["content"].split("\n")]
+            versions = [lines]
+            for _ in range(5):
+                versions.append(mutate(versions[-1], rng, edits=rng.randint(1, 8)))
+            files += 1
+
+            new = replay(versions, new_apply)
+            added_mismatches += replay(versions, legacy_apply_diff) != new
+            added_mismatches += new != "\n".join("+" + line for line in versions[-1])
+
+            # The first version is the file before the pull request, the other ones its commits
+            base, commits = versions[0], versions[1:]
+            modified_mismatches += replay(commits, legacy_apply_diff, base) != replay(commits, new_apply, base)
+            by_position += apply_patch("", make_patch(base, commits[0])).by_position
+    print(f"data.json: {files} files replayed over 6 commits, {added_mismatches} mismatches as added files, "
+          f"{modified_mismatches} mismatches with the previous implementation as modified files "
+          f"({by_position} first patches applied by position)")
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def benchmark() -> None:
+    rng = random.Random(1)
+    print(f"{'lines':>7} {'commits':>8} {'legacy (s)':>11} {'new (s)':>9} {'speedup':>8}")
+    for size in (1000, 4000, 16000, 64000):
+        # A file written in one commit, then commits editing a line every ~5 lines
+        versions = [[f"    line {index};" for index in range(size)]]
+        for _ in range(10):
+            versions.append(mutate(versions[-1], rng, edits=size // 5))
+        patches = [make_patch(old, new) for old, new in zip([[]] + versions, versions)]
+
+        def run(apply):
+            content = ""
+            for patch in patches:
+                content = apply(content, patch)
+            return content
+
+        legacy_time = timed(run, legacy_apply_diff)
+        new_time = timed(run, lambda content, diff: apply_patch(content, diff).content)
+        assert run(legacy_apply_diff) == run(lambda content, diff: apply_patch(content, diff).content)
+        print(f"{size:>7} {len(patches):>8} {legacy_time:>11.3f} {new_time:>9.3f} {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    check_dataset(sys.argv[1] if len(sys.argv) > 1 else "data.json")
+    benchmark()
@@ -0,0 +1,116 @@
+"""
+Compares code_lines.PreprocessedFile with the previous tools.preprocessing_code_pr, which rewrote the input files
+into numbered strings: checks that both render the same text for the files of data.json and measures the time of
+preprocessing, of splitting the files into hunks (twice per incremental review, see review_state) and of copying
+the result, and the peak memory of preprocessing, on data.json (pull request by pull request) and on a synthetic
+large pull request. Times are the best of several untraced runs, memory is traced in a separate run.
+
+Run from the repository root:
+    python -m benchmarks.preprocessing [path/to/data.json]
+"""
+import copy
+import json
+import re
+import sys
+import timeit
+import tracemalloc
+from typing import Dict, List
+
+from chunking import file_hunks, split_hunks
+from code_lines import preprocess_files
+from utils import format_code_line
+
+
+def legacy_preprocessing_code_pr(code: list) -> list:
+    """The previous tools.preprocessing_code_pr, kept here as the baseline."""
+    pattern_diff = re.compile(r"@@ -(\d+,?\d*) \+(\d+,?\d*) @@")
+    pattern_number = re.compile(r"(\d+),?(\d*)")
+
+    for file in code:
+        lines = file["content"].split("\n")
+        new_content = []
+        count = 1
+        for line in lines:
+            if pattern_diff.match(line):
+                diff_lines = pattern_diff.match(line)
+                count = int(pattern_number.match(diff_lines.group(2)).group(1))
+                continue
+            if line.startswith("\\"):
+                continue
+            new_content.append(format_code_line(count, line))
+            if not line.startswith("-"):
+                count += 1
+        file["content"] = "\n".join(new_content)
+    return code
+
+
+def synthetic_pull_request(files: int = 200, hunks: int = 40, hunk_lines: int = 30) -> List[Dict[str, str]]:
+    """Patches of a large pull request: many files with many hunks of added, removed and context lines."""
+    pull_request = []
+    for file_index in range(files):
+        patch = []
+        for hunk_index in range(hunks):
+            start = hunk_index * 100 + 1
+            patch.append(f"@@ -{start},{hunk_lines} +{start},{hunk_lines} @@ class Service{file_index} {{")
+            for line_index in range(hunk_lines):
+                marker = "+-  "[line_index % 4]
+                patch.append(f"{marker}        result.add(repository.findById(id{line_index}).orElseThrow());")
+        pull_request.append({"filename": f"src/main/java/app/Service{file_index}.java", "content": "\n".join(patch)})
+    return pull_request
+
+
+def best_time(function, repeat: int = 7) -> float:
+    """Returns the best time in milliseconds of untraced calls of a function."""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def peak_memory(function) -> float:
+    """Returns the peak of newly allocated memory in MB during a call of a function."""
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return peak
+
+
+def compare(name: str, pull_requests: List[List[Dict[str, str]]]) -> None:
+    # The legacy function rewrites its input, it gets its own copy (the batch runner deep-copied every entry)
+    def legacy_preprocess():
+        return [legacy_preprocessing_code_pr(copy.deepcopy(code)) for code in pull_requests]
+
+    def new_preprocess():
+        return [preprocess_files(code) for code in pull_requests]
+
+    legacy, new = legacy_preprocess(), new_preprocess()
+    assert [[file.to_dict() for file in files] for files in new] == legacy
+
+    def legacy_hunks():
+        return [split_hunks(file["content"].split("\n")) for files in legacy for file in files]
+
+    def new_hunks():
+        return [file_hunks(file) for files in new for file in files]
+
+    assert legacy_hunks() == new_hunks()
+
+    rows = {
+        "preprocess ms": (best_time(legacy_preprocess), best_time(new_preprocess)),
+        "hunks ms": (best_time(legacy_hunks), best_time(new_hunks)),
+        "deepcopy ms": (best_time(lambda: copy.deepcopy(legacy)), best_time(lambda: copy.deepcopy(new))),
+        "peak MB": (peak_memory(legacy_preprocess), peak_memory(new_preprocess)),
+    }
+    rows["incremental ms"] = tuple(preprocess + 2 * hunks for preprocess, hunks in
+                                   zip(rows["preprocess ms"], rows["hunks ms"]))
+
+    files = sum(len(files) for files in new)
+    lines = sum(len(file) for files in new for file in files)
+    print(f"{name}: {len(pull_requests)} pull requests, {files} files, {lines} lines")
+    print(f"  {'':<15} {'legacy':>10} {'new':>10}")
+    for row, (legacy_value, new_value) in rows.items():
+        print(f"  {row:<15} {legacy_value:>10.1f} {new_value:>10.1f}")
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1] if len(sys.argv) > 1 else "data.json", "r") as f:
+        dataset = json.load(f)
+    compare("data.json", [pull_request["content"] for pull_request in dataset])
+    compare("synthetic", [synthetic_pull_request()])
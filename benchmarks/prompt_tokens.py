@@ -0,0 +1,65 @@
+"""
+Measures the prompt tokens spent on the code of every pull request in data.json, with the previous rendering
+(the repr of {"line_number": n, "content": ...} dicts) and the compact numbered rendering.
+
+Run from the repository root:
+    python -m benchmarks.prompt_tokens [path/to/data.json]
+"""
+import copy
+import json
+import re
+import sys
+
+from chunking import count_tokens
+from prompts import prompt_full_code_template
+from tools import preprocessing_code_pr
+from utils import render_code
+
+
+def legacy_preprocessing_code_pr(code: list) -> list:
+    """The line numbering used before the compact rendering, kept here as the baseline."""
+    pattern_diff = re.compile(r"@@ -(\d+,?\d*) \+(\d+,?\d*) @@")
+    pattern_number = re.compile(r"(\d+),?(\d*)")
+
+    for file in code:
+        new_content = []
+        count = 1
+        for line in file["content"].split("\n"):
+            diff_lines = pattern_diff.match(line)
+            if diff_lines:
+                count = int(pattern_number.match(diff_lines.group(2)).group(1))
+                continue
+            new_content.append({"line_number": count, "content": line})
+            if not line.startswith("-"):
+                count += 1
+        file["content"] = new_content
+    return code
+
+
+def prompt_tokens(code: str) -> int:
+    """Tokens of the review prompt without task context and format instructions."""
+    return count_tokens(prompt_full_code_template.format(code=code, context="", format_instructions=""))
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "data.json"
+    with open(path, "r") as f:
+        pull_requests = json.load(f)
+
+    totals = {"before": 0, "after": 0, "prompt_before": 0, "prompt_after": 0}
+    print(f"{'#':>3} {'files':>5} {'code before':>12} {'code after':>11} {'saved':>6}")
+    for index, pull_request in enumerate(pull_requests):
+        legacy = str(legacy_preprocessing_code_pr(copy.deepcopy(pull_request["content"])))
+        compact = render_code(preprocessing_code_pr(copy.deepcopy(pull_request["content"])))
+
+        before, after = count_tokens(legacy), count_tokens(compact)
+        totals["before"] += before
+        totals["after"] += after
+        totals["prompt_before"] += prompt_tokens(legacy)
+        totals["prompt_after"] += prompt_tokens(compact)
+        print(f"{index:>3} {len(pull_request['content']):>5} {before:>12} {after:>11} {1 - after / before:>6.0%}")
+
+    print(f"Code tokens:   {totals['before']} -> {totals['after']} "
+          f"({1 - totals['after'] / totals['before']:.0%} fewer)")
+    print(f"Prompt tokens: {totals['prompt_before']} -> {totals['prompt_after']} "
+          f"({1 - totals['prompt_after'] / totals['prompt_before']:.0%} fewer)")
@@ -0,0 +1,189 @@
+import os
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from logger_setup import logger
+from utils import parse_code_line_number, render_code
+from comment_index import dedupe_suggestions
+from code_lines import PreprocessedFile
+
+# Model whose tokenizer is used to measure prompt sizes
+TOKENIZER_MODEL = "gpt-4o-mini"
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Loads the tiktoken encoding of TOKENIZER_MODEL once, None if it cannot be loaded (e.g. offline)."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable, estimating tokens from characters: {e}")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts the tokens of a text with the tokenizer of the review model.
+    Without tiktoken or its encoding files the count is estimated as one token per 4 characters.
+
+    Args:
+        text (str): The text to measure.
+
+    Returns:
+        int: Number of tokens.
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def related_files_key(filename: str) -> str:
+    """
+    Groups files that should be reviewed together: files of the same package, with main and test sources
+    (e.g. src/main/java/a/Foo.java and src/test/java/a/FooTest.java) in the same group.
+
+    Args:
+        filename (str): Path of the file in the repository.
+
+    Returns:
+        str: The group key.
+    """
+    directory = os.path.dirname(filename)
+    return re.sub(r"(^|/)src/test/", r"\1src/main/", directory)
+
+
+def split_hunks(lines: List[str]) -> List[List[str]]:
+    """Splits the numbered lines of a preprocessed file where the line numbers jump, i.e. at hunk boundaries."""
+    hunks: List[List[str]] = []
+    previous = None
+    for line in lines:
+        line_number = parse_code_line_number(line)
+        if previous is None or line_number not in (previous, previous + 1):
+            hunks.append([])
+        hunks[-1].append(line)
+        previous = line_number
+    return hunks
+
+
+def file_hunks(file: Dict[str, str]) -> List[List[str]]:
+    """Returns the numbered lines of every hunk of a preprocessed file, or of a part of one."""
+    if isinstance(file, PreprocessedFile):
+        return file.hunk_lines()
+    return split_hunks(file["content"].split("\n"))
+
+
+def _split_file(file: Dict[str, str], max_tokens: int, count: Callable[[str], int]) -> List[Dict[str, str]]:
+    """Splits a preprocessed file that exceeds the budget into parts of whole hunks, or of lines for huge hunks."""
+
+    def part(lines: List[str]) -> Dict[str, str]:
+        return {"filename": file["filename"], "content": "\n".join(lines)}
+
+    def piece_tokens(lines: List[str]) -> int:
+        # Measured with the newline that joins it to the next piece
+        return count("\n".join(lines) + "\n")
+
+    # Every hunk (or line of a huge hunk) is measured once, a part's size is the sum of its pieces
+    header = count(render_code([part([])]))
+    parts: List[Dict[str, str]] = []
+    current: List[str] = []
+    current_tokens = header
+    for hunk in file_hunks(file):
+        hunk_tokens = piece_tokens(hunk)
+        if header + hunk_tokens <= max_tokens:
+            pieces = [(hunk, hunk_tokens)]
+        else:
+            pieces = [([line], piece_tokens([line])) for line in hunk]
+        for piece, tokens in pieces:
+            if current and current_tokens + tokens > max_tokens:
+                parts.append(part(current))
+                current = []
+                current_tokens = header
+            current.extend(piece)
+            current_tokens += tokens
+    if current:
+        parts.append(part(current))
+    return parts
+
+
+def chunk_preprocessed_code(
+        files: List[Dict],
+        max_tokens: int = 12000,
+        count: Callable[[str], int] = count_tokens
+) -> List[List[Dict]]:
+    """
+    Packs preprocessed files into batches whose prompt rendering (see utils.render_code) stays under a token budget.
+    Related files (see related_files_key) are kept in the same batch whenever the group fits, files larger
+    than the budget are split between hunks. Every file is measured once and the size of a batch is the sum of
+    the sizes of its files, which is never less than the size of the rendered batch.
+
+    Args:
+        files (List[Dict]): Output of tools.preprocessing_code_pr.
+        max_tokens (int): Token budget for the code of one batch.
+        count (Callable[[str], int]): Token count of a text, count_tokens by default.
+
+    Returns:
+        List[List[Dict]]: Batches of files, in the order of the groups in the pull request.
+    """
+    # Blank line between two files of a batch
+    separator = count("\n\n")
+
+    def measure(file: Dict) -> int:
+        return count(render_code([file])) + separator
+
+    groups: Dict[str, List[Tuple[Dict, int]]] = OrderedDict()
+    for file in files:
+        groups.setdefault(related_files_key(file["filename"]), []).append((file, measure(file)))
+
+    batches: List[List[Dict]] = []
+    current: List[Dict] = []
+    current_tokens = 0
+
+    def add(items: List[Dict], tokens: int) -> None:
+        nonlocal current, current_tokens
+        if current and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.extend(items)
+        current_tokens += tokens
+
+    for group in groups.values():
+        group_tokens = sum(tokens for _, tokens in group)
+        if group_tokens <= max_tokens:
+            add([file for file, _ in group], group_tokens)
+            continue
+        # The group does not fit in one batch: pack its files one by one
+        for file, tokens in group:
+            if tokens <= max_tokens:
+                add([file], tokens)
+            else:
+                for part in _split_file(file, max_tokens - separator, count):
+                    add([part], measure(part))
+    if current:
+        batches.append(current)
+
+    logger.info(f"Split {len(files)} files into {len(batches)} review batches of at most {max_tokens} tokens.")
+    return batches
+
+
+def merge_suggestions(results: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    Merges the suggestions of several review batches, dropping duplicates of the same comment on the same lines.
+
+    Args:
+        results (List[Dict]): Parsed ListSuggestion outputs, one per batch.
+
+    Returns:
+        Dict[str, List[Dict]]: A ListSuggestion dictionary with the merged suggestions.
+    """
+    return {"suggestions": dedupe_suggestions(
+        suggestion for result in results for suggestion in (result or {}).get("suggestions", [])
+    )}
@@ -0,0 +1,182 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Tuple
+
+HUNK_HEADER_PATTERN = re.compile(r"@@ -\d+(?:,\d+)? \+(\d+)(?:,\d+)? @@")
+
+ADDED, REMOVED, CONTEXT = "+", "-", " "
+
+
+class PreprocessedFile:
+    """
+    A file of a pull request with numbered lines, as reviewed by the model.
+
+    The lines are stored once, rendered as "<line number> <marker>| <code>" (see utils.format_code_line) in one
+    string, with arrays of their offsets in that string, their line numbers in the new version of the file and
+    their kinds ("+", "-" or " ") and positions in the patch, and the indices of the first line of every hunk.
+    Rendering the file is free and lines are looked up by number with a binary search (see line_index).
+
+    The file can be read like the {"filename", "content"} dicts the rest of the code base passes around.
+    """
+    __slots__ = ("filename", "content", "offsets", "line_numbers", "kinds", "positions", "hunk_starts")
+
+    def __init__(self, filename: str, content: str, offsets: array, line_numbers: array, kinds: str,
+                 positions: array, hunk_starts: array):
+        self.filename = filename
+        self.content = content
+        self.offsets = offsets  # offsets[i] is where line i starts in content, offsets[-1] == len(content) + 1
+        self.line_numbers = line_numbers
+        self.kinds = kinds
+        # GitHub diff positions: lines below the first hunk header, later headers and "\ No newline" included
+        self.positions = positions
+        self.hunk_starts = hunk_starts
+
+    @classmethod
+    def from_diff(cls, filename: str, diff: str) -> "PreprocessedFile":
+        """
+        Numbers the lines of a pull request file.
+        Removed lines carry the number of the line that follows them in the new version of the file.
+
+        Args:
+            filename (str): Path of the file in the repository.
+            diff (str): The file as a patch ("@@" hunk headers and "+", "-", " " lines) or as a reconstructed
+                file with every line prefixed by "+".
+
+        Returns:
+            PreprocessedFile: The numbered file.
+        """
+        rendered: List[str] = []
+        # 32-bit arrays: 4 bytes per line for each of them
+        line_numbers = array("I")
+        kinds: List[str] = []
+        positions = array("I")
+        hunk_starts = array("I")
+
+        count = 1
+        position = 0
+        seen_header = False
+        new_hunk = True
+        for line in diff.split("\n"):
+            kind = line[:1]
+            if kind == "@" and line.startswith("@@"):
+                header = HUNK_HEADER_PATTERN.match(line)
+                if header:
+                    count = int(header.group(1))
+                    # The first header is position 0, the next ones are lines of the patch
+                    position += 1 if seen_header else 0
+                    seen_header = new_hunk = True
+                    continue
+            position += 1
+            # "\ No newline at end of file" is not a line of the file
+            if kind == "\\":
+                continue
+            if new_hunk:
+                hunk_starts.append(len(rendered))
+                new_hunk = False
+
+            line_numbers.append(count)
+            positions.append(position)
+            # Rendered as utils.format_code_line does, inlined: this loop runs once per line of the pull request
+            if kind == REMOVED:
+                rendered.append(f"{count} -| {line[1:]}")
+            elif kind == ADDED:
+                rendered.append(f"{count} +| {line[1:]}")
+                count += 1
+            else:
+                rendered.append(f"{count}  | {line[1:] if kind == CONTEXT else line}")
+                kind = CONTEXT
+                count += 1
+            kinds.append(kind)
+
+        # Every line is followed by a newline, the last one virtually
+        offsets = array("I", accumulate(map((1).__add__, map(len, rendered)), initial=0))
+        return cls(filename, "\n".join(rendered), offsets, line_numbers, "".join(kinds), positions, hunk_starts)
+
+    def __len__(self) -> int:
+        return len(self.line_numbers)
+
+    def __repr__(self) -> str:
+        return f"PreprocessedFile({self.filename!r}, {len(self)} lines, {len(self.hunk_starts)} hunks)"
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, PreprocessedFile):
+            return self.filename == other.filename and self.content == other.content
+        return NotImplemented
+
+    # Read access of the {"filename", "content"} dicts
+    def __getitem__(self, key: str) -> str:
+        if key == "filename":
+            return self.filename
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    # The file is never modified after it is built, copies share it
+    def __copy__(self) -> "PreprocessedFile":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "PreprocessedFile":
+        return self
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"filename": self.filename, "content": self.content}
+
+    def line(self, index: int) -> str:
+        """Returns the rendered line at an index."""
+        return self.content[self.offsets[index]:self.offsets[index + 1] - 1]
+
+    def code(self, index: int) -> str:
+        """Returns the code of the line at an index, without its number and marker."""
+        return self.line(index).split("| ", 1)[-1]
+
+    def lines(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """Returns the rendered lines between two indices."""
+        end = len(self) if end is None else end
+        if start >= end:
+            return []
+        return self.content[self.offsets[start]:self.offsets[end] - 1].split("\n")
+
+    def hunks(self) -> Iterator[Tuple[int, int]]:
+        """Yields the (start, end) line indices of every hunk, end excluded."""
+        for position, start in enumerate(self.hunk_starts):
+            end = self.hunk_starts[position + 1] if position + 1 < len(self.hunk_starts) else len(self)
+            yield start, end
+
+    def hunk_lines(self) -> List[List[str]]:
+        """Returns the rendered lines of every hunk."""
+        return [self.lines(start, end) for start, end in self.hunks()]
+
+    def find_lines(self, first: int, last: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Finds the lines numbered between first and last (removed lines included).
+
+        Args:
+            first (int): First line number.
+            last (Optional[int]): Last line number, first by default.
+
+        Returns:
+            Tuple[int, int]: The (start, end) line indices, end excluded, empty if no line has these numbers.
+        """
+        last = first if last is None else last
+        return bisect_left(self.line_numbers, first), bisect_right(self.line_numbers, last)
+
+
+def preprocess_files(code: List[Dict[str, str]]) -> List[PreprocessedFile]:
+    """
+    Numbers the lines of every file of a pull request, leaving the input untouched.
+
+    Args:
+        code (List[Dict[str, str]]): Files with "filename" and "content".
+
+    Returns:
+        List[PreprocessedFile]: The numbered files, in input order.
+    """
+    return [PreprocessedFile.from_diff(file["filename"], file["content"]) for file in code]
@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+from logger_setup import logger
+
+# Praise and filler that carry no feedback on their own (the comments are written in Russian, English is kept for
+# mixed outputs)
+PRAISE_PATTERN = re.compile(
+    r"молод(е|ч)|отлично|хорош(о|ая|ий|ее)|так держать|правильно|замечательно|прекрасно|супер|"
+    # "Класс" alone is an exclamation, otherwise it is a Java class ("Класс User не соответствует заданию")
+    r"^\s*класс\W*$|"
+    r"good job|well done|great|nice|keep it up|looks good|lgtm",
+    re.IGNORECASE
+)
+
+# Words that ask the student to change something
+ACTION_PATTERN = re.compile(
+    r"стоит|следует|лучше|нужно|надо|необходимо|рекоменд|попробуй|использ|замен|добав|убер|убра|удал|вынес|"
+    r"переимен|провер|исправ|обработ|забыл|ошибк|неправильн|некорректн|вместо|"
+    r"should|consider|instead|replace|use |add |remove|rename|avoid|missing|bug|wrong",
+    re.IGNORECASE
+)
+
+# Code in the comment text: inline code, calls or member access
+CODE_PATTERN = re.compile(r"`[^`]+`|\w+\(|\w+\.\w+")
+
+# Below this similarity two comments on overlapping lines of the same file are considered the same comment
+DUPLICATE_SIMILARITY = 0.8
+
+# Comments shorter than this are too general to keep without the LLM
+MIN_ACTIONABLE_LENGTH = 40
+
+
+@dataclass
+class PrefilterResult:
+    """Outcome of the local filter: comments to keep, to drop and to pass to the LLM filter."""
+    kept: List[Dict] = field(default_factory=list)
+    dropped: List[Dict] = field(default_factory=list)
+    ambiguous: List[Dict] = field(default_factory=list)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases a text and strips punctuation and repeated whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text or "").lower()).split())
+
+
+def _line_range(suggestion: Dict) -> Optional[tuple]:
+    lines = [line for line in suggestion.get("lines") or [] if isinstance(line, int)]
+    return (min(lines), max(lines)) if lines else None
+
+
+def is_near_duplicate(first: Dict, second: Dict) -> bool:
+    """
+    Checks if two suggestions make the same point: same file, overlapping lines and similar text.
+
+    Args:
+        first (Dict): A suggestion (see agent_graph.Answered).
+        second (Dict): Another suggestion.
+
+    Returns:
+        bool: True if the suggestions are near-duplicates.
+    """
+    if first.get("file") != second.get("file"):
+        return False
+
+    first_range, second_range = _line_range(first), _line_range(second)
+    if first_range and second_range and (first_range[1] < second_range[0] or second_range[1] < first_range[0]):
+        return False
+
+    first_text = normalize_text(f"{first.get('title', '')} {first.get('suggestion', '')}")
+    second_text = normalize_text(f"{second.get('title', '')} {second.get('suggestion', '')}")
+    return SequenceMatcher(None, first_text, second_text).ratio() >= DUPLICATE_SIMILARITY
+
+
+def classify_comment(suggestion: Dict) -> str:
+    """
+    Classifies a suggestion with the criteria of prompt_filter_comments that can be checked locally.
+
+    Args:
+        suggestion (Dict): A suggestion (see agent_graph.Answered).
+
+    Returns:
+        str: "drop" for empty or pure praise comments, "keep" for specific actionable comments,
+        "ambiguous" for comments that need the LLM filter.
+    """
+    text = str(suggestion.get("suggestion") or "").strip()
+    if not normalize_text(text):
+        return "drop"
+
+    actionable = ACTION_PATTERN.search(text) is not None
+    if PRAISE_PATTERN.search(text) and not actionable and not CODE_PATTERN.search(text):
+        return "drop"
+
+    if actionable and _line_range(suggestion) and len(text) >= MIN_ACTIONABLE_LENGTH:
+        return "keep"
+    return "ambiguous"
+
+
+def prefilter_comments(suggestions: List[Dict]) -> PrefilterResult:
+    """
+    Filters suggestions locally: near-duplicates of an earlier suggestion and empty or pure praise comments
+    are dropped, specific actionable comments are kept and the rest is left for the LLM filter.
+
+    Args:
+        suggestions (List[Dict]): The suggestions of the review chain.
+
+    Returns:
+        PrefilterResult: The kept, dropped and ambiguous suggestions, in their original order.
+    """
+    result = PrefilterResult()
+    retained: List[Dict] = []
+    for suggestion in suggestions:
+        if any(is_near_duplicate(suggestion, other) for other in retained):
+            result.dropped.append(suggestion)
+            continue
+
+        verdict = classify_comment(suggestion)
+        if verdict == "drop":
+            result.dropped.append(suggestion)
+            continue
+
+        retained.append(suggestion)
+        (result.kept if verdict == "keep" else result.ambiguous).append(suggestion)
+    return result
+
+
+def get_filter_mode() -> str:
+    """
+    Returns the comment filter mode from COMMENT_FILTER_MODE: "hybrid" (default) sends only ambiguous comments
+    to the LLM, "local" never calls the LLM and keeps ambiguous comments, "llm" sends every comment to the LLM.
+    """
+    mode = os.getenv("COMMENT_FILTER_MODE", "hybrid")
+    if mode not in ("hybrid", "local", "llm"):
+        logger.error(f"Unknown COMMENT_FILTER_MODE {mode}.")
+        raise ValueError(f"Unknown COMMENT_FILTER_MODE {mode}.")
+    return mode
+
+
+class FilterStats:
+    """
+    Counts the LLM filter calls made and skipped. The latency saved is estimated from the average duration of
+    the calls that were made.
+    """
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.skipped_calls = 0
+        self.comments_sent = 0
+        self.comments_total = 0
+        self.llm_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, total: int, sent: int, seconds: Optional[float]) -> None:
+        """
+        Records one filter run.
+
+        Args:
+            total (int): Number of suggestions to filter.
+            sent (int): Number of suggestions sent to the LLM.
+            seconds (Optional[float]): Duration of the LLM call, None if it was skipped.
+        """
+        with self._lock:
+            self.comments_total += total
+            self.comments_sent += sent
+            if seconds is None:
+                self.skipped_calls += 1
+            else:
+                self.llm_calls += 1
+                self.llm_seconds += seconds
+
+    @property
+    def saved_seconds(self) -> float:
+        """Estimated LLM latency saved by the skipped calls."""
+        if not self.llm_calls:
+            return 0.0
+        return self.skipped_calls * self.llm_seconds / self.llm_calls
+
+    def summary(self) -> str:
+        return (f"LLM filter calls: {self.llm_calls} made, {self.skipped_calls} skipped (~{self.saved_seconds:.1f}s "
+                f"saved); {self.comments_sent}/{self.comments_total} comments sent to the LLM.")
+
+
+filter_stats = FilterStats()
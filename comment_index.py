@@ -0,0 +1,113 @@
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+from comment_filter import normalize_text
+
+
+def comment_location(suggestion: Dict) -> tuple:
+    """Returns the file and the line range (first, last) a suggestion is attached to."""
+    lines = [line for line in suggestion.get("lines") or [] if isinstance(line, int)]
+    return suggestion.get("file"), (min(lines), max(lines)) if lines else None
+
+
+def comment_fingerprint(suggestion: Dict) -> str:
+    """
+    Computes a stable fingerprint of a suggestion from its file, line range and normalized title and text,
+    so that case, punctuation and whitespace changes do not change it.
+
+    Args:
+        suggestion (Dict): A suggestion (see agent_graph.Answered).
+
+    Returns:
+        str: Hex digest identifying the suggestion.
+    """
+    filename, line_range = comment_location(suggestion)
+    key = "\x1f".join([
+        str(filename),
+        str(line_range),
+        normalize_text(suggestion.get("title", "")),
+        normalize_text(suggestion.get("suggestion", ""))
+    ])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class CommentIndex:
+    """
+    Hashed index of suggestions by fingerprint and by location.
+
+    A suggestion matches the index if a suggestion with the same fingerprint was added, or, with
+    match_location, any suggestion on the same file and lines: the filter LLM sometimes rewrites the text of the
+    comments it keeps.
+    """
+
+    def __init__(self, suggestions: Optional[Iterable[Dict]] = None, match_location: bool = False):
+        """
+        Args:
+            suggestions (Optional[Iterable[Dict]]): Suggestions to index.
+            match_location (bool): Also match suggestions on the same file and lines with a different text.
+        """
+        self.match_location = match_location
+        self._fingerprints: Dict[str, Dict] = {}
+        self._locations: Dict[tuple, int] = {}
+        for suggestion in suggestions or []:
+            self.add(suggestion)
+
+    def add(self, suggestion: Dict) -> bool:
+        """
+        Adds a suggestion to the index.
+
+        Args:
+            suggestion (Dict): The suggestion.
+
+        Returns:
+            bool: False if a suggestion with the same fingerprint was already indexed.
+        """
+        fingerprint = comment_fingerprint(suggestion)
+        if fingerprint in self._fingerprints:
+            return False
+        self._fingerprints[fingerprint] = suggestion
+        location = comment_location(suggestion)
+        self._locations[location] = self._locations.get(location, 0) + 1
+        return True
+
+    def __contains__(self, suggestion: Dict) -> bool:
+        if comment_fingerprint(suggestion) in self._fingerprints:
+            return True
+        return self.match_location and comment_location(suggestion) in self._locations
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def fingerprints(self) -> List[str]:
+        """Returns the fingerprints of the indexed suggestions."""
+        return list(self._fingerprints)
+
+
+def dedupe_suggestions(suggestions: Iterable[Dict]) -> List[Dict]:
+    """
+    Drops suggestions whose fingerprint was already seen, keeping the first occurrence.
+
+    Args:
+        suggestions (Iterable[Dict]): The suggestions.
+
+    Returns:
+        List[Dict]: The unique suggestions in their original order.
+    """
+    index = CommentIndex()
+    return [suggestion for suggestion in suggestions if index.add(suggestion)]
+
+
+def diff_comments(initial: List[Dict], kept: List[Dict]) -> List[Dict]:
+    """
+    Returns the initial suggestions that the filter dropped, in linear time. Suggestions the filter kept with a
+    rewritten text still count as kept when they stay on the same file and lines.
+
+    Args:
+        initial (List[Dict]): Suggestions before filtering.
+        kept (List[Dict]): Suggestions after filtering.
+
+    Returns:
+        List[Dict]: The dropped suggestions.
+    """
+    kept_index = CommentIndex(kept, match_location=True)
+    return [suggestion for suggestion in initial if suggestion not in kept_index]
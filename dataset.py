@@ -1,9 +1,10 @@
-from tools import get_commits_before_date_comment, get_pull_request_commits_content, get_pull_request_comments, process_pull_request_diffs
-from utils import get_first_comment_date
+from tools import get_commits_before_date_comment, get_pull_request_commits_content, get_pull_request_comments
+from dataset_store import get_dataset_store
+from github_graphql import fetch_pull_request_overview
+from utils import get_first_comment_date, parse_github_pull_request_url
 from rich import print as pp
 from datetime import datetime
 import json
-import time
 from tqdm import tqdm
 from langsmith import Client
 import pandas as pd
@@ -34,72 +35,68 @@ meta_universe_pull_requests = [
 
 file_path = "data.json"
 results = []
-#
+
+
+def collect_pull_request(url: str, task_name: str, backend: str = "graphql", max_workers: int = 8) -> dict:
+    """
+    Collects the commits made before the first review comment and the first round of review comments of a pull request.
+    GitHub requests are paced by the client's rate limit scheduler, so no fixed sleeps are needed between pull requests.
+
+    Args:
+        url (str): The URL of the GitHub pull request.
+        task_name (str): Name of the assignment the pull request solves.
+        backend (str): Backend used to list commits and comments, "graphql" or "rest".
+        max_workers (int): Maximum number of concurrent commit detail requests (1 fetches them sequentially).
+
+    Returns:
+        dict: The pull request entry in the data.json format.
+    """
+    # Create a dictionary for the pull request data
+    pull_request = {
+        "task_name": task_name,
+        "url": url
+    }
+
+    # One GraphQL query returns both the commits and the comments of the pull request
+    overview = None
+    if backend == "graphql":
+        owner, repo, pull_number = parse_github_pull_request_url(url)
+        overview = fetch_pull_request_overview(owner, repo, pull_number)
+
+    # Retrieve commits and comments for the pull request
+    commits = get_pull_request_commits_content(url, max_workers=max_workers, backend=backend, overview=overview)
+    comments = get_pull_request_comments(url, backend=backend, overview=overview)
+
+    # Get the date of the first comment
+    first_comment_date = get_first_comment_date(comments)
+
+    # Filter commits that occurred before the first comment date
+    filtered_commits = get_commits_before_date_comment(commits, first_comment_date)
+
+    # Store the filtered commits in a structured format
+    pull_request["content"] = {str(filtered_commit["commit_date"]): filtered_commit["files"] for filtered_commit in filtered_commits}
+
+    pull_request["comments"] = [comment for comment in comments if 0 <= (datetime.strptime(comment["date"], '%Y-%m-%dT%H:%M:%SZ') - first_comment_date).total_seconds() <= 3600]
+    return pull_request
+
+
 # for gruppirovka_pull_request in tqdm(gruppirovka_pull_requests, desc="Processing Gruppirovka Pull Requests"):
-#     time.sleep(5)
-#     # Create a dictionary for the pull request data
-#     pull_request = {
-#         "task_name": "Группировка пользователей по возрасту",
-#         "url": gruppirovka_pull_request
-#     }
-#
-#     # Retrieve commits and comments for the pull request
-#     commits = get_pull_request_commits_content(gruppirovka_pull_request)
-#     time.sleep(5)
-#     comments = get_pull_request_comments(gruppirovka_pull_request)
-#
-#     # Get the date of the first comment
-#     first_comment_date = get_first_comment_date(comments)
-#
-#     # Filter commits that occurred before the first comment date
-#     filtered_commits = get_commits_before_date_comment(commits, first_comment_date)
-#
-#     # Store the filtered commits in a structured format
-#     pull_request["content"] = {str(filtered_commit["commit_date"]): filtered_commit["files"] for filtered_commit in filtered_commits}
-#
-#     pull_request["comments"] = [comment for comment in comments if 0 <= (datetime.strptime(comment["date"], '%Y-%m-%dT%H:%M:%SZ') - first_comment_date).total_seconds() <= 3600]
-#     results.append(pull_request)
+#     results.append(collect_pull_request(gruppirovka_pull_request, "Группировка пользователей по возрасту"))
 #
 # for meta_universe_pull_request in tqdm(meta_universe_pull_requests, desc="Processing Meta Universe Pull Requests"):
-#     time.sleep(5)
-#     # Create a dictionary for the pull request data
-#     pull_request = {
-#         "task_name": "Meta-вселенная?",
-#         "url": meta_universe_pull_request
-#     }
-#
-#     # Retrieve commits and comments for the pull request
-#     commits = get_pull_request_commits_content(meta_universe_pull_request)
-#     time.sleep(5)
-#     comments = get_pull_request_comments(meta_universe_pull_request)
-#
-#     # Get the date of the first comment
-#     first_comment_date = get_first_comment_date(comments)
-#
-#     # Filter commits that occurred before the first comment date
-#     filtered_commits = get_commits_before_date_comment(commits, first_comment_date)
-#
-#     # Store the filtered commits in a structured format
-#     pull_request["content"] = {str(filtered_commit["commit_date"]): filtered_commit["files"] for filtered_commit in filtered_commits}
-#
-#     pull_request["comments"] = [comment for comment in comments if 0 <= (datetime.strptime(comment["date"], '%Y-%m-%dT%H:%M:%SZ') - first_comment_date).total_seconds() <= 3600]
-#     results.append(pull_request)
+#     results.append(collect_pull_request(meta_universe_pull_request, "Meta-вселенная?"))
 #
 # with open(file_path, "w") as outfile:
 #     json.dump(results, outfile, indent=4, ensure_ascii=False)
 
-# with open(file_path, "r") as f:
-#     results = json.load(f)
-#
+# store = get_dataset_store(file_path)
 #
-# for pull_request in tqdm(results, desc = "Processing Pull Requests"):
-#     # Find the index of the pull request
-#     index = results.index(pull_request)
-#     # Process the pull request diffs and get the code
-#     results[index]["content"] = process_pull_request_diffs(index, "data.json")
+# for index, pull_request in enumerate(tqdm(store, desc = "Processing Pull Requests")):
+#     # Reconstruct the code of the pull request from its commits
+#     pull_request["content"] = store.get_files(index)
 #
 # with open(file_path, "w") as f:
-#     json.dump(results, f, indent=4, ensure_ascii=False)
+#     json.dump(store.pull_requests, f, indent=4, ensure_ascii=False)
 
 #
 client = Client()
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Union
+
+from logger_setup import logger
+from patching import apply_patch
+
+
+def reconstruct_files(content: Union[List[Dict[str, str]], Dict[str, List[Dict[str, str]]]]) -> List[Dict[str, str]]:
+    """
+    Reconstructs the files of a dataset pull request.
+
+    Args:
+        content: Either the files already reconstructed, a list of {"filename", "content"}, or the commits as
+            collected by dataset.collect_pull_request, a dict of commit date to its {"filename", "changes"} patches.
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries with filename and content.
+    """
+    if isinstance(content, list):
+        return [{"filename": file["filename"], "content": file["content"]} for file in content]
+
+    files_content: Dict[str, str] = {}
+    # Apply diffs to the corresponding files, commit by commit
+    for timestamp, contents in content.items():
+        for change in contents:
+            filename = change["filename"]
+            # Files that existed before the pull request start from an empty file, their patches do not match it
+            # and are applied by position, as utils.apply_diff always did
+            result = apply_patch(files_content.get(filename, ""), change["changes"])
+            if result.by_position:
+                logger.info(f"{filename}: patch of {timestamp} applied by position, "
+                             f"{len(result.failed_hunks)} hunks do not match the reconstructed content.")
+            files_content[filename] = result.content
+
+    return [{"filename": filename, "content": file_content} for filename, file_content in files_content.items()]
+
+
+class DatasetStore:
+    """
+    A pull request dataset file (data.json) parsed once, with its pull requests indexed by URL and task name and
+    their files reconstructed on first access.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path to the JSON dataset.
+        """
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            self.pull_requests: List[Dict] = json.load(f)
+
+        self._by_url: Dict[str, int] = {}
+        self._by_task: Dict[str, List[int]] = {}
+        for index, pull_request in enumerate(self.pull_requests):
+            self._by_url.setdefault(pull_request["url"], index)
+            self._by_task.setdefault(pull_request.get("task_name"), []).append(index)
+
+        self._files: Dict[int, List[Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.pull_requests)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.pull_requests)
+
+    def index_of(self, url: str) -> int:
+        """
+        Returns the position of a pull request in the dataset.
+
+        Args:
+            url (str): The URL of the GitHub pull request.
+
+        Returns:
+            int: Index of the pull request.
+
+        Raises:
+            ValueError: If the pull request is not in the dataset.
+        """
+        index = self._by_url.get(url)
+        if index is None:
+            logger.error("Pull Request not found in dataset.")
+            raise ValueError("Pull Request not found in dataset.")
+        return index
+
+    def find(self, url: str) -> Optional[Dict]:
+        """Returns the dataset entry of a pull request, or None if it is not in the dataset."""
+        index = self._by_url.get(url)
+        return self.pull_requests[index] if index is not None else None
+
+    def by_task(self, task_name: str) -> List[Dict]:
+        """Returns the dataset entries of the pull requests solving a task, in dataset order."""
+        return [self.pull_requests[index] for index in self._by_task.get(task_name, [])]
+
+    @property
+    def task_names(self) -> List[str]:
+        return list(self._by_task)
+
+    def get_files(self, key: Union[int, str]) -> List[Dict[str, str]]:
+        """
+        Returns the reconstructed files of a pull request. The files are reconstructed once per pull request,
+        every call returns new file dicts, so callers may rewrite them (see tools.preprocessing_code_pr).
+
+        Args:
+            key (Union[int, str]): Index or URL of the pull request.
+
+        Returns:
+            List[Dict[str, str]]: A list of dictionaries with filename and content.
+        """
+        index = self.index_of(key) if isinstance(key, str) else key
+        with self._lock:
+            files = self._files.get(index)
+            if files is None:
+                files = reconstruct_files(self.pull_requests[index]["content"])
+                self._files[index] = files
+        return [dict(file) for file in files]
+
+
+_stores: Dict[str, tuple] = {}
+_stores_lock = threading.Lock()
+
+
+def get_dataset_store(path: str = "data.json") -> DatasetStore:
+    """
+    Returns the store of a dataset file, shared by the callers of the process. The file is parsed again only if it
+    changed on disk.
+
+    Args:
+        path (str): Path to the JSON dataset.
+
+    Returns:
+        DatasetStore: The store.
+    """
+    path = os.path.abspath(path)
+    modified = os.path.getmtime(path)
+    with _stores_lock:
+        cached = _stores.get(path)
+        if cached is None or cached[0] != modified:
+            cached = (modified, DatasetStore(path))
+            _stores[path] = cached
+            logger.info(f"Dataset {path} loaded: {len(cached[1])} pull requests.")
+        return cached[1]
@@ -0,0 +1,151 @@
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set
+
+
+class DiffStreamParser:
+    """
+    Incremental parser of a unified diff (git diff, or the application/vnd.github.diff media type of the GitHub API).
+    Lines are fed one by one and every file is returned as soon as the next file starts, so only the lines of one
+    file are held at a time. The patch of a file is in the format of the GitHub API "patch" field: its hunks
+    starting with the first "@@" header, without the diff/---/+++ header lines. Files without hunks (binary
+    files, mode changes, pure renames) have a None patch.
+    """
+
+    def __init__(self):
+        self._current: Optional[Dict] = None
+        self._hunk_lines: List[str] = []
+
+    def feed(self, line: str) -> Optional[Dict]:
+        """
+        Consumes the next line of the diff.
+
+        Args:
+            line (str): The line, without its newline.
+
+        Returns:
+            Optional[Dict]: The previous file with "filename", "status" and "patch", once this line starts a new one.
+        """
+        if line.startswith("diff --git "):
+            completed = self._flush()
+            # Fallback name for diffs without ---/+++ lines (binary files, pure renames)
+            self._current = {"filename": line.split(" b/", 1)[-1], "status": "modified"}
+            return completed
+
+        current = self._current
+        if current is None:
+            return None
+        if self._hunk_lines or line.startswith("@@"):
+            self._hunk_lines.append(line)
+        elif line.startswith("new file mode"):
+            current["status"] = "added"
+        elif line.startswith("deleted file mode"):
+            current["status"] = "removed"
+        elif line.startswith("rename to "):
+            current["filename"] = line[len("rename to "):]
+            current["status"] = "renamed"
+        elif line.startswith("+++ b/"):
+            current["filename"] = line[len("+++ b/"):]
+        elif line.startswith("--- a/") and current["status"] == "removed":
+            current["filename"] = line[len("--- a/"):]
+        return None
+
+    def close(self) -> Optional[Dict]:
+        """
+        Ends the diff.
+
+        Returns:
+            Optional[Dict]: The last file, if any.
+        """
+        return self._flush()
+
+    def _flush(self) -> Optional[Dict]:
+        completed = self._current
+        if completed is not None:
+            # git diff ends with a newline, GitHub patches do not
+            while self._hunk_lines and not self._hunk_lines[-1]:
+                self._hunk_lines.pop()
+            completed["patch"] = "\n".join(self._hunk_lines) if self._hunk_lines else None
+        self._current = None
+        self._hunk_lines = []
+        return completed
+
+
+def iter_diff_files(lines: Iterable[str]) -> Iterator[Dict]:
+    """
+    Splits a unified diff into files while it is read.
+
+    Args:
+        lines (Iterable[str]): Lines of the diff, e.g. GitHubClient.iter_lines.
+
+    Yields:
+        Dict: Every file with "filename", "status" and "patch" (None for files without hunks).
+    """
+    parser = DiffStreamParser()
+    for line in lines:
+        completed = parser.feed(line)
+        if completed is not None:
+            yield completed
+    completed = parser.close()
+    if completed is not None:
+        yield completed
+
+
+async def aiter_diff_files(lines: AsyncIterable[str]) -> AsyncIterator[Dict]:
+    """
+    Asynchronous version of iter_diff_files, e.g. over AsyncGitHubClient.iter_lines.
+
+    Args:
+        lines (AsyncIterable[str]): Lines of the diff.
+
+    Yields:
+        Dict: Every file with "filename", "status" and "patch" (None for files without hunks).
+    """
+    parser = DiffStreamParser()
+    async for line in lines:
+        completed = parser.feed(line)
+        if completed is not None:
+            yield completed
+    completed = parser.close()
+    if completed is not None:
+        yield completed
+
+
+def has_complete_patch(file: Dict) -> bool:
+    """
+    Checks the "patch" of a file of the GitHub API. GitHub leaves the patch out, or cuts it, for large diffs:
+    the patch is complete if it has as many added and removed lines as the file's "additions" and "deletions".
+
+    Args:
+        file (Dict): A file of the pull request files or commit endpoints.
+
+    Returns:
+        bool: False if the patch is missing or truncated.
+    """
+    patch = file.get("patch")
+    if not patch:
+        return False
+    if "additions" not in file or "deletions" not in file:
+        return True
+    additions = deletions = 0
+    for line in patch.split("\n"):
+        if line.startswith("+"):
+            additions += 1
+        elif line.startswith("-"):
+            deletions += 1
+    return additions == file["additions"] and deletions == file["deletions"]
+
+
+def files_missing_patches(files: List[Dict]) -> Set[str]:
+    """
+    Finds the files of the GitHub API whose changes have to be read from the full diff: files with line changes
+    whose patch is missing or truncated. Binary files have no line changes and are not part of it.
+
+    Args:
+        files (List[Dict]): Files of the pull request files or commit endpoints.
+
+    Returns:
+        Set[str]: Names of the files.
+    """
+    return {
+        file["filename"] for file in files
+        if not has_complete_patch(file) and (file.get("additions", 0) or file.get("deletions", 0))
+    }
@@ -1,19 +1,22 @@
 from langgraph.graph import StateGraph, START, END
-from langchain_openai import ChatOpenAI
 from typing_extensions import TypedDict
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel, Field, ValidationError
 from prompts import *
 from tools import *
 from dotenv import load_dotenv
+from llm_cache import configure_llm_cache
+from llm_registry import get_chain
+from utils import render_code
+from dataset_store import get_dataset_store
 from os import getenv
+import asyncio
 import time
-import json
 from rich import print as pp
 
 
 load_dotenv()
+configure_llm_cache()
 
 
 class State(TypedDict):
@@ -40,23 +43,18 @@ def get_pr(state: State):
     return {"message": [code]}
 
 
+async def aget_pr(state: State):
+    start = time.time()
+    code = await aget_pull_request_content(state["message"][0])
+    print(f"Pull Request{time.time() - start}")
+    return {"message": [code]}
+
+
 def get_code_for_testing(state: dict):
-    # Load the JSON data from file
-    with open("studio/data.json", "r") as f:
-        result = json.load(f)
-
-    # Extract the pull request by matching the URL from the state
-    pull_request = next((pr for pr in result if pr["url"] == state["message"][0]), None)
-
-    if pull_request:
-        # Find the index of the pull request
-        index = result.index(pull_request)
-        # Process the pull request diffs and get the code
-        code = process_pull_request_diffs(index, "studio/data.json")
-        return {"message": [code]}
-    else:
-        logger.error("Pull Request not found in dataset.")
-        raise ValueError("Pull Request not found in dataset.")
+    # The dataset is parsed once and indexed by URL, the files of a pull request are reconstructed once
+    store = get_dataset_store("studio/data.json")
+    code = store.get_files(state["message"][0])
+    return {"message": [code]}
 
 
 def preprocessing_code(state: State):
@@ -66,29 +64,28 @@ def preprocessing_code(state: State):
     return {"message": [new_code]}
 
 
-def model_invoke(state: State):
-    start = time.time()
-    # Check if the OpenAI API key is available
-    api_key = getenv("OPENAI_API_KEY")
-    if not api_key:
-        logger.error("OPENAI_API_KEY not found in environment variables.")
-        raise "OPENAI_API_KEY is missing in the environment variables."
-
-    # Initialize LLM and parser
+def create_chain(template: str):
+    """
+    Returns the shared prompt | llm | parser chain for one of the review prompts from the chain registry.
+    """
     try:
-        llm = ChatOpenAI(
-            api_key=api_key,
-            model="gpt-4o-mini"
-        )
+        return get_chain(template, "gpt-4o-mini", ListSuggestion)
     except Exception as e:
-        logger.error(f"Error while initiating model:{e}")
+        logger.error(f"Error while initiating chain:{e}")
         raise
 
-    try:
-        parser = JsonOutputParser(pydantic_object=ListSuggestion)
-    except Exception as e:
-        logger.error(f"Error while initiating parser:{e}")
-        raise
+
+def llm_result(response) -> dict:
+    # Parse the response
+    if response:
+        return {"message": [response]}
+    else:
+        logger.error("Empty response from the LLM.")
+        return {"message": []}
+
+
+def prepare_model_invoke(state: State):
+    chain, parser = create_chain(prompt_full_code_template)
 
     # PR Code
     code = state["message"][0]
@@ -100,85 +97,91 @@ def model_invoke(state: State):
     if not nb_content:
         raise ValueError("No content found from Notion documents.")
 
-    # Prepare the prompt
-    prompt = PromptTemplate.from_template(prompt_full_code_template)
+    return chain, {
+        "code": render_code(code),
+        "context": nb_content,
+        "format_instructions": parser.get_format_instructions()
+    }
 
-    # Chain the components and invoke LLM
-    chain = prompt | llm | parser
+
+def model_invoke(state: State):
+    start = time.time()
+    chain, inputs = prepare_model_invoke(state)
+
+    # Invoke LLM
+    response = None
     try:
-        response = chain.invoke({
-            "code": code,
-            "context": nb_content,
-            "format_instructions": parser.get_format_instructions()
-        })
+        response = chain.invoke(inputs)
     except Exception as e:
         logger.error(f"Error while invoking LLM:{e}")
     print(f"Generate Comments{time.time() - start}")
-    # Parse the response
-    if response:
-        return {"message": [response]}
-    else:
-        logger.error("Empty response from the LLM.")
-        return {"message": []}
+    return llm_result(response)
 
 
-# Здесь продолжить
-def filter_comments(state: State):
+async def amodel_invoke(state: State):
     start = time.time()
-    # Check if the OpenAI API key is available
-    api_key = getenv("OPENAI_API_KEY")
-    if not api_key:
-        logger.error("OPENAI_API_KEY not found in environment variables.")
-        raise "OPENAI_API_KEY is missing in the environment variables."
+    chain, inputs = await asyncio.to_thread(prepare_model_invoke, state)
 
-    # Initialize LLM and parser
+    # Invoke LLM
+    response = None
     try:
-        llm = ChatOpenAI(
-            api_key=api_key,
-            model="gpt-4o-mini"
-        )
+        response = await chain.ainvoke(inputs)
     except Exception as e:
-        logger.error(f"Error while initiating model:{e}")
-        raise
+        logger.error(f"Error while invoking LLM:{e}")
+    print(f"Generate Comments{time.time() - start}")
+    return llm_result(response)
 
-    try:
-        parser = JsonOutputParser(pydantic_object=ListSuggestion)
-    except Exception as e:
-        logger.error(f"Error while initiating parser:{e}")
-        raise
+
+def prepare_filter_comments(state: State):
+    chain, parser = create_chain(prompt_filter_comments)
 
     code = state["message"][0]
     if not code:
         raise ValueError(f"No content found for the pull request at URL:")
 
-    # Prepare the prompt
-    prompt = PromptTemplate.from_template(prompt_filter_comments)
+    return chain, {
+        "comments": code,
+        "format_instructions": parser.get_format_instructions()
+    }
+
+
+# Здесь продолжить
+def filter_comments(state: State):
+    start = time.time()
+    chain, inputs = prepare_filter_comments(state)
+
+    # Invoke LLM
+    response = None
+    try:
+        response = chain.invoke(inputs)
+    except Exception as e:
+        logger.error(f"Error while invoking LLM:{e}")
+
+    print(f"Filter Comments{time.time() - start}")
+    return llm_result(response)
+
 
-    # Chain the components and invoke LLM
-    chain = prompt | llm | parser
+async def afilter_comments(state: State):
+    start = time.time()
+    chain, inputs = prepare_filter_comments(state)
+
+    # Invoke LLM
+    response = None
     try:
-        response = chain.invoke({
-            "comments": code,
-            "format_instructions": parser.get_format_instructions()
-        })
+        response = await chain.ainvoke(inputs)
     except Exception as e:
         logger.error(f"Error while invoking LLM:{e}")
 
     print(f"Filter Comments{time.time() - start}")
-    # Parse the response
-    if response:
-        return {"message": [response]}
-    else:
-        logger.error("Empty response from the LLM.")
-        return {"message": []}
+    return llm_result(response)
 
 
 builder = StateGraph(State)
-builder.add_node("GitHub PR", get_pr)
+builder.add_node("GitHub PR", RunnableLambda(get_pr, afunc=aget_pr))
 builder.add_node("Test Pull Request", get_code_for_testing)
 builder.add_node("Assign Lines", preprocessing_code)
-builder.add_node("Generate Comments", model_invoke)
-builder.add_node("Filter Comments", filter_comments)
+builder.add_node("Generate Comments", RunnableLambda(model_invoke, afunc=amodel_invoke))
+builder.add_node("Filter Comments", RunnableLambda(filter_comments, afunc=afilter_comments))
 
 builder.add_edge(START, "GitHub PR")
 
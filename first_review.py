@@ -1,6 +1,3 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from rich import print as pp
@@ -8,12 +5,17 @@ from tools import *
 from prompts import *
 from logger_setup import *
 from dotenv import load_dotenv
+from llm_cache import configure_llm_cache
+from llm_registry import get_chain
+from utils import render_code
 from pydantic import BaseModel, Field, ValidationError
+from langchain_core.runnables import RunnableLambda
 import os
 import time
 
 # Load environment variables
 load_dotenv()
+configure_llm_cache()
 
 class State(TypedDict):
     message: list
@@ -43,6 +45,16 @@ def get_pr(state: State):
     return {"message": [code]}
 
 
+async def aget_pr(state: State):
+    """
+    Fetches the pull request content without blocking the event loop.
+    """
+    start = time.time()
+    code = await aget_pull_request_content(state["message"][0])
+    print(f"Pull Request{time.time() - start}")
+    return {"message": [code]}
+
+
 def preprocessing_code(state: State):
     """
     Preprocesses the pull request content to assign lines.
@@ -53,32 +65,15 @@ def preprocessing_code(state: State):
     return {"message": [new_code]}
 
 
-def first_review_invoke(state: State):
+def prepare_first_review(state: State, nb_content: list):
     """
-    Invoke the LLM with the content of the pull request and additional context from Notion docs.
+    Builds the review chain and its inputs from the pull request content and the Notion docs.
     """
-    logger.info("first_review_invoke() called")
-
-    # Check if the OpenAI API key is available
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        logger.error("OPENAI_API_KEY not found in environment variables.")
-        raise ValueError("OPENAI_API_KEY is missing in the environment variables.")
-
-    # Initialize LLM and parser
+    # Shared chain from the registry, raises EnvironmentError if the OpenAI API key is missing
     try:
-        llm = ChatOpenAI(
-            api_key=api_key,
-            model="gpt-4o"
-        )
+        chain, parser = get_chain(prompt_full_code_template, "gpt-4o", ListSuggestion)
     except Exception as e:
-        logger.error(f"Error while initiating model: {e}")
-        raise
-
-    try:
-        parser = JsonOutputParser(pydantic_object=ListSuggestion)
-    except Exception as e:
-        logger.error(f"Error while initiating parser: {e}")
+        logger.error(f"Error while initiating chain: {e}")
         raise
 
     # Fetch required content with error handling
@@ -86,26 +81,21 @@ def first_review_invoke(state: State):
     if not code:
         raise ValueError("No content found for the pull request at URL.")
 
-    nb_content = get_notion_docs(page_id="120ffd2d-b62a-8058-93e2-e14363c7b31e")
     if not nb_content:
         raise ValueError("No content found from Notion documents.")
 
-    # Prepare the prompt
-    prompt = PromptTemplate.from_template(prompt_full_code_template)
+    inputs = {
+        "code": render_code(code[0]),
+        "context": nb_content,
+        "format_instructions": parser.get_format_instructions()
+    }
+    return chain, inputs
 
-    # Chain the components and invoke LLM
-    chain = prompt | llm | parser
-    try:
-        response = chain.invoke({
-            "code": code,
-            "context": nb_content,
-            "format_instructions": parser.get_format_instructions()
-        })
-    except Exception as e:
-        logger.error(f"Error while invoking LLM: {e}")
-        response = None
 
-    # Parse the response
+def first_review_result(response) -> dict:
+    """
+    Wraps the LLM response into the graph state update.
+    """
     if response:
         return {"message": [response]}
     else:
@@ -113,11 +103,45 @@ def first_review_invoke(state: State):
         return {"message": []}
 
 
+def first_review_invoke(state: State):
+    """
+    Invoke the LLM with the content of the pull request and additional context from Notion docs.
+    """
+    logger.info("first_review_invoke() called")
+
+    nb_content = get_notion_docs(page_id="120ffd2d-b62a-8058-93e2-e14363c7b31e")
+    chain, inputs = prepare_first_review(state, nb_content)
+    try:
+        response = chain.invoke(inputs)
+    except Exception as e:
+        logger.error(f"Error while invoking LLM: {e}")
+        response = None
+
+    return first_review_result(response)
+
+
+async def afirst_review_invoke(state: State):
+    """
+    Asynchronous version of first_review_invoke.
+    """
+    logger.info("afirst_review_invoke() called")
+
+    nb_content = await aget_notion_docs(page_id="120ffd2d-b62a-8058-93e2-e14363c7b31e")
+    chain, inputs = prepare_first_review(state, nb_content)
+    try:
+        response = await chain.ainvoke(inputs)
+    except Exception as e:
+        logger.error(f"Error while invoking LLM: {e}")
+        response = None
+
+    return first_review_result(response)
+
+
 """Sets up the StateGraph for processing."""
 builder = StateGraph(State)
-builder.add_node("GitHub PR", get_pr)
+builder.add_node("GitHub PR", RunnableLambda(get_pr, afunc=aget_pr))
 builder.add_node("Assign Lines", preprocessing_code)
-builder.add_node("Generate Comments", first_review_invoke)
+builder.add_node("Generate Comments", RunnableLambda(first_review_invoke, afunc=afirst_review_invoke))
 builder.add_edge(START, "GitHub PR")
 builder.add_edge("GitHub PR", "Assign Lines")
 builder.add_edge("Assign Lines", "Generate Comments")
@@ -125,4 +149,5 @@ builder.add_edge("Generate Comments", END)
 
 graph = builder.compile()
 
-print(graph.invoke({"message": ["https://github.com/kuchikihater/gruppirovka/pull/6"]}))
\ No newline at end of file
+if __name__ == "__main__":
+    print(graph.invoke({"message": ["https://github.com/kuchikihater/gruppirovka/pull/6"]}))
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+import subprocess
+import threading
+from typing import Dict, List, Optional
+
+from logger_setup import logger
+from diff_stream import iter_diff_files
+
+
+def split_diff_by_file(diff: str) -> List[Dict[str, str]]:
+    """
+    Splits the output of git diff into per-file patches in the format of the GitHub API "patch" field,
+    i.e. the hunks of a file starting with the first "@@" header and without the diff/---/+++ header lines.
+
+    Args:
+        diff (str): Output of git diff / git diff-tree -p.
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries with "filename", "status" and "patch", None for files
+        without hunks (binary files, mode changes, pure renames).
+    """
+    return list(iter_diff_files(diff.split("\n")))
+
+
+class GitMirror:
+    """
+    Local bare mirror of a GitHub repository including the refs/pull/*/head refs of its pull requests.
+    Diffs are computed with local git instead of the REST API.
+    """
+
+    def __init__(self, remote_url: str, path: str):
+        """
+        Args:
+            remote_url (str): URL (or local path) of the repository to mirror.
+            path (str): Directory of the bare mirror, created on the first sync.
+        """
+        self.remote_url = remote_url
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _git(self, *args: str) -> str:
+        """
+        Runs a git command in the mirror.
+
+        Args:
+            *args (str): Arguments of the git command.
+
+        Returns:
+            str: Standard output of the command.
+
+        Raises:
+            RuntimeError: If the git command fails.
+        """
+        env = {**os.environ, "TZ": "UTC"}
+        result = subprocess.run(
+            ["git", "--git-dir", self.path, *args], capture_output=True, text=True, env=env, encoding="utf-8"
+        )
+        if result.returncode != 0:
+            logger.error(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+            raise RuntimeError(f"git {args[0]} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    def sync(self) -> None:
+        """
+        Creates the mirror if needed and fetches new branches and pull request heads incrementally.
+        HEAD of the mirror is pointed at the default branch of the remote.
+        """
+        with self._lock:
+            if not os.path.isdir(self.path):
+                logger.info(f"Creating git mirror of {self.remote_url} in {self.path}")
+                os.makedirs(self.path)
+                self._git("init", "--bare", "--quiet")
+                self._git("remote", "add", "origin", self.remote_url)
+
+            self._git("fetch", "--prune", "--quiet", "origin",
+                      "+refs/heads/*:refs/heads/*", "+refs/pull/*/head:refs/pull/*/head")
+
+            for line in self._git("ls-remote", "--symref", "origin", "HEAD").splitlines():
+                if line.startswith("ref: "):
+                    self._git("symbolic-ref", "HEAD", line.split()[1])
+                    break
+
+    def _pull_range(self, pull_number: str, base: str) -> tuple:
+        """Returns the merge base with the base branch and the head commit of a pull request."""
+        head = self.get_pull_request_head(pull_number)
+        merge_base = self._git("merge-base", base, head).strip()
+        return merge_base, head
+
+    def get_pull_request_head(self, pull_number: str) -> str:
+        """Returns the SHA of the head commit of a pull request."""
+        return self._git("rev-parse", f"refs/pull/{pull_number}/head").strip()
+
+    def get_pull_request_content(self, pull_number: str, base: str = "HEAD") -> List[Dict[str, str]]:
+        """
+        Computes the files changed in a pull request, like tools.get_pull_request_content.
+
+        Args:
+            pull_number (str): The pull request number.
+            base (str): Base branch of the pull request, the default branch by default.
+
+        Returns:
+            List[Dict[str, str]]: A list of dictionaries containing filenames and their content changes.
+        """
+        merge_base, head = self._pull_range(pull_number, base)
+        diff = self._git("diff", "--no-color", "--no-ext-diff", "--find-renames", merge_base, head)
+        # Files without hunks (binary files, pure renames) have no code to review
+        return [
+            {"filename": file["filename"], "content": file["patch"]}
+            for file in split_diff_by_file(diff) if file["patch"] is not None
+        ]
+
+    def get_commit_details(self, sha: str) -> Dict:
+        """
+        Computes the details of a commit, like tools.get_commit_details. Removed files are left out and merge
+        commits are compared with their first parent.
+
+        Args:
+            sha (str): The commit SHA identifier.
+
+        Returns:
+            Dict: A dictionary with commit details including the commit date and modified files.
+        """
+        commit_date = self._git(
+            "log", "-1", "--format=%ad", "--date=format-local:%Y-%m-%dT%H:%M:%SZ", sha
+        ).strip()
+        diff = self._git(
+            "diff-tree", "-p", "-r", "-m", "--first-parent", "--root", "--no-commit-id",
+            "--no-color", "--no-ext-diff", "--find-renames", sha
+        )
+        return {
+            "commit_sha": sha,
+            "commit_date": commit_date,
+            "files": [
+                {"filename": file["filename"], "changes": file["patch"]}
+                for file in split_diff_by_file(diff) if file["status"] != "removed" and file["patch"] is not None
+            ]
+        }
+
+    def get_pull_request_commits_content(self, pull_number: str, base: str = "HEAD") -> List[Dict]:
+        """
+        Computes the per-commit details of a pull request, like tools.get_pull_request_commits_content.
+
+        Args:
+            pull_number (str): The pull request number.
+            base (str): Base branch of the pull request, the default branch by default.
+
+        Returns:
+            List[Dict]: Commit details of the pull request commits, oldest commit first.
+        """
+        merge_base, head = self._pull_range(pull_number, base)
+        shas = self._git("rev-list", "--reverse", "--topo-order", f"{merge_base}..{head}").split()
+        return [self.get_commit_details(sha) for sha in shas]
+
+
+_mirrors: Dict[str, GitMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_git_mirror(owner: str, repo: str, sync: bool = True) -> GitMirror:
+    """
+    Returns the mirror of a GitHub repository, synced with the remote.
+    Mirrors live in GIT_MIRROR_DIR (".cache/mirrors" by default). The remote is built from
+    GIT_MIRROR_REMOTE ("https://github.com/{owner}/{repo}.git" by default), which can point at local
+    repositories, e.g. "/path/to/fixtures/{owner}/{repo}".
+
+    Args:
+        owner (str): The repository owner.
+        repo (str): The repository name.
+        sync (bool): Fetch new branches and pull request heads before returning.
+
+    Returns:
+        GitMirror: The repository mirror.
+    """
+    key = f"{owner}/{repo}"
+    with _mirrors_lock:
+        mirror: Optional[GitMirror] = _mirrors.get(key)
+        if mirror is None:
+            remote_template = os.getenv("GIT_MIRROR_REMOTE", "https://github.com/{owner}/{repo}.git")
+            path = os.path.join(os.getenv("GIT_MIRROR_DIR", ".cache/mirrors"), owner, f"{repo}.git")
+            mirror = GitMirror(remote_template.format(owner=owner, repo=repo), os.path.abspath(path))
+            _mirrors[key] = mirror
+    if sync:
+        mirror.sync()
+    return mirror
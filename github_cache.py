@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from logger_setup import logger
+
+
+@dataclass
+class CachedResponse:
+    """A GitHub API response body stored together with its validators."""
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    next_url: Optional[str]
+    immutable: bool
+
+
+class ResponseCache:
+    """
+    On-disk (SQLite) cache of GitHub API responses.
+
+    Entries are revalidated with If-None-Match / If-Modified-Since, immutable entries are served without
+    a request at all. The total size of stored bodies is bounded, least recently used entries are evicted first.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 200 * 1024 * 1024):
+        """
+        Args:
+            path (str): Path of the SQLite database file, parent directories are created if needed.
+            max_bytes (int): Maximum total size of cached bodies in bytes.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, int] = {"hits": 0, "revalidated": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                next_url TEXT,
+                immutable INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """
+        Looks up a cached response and marks it as recently used.
+
+        Args:
+            url (str): Full request URL including the query string.
+
+        Returns:
+            Optional[CachedResponse]: The cached response or None if the URL is not cached.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, next_url, immutable FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._connection.commit()
+        return CachedResponse(body=row[0], etag=row[1], last_modified=row[2], next_url=row[3], immutable=bool(row[4]))
+
+    def record(self, event: str) -> None:
+        """
+        Counts a cache lookup outcome.
+
+        Args:
+            event (str): "hits" (served without a request), "revalidated" (GitHub answered 304 Not Modified)
+                or "misses" (the body had to be downloaded).
+        """
+        with self._lock:
+            self.stats[event] += 1
+
+    def put(self, url: str, response: CachedResponse) -> None:
+        """
+        Stores a response and evicts least recently used entries if the cache grows over its size limit.
+
+        Args:
+            url (str): Full request URL including the query string.
+            response (CachedResponse): The response body and its validators.
+        """
+        size = len(response.body.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.warning(f"Response for {url} is larger than the cache limit, not cached.")
+            return
+
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, response.body, response.etag, response.last_modified, response.next_url,
+                 int(response.immutable), size, time.time())
+            )
+            self.stats["stores"] += 1
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self) -> None:
+        """Deletes least recently used entries until the total size fits into max_bytes."""
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._connection.execute("SELECT url, size FROM responses ORDER BY accessed_at").fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """Removes all cached responses."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
@@ -0,0 +1,601 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from logger_setup import logger
+from github_cache import CachedResponse, ResponseCache
+from rate_limit import RateLimitScheduler
+
+load_dotenv()
+
+GITHUB_API_URL = "https://api.github.com"
+
+# Media type of the unified diff of a pull request or a commit
+DIFF_MEDIA_TYPE = "application/vnd.github.diff"
+
+# Commits addressed by their full SHA never change, they are served from the cache without revalidation
+IMMUTABLE_URL_PATTERN = re.compile(r"/repos/[^/]+/[^/]+/commits/[0-9a-f]{40}(\?.*)?$")
+
+
+def github_headers(api_key: str) -> Dict[str, str]:
+    """
+    Builds the default headers of GitHub API requests.
+
+    Args:
+        api_key (str): GitHub API token used for the Authorization header.
+
+    Returns:
+        Dict[str, str]: The request headers.
+    """
+    return {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {api_key}",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+
+
+def raise_github_error(status_code: int, api_url: str, error: Exception) -> None:
+    """
+    Logs a failed GitHub API request and raises the matching exception.
+
+    Args:
+        status_code (int): HTTP status code of the response.
+        api_url (str): The URL of the request.
+        error (Exception): The HTTP error raised by the HTTP library.
+
+    Raises:
+        Exception: If an error occurs corresponding to the processed status code.
+    """
+    if status_code == 403:
+        logger.error('GitHub API rate limit exceeded.')
+        raise Exception('GitHub API rate limit exceeded.') from error
+    elif status_code == 404:
+        logger.error(f'GitHub resource not found: {api_url}')
+        raise Exception('Pull request not found.') from error
+    else:
+        logger.error(f'HTTP error occurred: {error}')
+        raise error
+
+
+class BaseGitHubClient:
+    """
+    Response caching and rate limiting shared by the synchronous and the asynchronous GitHub clients.
+    """
+
+    def __init__(self, per_page: int = 100, cache: Optional[ResponseCache] = None,
+                 scheduler: Optional[RateLimitScheduler] = None):
+        """
+        Args:
+            per_page (int): Page size requested from list endpoints (GitHub allows up to 100).
+            cache (Optional[ResponseCache]): On-disk response cache, responses are not cached if None.
+            scheduler (Optional[RateLimitScheduler]): Rate limit scheduler, a default one is created if None.
+        """
+        self.per_page = per_page
+        self.cache = cache
+        self.scheduler = scheduler or RateLimitScheduler()
+
+    def _lookup(self, url: str) -> Tuple[Optional[CachedResponse], Dict[str, str]]:
+        """
+        Looks up a cached response and builds the conditional request headers to revalidate it.
+
+        Args:
+            url (str): Full request URL including the query string.
+
+        Returns:
+            Tuple[Optional[CachedResponse], Dict[str, str]]: The cached response and the request headers.
+        """
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        elif cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+        return cached, headers
+
+    def _store(self, url: str, headers: Mapping[str, str], body: str, next_url: Optional[str]) -> None:
+        """
+        Stores a downloaded response in the cache if it can be revalidated or never changes.
+
+        Args:
+            url (str): Full request URL including the query string.
+            headers (Mapping[str, str]): Response headers.
+            body (str): Response body.
+            next_url (Optional[str]): URL of the next page, if any.
+        """
+        if not self.cache:
+            return
+        self.cache.record("misses")
+        immutable = bool(IMMUTABLE_URL_PATTERN.search(url))
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if immutable or etag or last_modified:
+            self.cache.put(url, CachedResponse(
+                body=body,
+                etag=etag,
+                last_modified=last_modified,
+                next_url=next_url,
+                immutable=immutable
+            ))
+
+
+class GitHubClient(BaseGitHubClient):
+    """
+    Thin GitHub REST API client built on a pooled keep-alive requests.Session.
+    List endpoints are read page by page (per_page=100) following the Link header.
+    With a ResponseCache, responses are revalidated with conditional requests (304 responses do not count
+    against the rate limit) and immutable resources are served without a request.
+    Requests are paced by a RateLimitScheduler, rate limited requests are retried after the backoff GitHub asks for.
+    """
+
+    def __init__(
+            self,
+            api_key: str,
+            timeout: float = 30,
+            pool_size: int = 16,
+            per_page: int = 100,
+            cache: Optional[ResponseCache] = None,
+            scheduler: Optional[RateLimitScheduler] = None
+    ):
+        """
+        Args:
+            api_key (str): GitHub API token used for the Authorization header.
+            timeout (float): Timeout in seconds for connecting and reading a response.
+            pool_size (int): Maximum number of keep-alive connections kept in the pool.
+            per_page (int): Page size requested from list endpoints (GitHub allows up to 100).
+            cache (Optional[ResponseCache]): On-disk response cache, responses are not cached if None.
+            scheduler (Optional[RateLimitScheduler]): Rate limit scheduler, a default one is created if None.
+        """
+        super().__init__(per_page=per_page, cache=cache, scheduler=scheduler)
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(github_headers(api_key))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _fetch(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, Optional[str]]:
+        """
+        Makes a GET request to the GitHub API and handles possible errors.
+
+        Args:
+            api_url (str): The URL for the request to the GitHub API.
+            params (Optional[Dict[str, Any]]): Query parameters for the request.
+
+        Returns:
+            Tuple[Any, Optional[str]]: The decoded response data and the URL of the next page, if any.
+
+        Raises:
+            Exception: If an error occurs corresponding to the processed status code.
+        """
+        url = requests.Request("GET", api_url, params=params).prepare().url
+        cached, headers = self._lookup(url)
+        if cached and cached.immutable:
+            self.cache.record("hits")
+            return json.loads(cached.body), cached.next_url
+
+        try:
+            # Revalidate the cached entry instead of downloading it again
+            response = self._send(url, headers)
+            if response.status_code == 304 and cached:
+                self.cache.record("revalidated")
+                return json.loads(cached.body), cached.next_url
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            raise_github_error(e.response.status_code, api_url, e)
+        except requests.exceptions.RequestException as e:
+            logger.error(f'HTTP request failed: {e}')
+            raise
+
+        next_url = response.links.get("next", {}).get("url")
+        self._store(url, response.headers, response.text, next_url)
+        return response.json(), next_url
+
+    def _send(self, url: str, headers: Dict[str, str], method: str = "GET", **kwargs) -> requests.Response:
+        """
+        Sends a request paced by the rate limit scheduler, retrying while GitHub reports a rate limit.
+
+        Args:
+            url (str): Full request URL.
+            headers (Dict[str, str]): Additional request headers.
+            method (str): HTTP method of the request.
+            **kwargs: Additional arguments for requests.Session.request.
+
+        Returns:
+            requests.Response: The last response received.
+        """
+        attempt = 0
+        while True:
+            self.scheduler.wait()
+            response = self.session.request(method, url, headers=headers, timeout=self.timeout, **kwargs)
+            self.scheduler.update(response.headers)
+            if self.scheduler.backoff_delay(response.status_code, response.headers, response.text, attempt) is None:
+                return response
+            attempt += 1
+
+    def graphql(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Runs a query against the GitHub GraphQL API.
+
+        Args:
+            query (str): The GraphQL query.
+            variables (Dict[str, Any]): Values of the query variables.
+
+        Returns:
+            Dict[str, Any]: The "data" part of the response.
+
+        Raises:
+            Exception: If the request fails or GitHub reports errors for the query.
+        """
+        try:
+            response = self._send(f"{GITHUB_API_URL}/graphql", {}, method="POST",
+                                  json={"query": query, "variables": variables})
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logger.error(f'GitHub GraphQL request failed: {e}')
+            raise
+
+        result = response.json()
+        if result.get("errors"):
+            logger.error(f'GitHub GraphQL query failed: {result["errors"]}')
+            raise Exception(f'GitHub GraphQL query failed: {result["errors"][0].get("message")}')
+        return result["data"]
+
+    def post(self, api_url: str, payload: Dict[str, Any]) -> Any:
+        """
+        Creates a GitHub API resource, e.g. a pull request review. The request is not cached.
+
+        Args:
+            api_url (str): The URL for the request to the GitHub API.
+            payload (Dict[str, Any]): The JSON body of the request.
+
+        Returns:
+            Any: The decoded JSON response.
+
+        Raises:
+            Exception: If an error occurs corresponding to the processed status code.
+        """
+        try:
+            response = self._send(api_url, {}, method="POST", json=payload)
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            raise_github_error(e.response.status_code, api_url, e)
+        except requests.exceptions.RequestException as e:
+            logger.error(f'HTTP request failed: {e}')
+            raise
+        return response.json()
+
+    def get(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Fetches a single (non paginated) GitHub API resource.
+
+        Args:
+            api_url (str): The URL for the request to the GitHub API.
+            params (Optional[Dict[str, Any]]): Query parameters for the request.
+
+        Returns:
+            Any: The decoded JSON response.
+        """
+        data, _ = self._fetch(api_url, params)
+        return data
+
+    def iter_pages(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> Iterator[Dict]:
+        """
+        Streams all items of a paginated GitHub API list endpoint.
+        Pages are requested lazily, the next page is only fetched once the current one is consumed.
+
+        Args:
+            api_url (str): The URL of the list endpoint.
+            params (Optional[Dict[str, Any]]): Query parameters for the first page.
+
+        Yields:
+            Dict: Items of the list, in the order returned by GitHub.
+        """
+        params = {"per_page": self.per_page, **(params or {})}
+        next_url: Optional[str] = api_url
+        while next_url:
+            items, next_url = self._fetch(next_url, params)
+            # The next page URL already carries the query string
+            params = None
+            yield from items
+
+    def get_all(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Collects all items of a paginated GitHub API list endpoint.
+
+        Args:
+            api_url (str): The URL of the list endpoint.
+            params (Optional[Dict[str, Any]]): Query parameters for the first page.
+
+        Returns:
+            List[Dict]: All items from all pages.
+        """
+        return list(self.iter_pages(api_url, params))
+
+    def iter_lines(self, api_url: str, accept: str = DIFF_MEDIA_TYPE) -> Iterator[str]:
+        """
+        Streams a GitHub API resource in a text media type line by line, e.g. the unified diff of a pull request
+        or a commit. The response is read as it arrives and is neither held in memory nor cached.
+
+        Args:
+            api_url (str): The URL of the resource.
+            accept (str): Media type of the response, the unified diff by default.
+
+        Yields:
+            str: Lines of the response, without their newline.
+
+        Raises:
+            Exception: If an error occurs corresponding to the processed status code.
+        """
+        self.scheduler.wait()
+        try:
+            with self.session.get(api_url, headers={"Accept": accept}, stream=True, timeout=self.timeout) as response:
+                self.scheduler.update(response.headers)
+                response.raise_for_status()
+                response.encoding = response.encoding or "utf-8"
+                # requests.Response.iter_lines also splits lines at "\r", the text is split on "\n" only
+                pending = ""
+                for text in response.iter_content(chunk_size=65536, decode_unicode=True):
+                    lines = (pending + text).split("\n")
+                    pending = lines.pop()
+                    yield from lines
+                if pending:
+                    yield pending
+        except requests.exceptions.HTTPError as e:
+            raise_github_error(e.response.status_code, api_url, e)
+        except requests.exceptions.RequestException as e:
+            logger.error(f'HTTP request failed: {e}')
+            raise
+
+
+class AsyncGitHubClient(BaseGitHubClient):
+    """
+    Asynchronous counterpart of GitHubClient built on a pooled httpx.AsyncClient.
+    It shares the response cache and the rate limit scheduler with the synchronous client.
+    """
+
+    def __init__(
+            self,
+            api_key: str,
+            timeout: float = 30,
+            pool_size: int = 32,
+            per_page: int = 100,
+            cache: Optional[ResponseCache] = None,
+            scheduler: Optional[RateLimitScheduler] = None
+    ):
+        """
+        Args:
+            api_key (str): GitHub API token used for the Authorization header.
+            timeout (float): Timeout in seconds for connecting and reading a response.
+            pool_size (int): Maximum number of keep-alive connections kept in the pool.
+            per_page (int): Page size requested from list endpoints (GitHub allows up to 100).
+            cache (Optional[ResponseCache]): On-disk response cache, responses are not cached if None.
+            scheduler (Optional[RateLimitScheduler]): Rate limit scheduler, a default one is created if None.
+        """
+        super().__init__(per_page=per_page, cache=cache, scheduler=scheduler)
+        self.client = httpx.AsyncClient(
+            headers=github_headers(api_key),
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def _fetch(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[Any, Optional[str]]:
+        """
+        Makes a GET request to the GitHub API and handles possible errors.
+
+        Args:
+            api_url (str): The URL for the request to the GitHub API.
+            params (Optional[Dict[str, Any]]): Query parameters for the request.
+
+        Returns:
+            Tuple[Any, Optional[str]]: The decoded response data and the URL of the next page, if any.
+
+        Raises:
+            Exception: If an error occurs corresponding to the processed status code.
+        """
+        url = requests.Request("GET", api_url, params=params).prepare().url
+        # SQLite cache reads and writes block, they run in a worker thread to keep the event loop free
+        cached, headers = await asyncio.to_thread(self._lookup, url)
+        if cached and cached.immutable:
+            self.cache.record("hits")
+            return json.loads(cached.body), cached.next_url
+
+        try:
+            response = await self._send(url, headers)
+            if response.status_code == 304 and cached:
+                self.cache.record("revalidated")
+                return json.loads(cached.body), cached.next_url
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise_github_error(e.response.status_code, api_url, e)
+        except httpx.HTTPError as e:
+            logger.error(f'HTTP request failed: {e}')
+            raise
+
+        next_url = response.links.get("next", {}).get("url")
+        await asyncio.to_thread(self._store, url, response.headers, response.text, next_url)
+        return response.json(), next_url
+
+    async def _send(self, url: str, headers: Dict[str, str], method: str = "GET", **kwargs) -> httpx.Response:
+        """
+        Sends a request paced by the rate limit scheduler, retrying while GitHub reports a rate limit.
+
+        Args:
+            url (str): Full request URL.
+            headers (Dict[str, str]): Additional request headers.
+            method (str): HTTP method of the request.
+            **kwargs: Additional arguments for httpx.AsyncClient.request.
+
+        Returns:
+            httpx.Response: The last response received.
+        """
+        attempt = 0
+        while True:
+            delay = self.scheduler.delay_before_request()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+            self.scheduler.update(response.headers)
+            if self.scheduler.backoff_delay(response.status_code, response.headers, response.text, attempt) is None:
+                return response
+            attempt += 1
+
+    async def get(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Fetches a single (non paginated) GitHub API resource.
+
+        Args:
+            api_url (str): The URL for the request to the GitHub API.
+            params (Optional[Dict[str, Any]]): Query parameters for the request.
+
+        Returns:
+            Any: The decoded JSON response.
+        """
+        data, _ = await self._fetch(api_url, params)
+        return data
+
+    async def iter_pages(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict]:
+        """
+        Streams all items of a paginated GitHub API list endpoint.
+
+        Args:
+            api_url (str): The URL of the list endpoint.
+            params (Optional[Dict[str, Any]]): Query parameters for the first page.
+
+        Yields:
+            Dict: Items of the list, in the order returned by GitHub.
+        """
+        params = {"per_page": self.per_page, **(params or {})}
+        next_url: Optional[str] = api_url
+        while next_url:
+            items, next_url = await self._fetch(next_url, params)
+            params = None
+            for item in items:
+                yield item
+
+    async def get_all(self, api_url: str, params: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Collects all items of a paginated GitHub API list endpoint.
+
+        Args:
+            api_url (str): The URL of the list endpoint.
+            params (Optional[Dict[str, Any]]): Query parameters for the first page.
+
+        Returns:
+            List[Dict]: All items from all pages.
+        """
+        return [item async for item in self.iter_pages(api_url, params)]
+
+    async def iter_lines(self, api_url: str, accept: str = DIFF_MEDIA_TYPE) -> AsyncIterator[str]:
+        """
+        Streams a GitHub API resource in a text media type line by line, see GitHubClient.iter_lines.
+
+        Args:
+            api_url (str): The URL of the resource.
+            accept (str): Media type of the response, the unified diff by default.
+
+        Yields:
+            str: Lines of the response, without their newline.
+        """
+        delay = self.scheduler.delay_before_request()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            async with self.client.stream("GET", api_url, headers={"Accept": accept}) as response:
+                self.scheduler.update(response.headers)
+                response.raise_for_status()
+                # httpx.Response.aiter_lines also splits lines at "\r", the text is split on "\n" only
+                pending = ""
+                async for text in response.aiter_text():
+                    lines = (pending + text).split("\n")
+                    pending = lines.pop()
+                    for line in lines:
+                        yield line
+                if pending:
+                    yield pending
+        except httpx.HTTPStatusError as e:
+            raise_github_error(e.response.status_code, api_url, e)
+        except httpx.HTTPError as e:
+            logger.error(f'HTTP request failed: {e}')
+            raise
+
+    async def aclose(self) -> None:
+        """Closes the pooled connections."""
+        await self.client.aclose()
+
+
+_client: Optional[GitHubClient] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncGitHubClient]" = weakref.WeakKeyDictionary()
+_cache: Optional[ResponseCache] = None
+_scheduler = RateLimitScheduler()
+_client_lock = threading.Lock()
+
+
+def _github_api_key() -> str:
+    """
+    Reads the GitHub API key and opens the shared response cache on first use.
+
+    Returns:
+        str: The GitHub API key.
+
+    Raises:
+        EnvironmentError: If the GitHub API key is not found in environment variables.
+    """
+    global _cache
+    api_key = os.getenv("GITHUB_API_KEY")
+    if not api_key:
+        logger.error('GitHub API key not found in environment variables.')
+        raise EnvironmentError('GitHub API key not found in environment variables.')
+
+    cache_path = os.getenv("GITHUB_CACHE_PATH", ".cache/github.sqlite3")
+    if _cache is None and cache_path:
+        _cache = ResponseCache(cache_path, max_bytes=int(os.getenv("GITHUB_CACHE_MAX_MB", "200")) * 1024 * 1024)
+    return api_key
+
+
+def get_github_client() -> GitHubClient:
+    """
+    Returns the process-wide GitHub client, creating it on first use.
+    Responses are cached in GITHUB_CACHE_PATH (".cache/github.sqlite3" by default) up to GITHUB_CACHE_MAX_MB
+    megabytes, setting GITHUB_CACHE_PATH to an empty string disables the cache.
+
+    Returns:
+        GitHubClient: The shared client.
+
+    Raises:
+        EnvironmentError: If the GitHub API key is not found in environment variables.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GitHubClient(_github_api_key(), cache=_cache, scheduler=_scheduler)
+        return _client
+
+
+def get_async_github_client() -> AsyncGitHubClient:
+    """
+    Returns the asynchronous GitHub client of the running event loop, creating it on first use.
+    It shares the response cache and the rate limit quota with get_github_client().
+
+    Returns:
+        AsyncGitHubClient: The client bound to the running event loop.
+
+    Raises:
+        EnvironmentError: If the GitHub API key is not found in environment variables.
+    """
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncGitHubClient(_github_api_key(), cache=_cache, scheduler=_scheduler)
+            _async_clients[loop] = client
+        return client
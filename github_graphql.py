@@ -0,0 +1,190 @@
+from typing import Any, Dict, List, Optional
+
+from logger_setup import logger
+from github_client import GitHubClient, get_github_client
+
+PULL_REQUEST_QUERY = """
+query(
+    $owner: String!, $repo: String!, $number: Int!,
+    $commitsCursor: String, $threadsCursor: String, $commentsCursor: String,
+    $withCommits: Boolean!, $withThreads: Boolean!, $withComments: Boolean!
+) {
+  repository(owner: $owner, name: $repo) {
+    pullRequest(number: $number) {
+      author { login }
+      headRefOid
+      commits(first: 100, after: $commitsCursor) @include(if: $withCommits) {
+        pageInfo { hasNextPage endCursor }
+        nodes { commit { oid authoredDate } }
+      }
+      reviewThreads(first: 100, after: $threadsCursor) @include(if: $withThreads) {
+        pageInfo { hasNextPage endCursor }
+        nodes {
+          id
+          comments(first: 100) {
+            pageInfo { hasNextPage endCursor }
+            nodes { path diffHunk body updatedAt author { login } }
+          }
+        }
+      }
+      comments(first: 100, after: $commentsCursor) @include(if: $withComments) {
+        pageInfo { hasNextPage endCursor }
+        nodes { body updatedAt author { login } }
+      }
+    }
+  }
+}
+"""
+
+# Further pages of the comments of one review thread
+THREAD_COMMENTS_QUERY = """
+query($id: ID!, $cursor: String) {
+  node(id: $id) {
+    ... on PullRequestReviewThread {
+      comments(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { path diffHunk body updatedAt author { login } }
+      }
+    }
+  }
+}
+"""
+
+# Connection name in the query -> (cursor variable, include flag variable)
+CONNECTIONS = {
+    "commits": ("commitsCursor", "withCommits"),
+    "reviewThreads": ("threadsCursor", "withThreads"),
+    "comments": ("commentsCursor", "withComments"),
+}
+
+
+def fetch_pull_request_overview(
+        owner: str,
+        repo: str,
+        pull_number: str,
+        connections: tuple = ("commits", "reviewThreads", "comments"),
+        client: Optional[GitHubClient] = None
+) -> Dict[str, Any]:
+    """
+    Fetches the author, head SHA, commits and both kinds of comments of a pull request with GraphQL.
+    Everything comes back in one round trip, further queries are only made for connections with more than 100 nodes
+    and only request the connections that still have pages left.
+
+    Args:
+        owner (str): The repository owner.
+        repo (str): The repository name.
+        pull_number (str): The pull request number.
+        connections (tuple): Connections to fetch, any of "commits", "reviewThreads" and "comments".
+        client (Optional[GitHubClient]): GitHub client to use, the shared client by default.
+
+    Returns:
+        Dict[str, Any]: A dictionary with "author", "head_sha" and a list of nodes for every requested connection.
+    """
+    client = client or get_github_client()
+
+    variables = {"owner": owner, "repo": repo, "number": int(pull_number)}
+    for name, (cursor_variable, include_variable) in CONNECTIONS.items():
+        variables[cursor_variable] = None
+        variables[include_variable] = name in connections
+
+    overview = {name: [] for name in connections}
+    while True:
+        pull_request = client.graphql(PULL_REQUEST_QUERY, variables)["repository"]["pullRequest"]
+        if pull_request is None:
+            logger.error('Pull request not found.')
+            raise Exception('Pull request not found.')
+
+        overview["author"] = (pull_request.get("author") or {}).get("login")
+        overview["head_sha"] = pull_request["headRefOid"]
+
+        has_next_page = False
+        for name, (cursor_variable, include_variable) in CONNECTIONS.items():
+            if not variables[include_variable]:
+                continue
+            connection = pull_request[name]
+            overview[name].extend(connection["nodes"])
+            # Only ask again for the connections that have more pages
+            variables[include_variable] = connection["pageInfo"]["hasNextPage"]
+            variables[cursor_variable] = connection["pageInfo"]["endCursor"]
+            has_next_page = has_next_page or variables[include_variable]
+
+        if not has_next_page:
+            break
+
+    # Threads with more than 100 comments are completed one by one
+    for thread in overview.get("reviewThreads", []):
+        fetch_remaining_thread_comments(thread, client)
+    return overview
+
+
+def fetch_remaining_thread_comments(thread: Dict[str, Any], client: GitHubClient) -> None:
+    """
+    Reads the comments of a review thread past its first page, in place.
+
+    Args:
+        thread (Dict[str, Any]): A "reviewThreads" node of PULL_REQUEST_QUERY.
+        client (GitHubClient): GitHub client to use.
+    """
+    comments = thread["comments"]
+    page_info = comments.get("pageInfo") or {}
+    while page_info.get("hasNextPage"):
+        node = client.graphql(THREAD_COMMENTS_QUERY, {"id": thread["id"], "cursor": page_info["endCursor"]})["node"]
+        if node is None:
+            logger.warning(f"Review thread {thread['id']} not found, its comments are incomplete.")
+            break
+        comments["nodes"].extend(node["comments"]["nodes"])
+        page_info = node["comments"]["pageInfo"]
+    comments["pageInfo"] = page_info
+
+
+def get_commits_from_overview(overview: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Extracts the commit SHAs and author dates from a pull request overview, oldest commit first.
+
+    Args:
+        overview (Dict[str, Any]): Result of fetch_pull_request_overview with the "commits" connection.
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries with "sha" and "date" (e.g. 2024-10-01T12:00:00Z).
+    """
+    return [
+        {"sha": node["commit"]["oid"], "date": node["commit"]["authoredDate"]}
+        for node in overview["commits"]
+    ]
+
+
+def get_comments_from_overview(overview: Dict[str, Any]) -> List[Dict[str, str]]:
+    """
+    Builds the comment list returned by tools.get_pull_request_comments from a pull request overview.
+    Comments made by the pull request author are skipped.
+
+    Args:
+        overview (Dict[str, Any]): Result of fetch_pull_request_overview with "reviewThreads" and "comments".
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries containing the comment text, code snippet, and the date.
+    """
+    pr_creator = overview["author"]
+    comments_info = []
+
+    # Process code comments and collect the needed information
+    for thread in overview["reviewThreads"]:
+        for comment in thread["comments"]["nodes"]:
+            if (comment.get("author") or {}).get("login") != pr_creator:
+                comments_info.append({
+                    "filename": comment["path"],
+                    "code": comment.get("diffHunk") or "",
+                    "comment": comment["body"],
+                    "date": comment["updatedAt"]
+                })
+
+    # Process general comments and collect the needed information
+    for comment in overview["comments"]:
+        if (comment.get("author") or {}).get("login") != pr_creator:
+            comments_info.append({
+                "filename": None,
+                "code": None,
+                "comment": comment["body"],
+                "date": comment["updatedAt"]
+            })
+    return comments_info
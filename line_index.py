@@ -0,0 +1,160 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from logger_setup import logger
+from code_lines import PreprocessedFile, REMOVED
+
+
+@dataclass
+class LineAnchor:
+    """Where a suggestion attaches to the diff, in the terms of the GitHub pull request review comments API."""
+    file: str
+    start_line: int  # first line of the range in the new version of the file
+    line: int  # last line of the range
+    side: str  # "RIGHT": the new version of the file
+    hunk: int  # index of the hunk of the range in the file
+    start_position: int  # diff positions of the first and the last line
+    position: int
+    clamped: bool  # the range was cut to the lines of the diff
+
+
+class DiffLineIndex:
+    """
+    Resolves the [start, end] line ranges of suggestions in the reviewed diff, with binary searches in the line
+    numbers and hunk boundaries kept by code_lines.PreprocessedFile. A range is cut to the lines of the diff of one
+    hunk, ranges without any line in the diff and files that are not part of it are rejected.
+    """
+
+    def __init__(self, files: List[PreprocessedFile]):
+        """
+        Args:
+            files (List[PreprocessedFile]): Output of tools.preprocessing_code_pr.
+        """
+        self.files: Dict[str, PreprocessedFile] = {file.filename: file for file in files}
+        # File name suffixes ("Main.java", "app/Main.java") -> full paths, the model often shortens paths
+        self._suffixes: Dict[str, List[str]] = {}
+        for filename in self.files:
+            parts = filename.split("/")
+            for index in range(1, len(parts)):
+                self._suffixes.setdefault("/".join(parts[index:]), []).append(filename)
+
+    def resolve_file(self, filename: Optional[str]) -> Optional[str]:
+        """
+        Finds the reviewed file a suggestion names, by its full path or an unambiguous end of its path.
+
+        Args:
+            filename (Optional[str]): The file name of the suggestion.
+
+        Returns:
+            Optional[str]: The path of the file in the diff, None for files that are not part of it.
+        """
+        if not filename:
+            return None
+        filename = filename.strip().removeprefix("./").lstrip("/")
+        if filename in self.files:
+            return filename
+        candidates = self._suffixes.get(filename, [])
+        return candidates[0] if len(candidates) == 1 else None
+
+    def resolve(self, filename: Optional[str], lines: List[int]) -> Tuple[Optional[LineAnchor], str]:
+        """
+        Resolves the line range of a suggestion to the diff.
+
+        Args:
+            filename (Optional[str]): The file name of the suggestion.
+            lines (List[int]): The start and end line (or a single line) in the new version of the file.
+
+        Returns:
+            Tuple[Optional[LineAnchor], str]: The anchor, None if the suggestion is rejected, and the reason
+            ("ok", "clamped", "unknown file", "no lines" or "outside diff").
+        """
+        path = self.resolve_file(filename)
+        if path is None:
+            return None, "unknown file"
+        lines = [line for line in lines or [] if isinstance(line, int)]
+        if not lines:
+            return None, "no lines"
+        first, last = min(lines), max(lines)
+
+        file = self.files[path]
+        numbers = file.line_numbers
+        start = self._first_right_line(file, bisect_left(numbers, first))
+        end = bisect_right(numbers, last) - 1
+        # Removed lines after the last line of a hunk carry the number of a line outside the diff
+        while end >= 0 and file.kinds[end] == REMOVED:
+            end -= 1
+        if start is None or end < start:
+            return None, "outside diff"
+
+        # A review comment cannot span hunks: the range is cut to the hunk of its first line
+        hunk = bisect_right(file.hunk_starts, start) - 1
+        if bisect_right(file.hunk_starts, end) - 1 != hunk:
+            end = file.hunk_starts[hunk + 1] - 1
+            while file.kinds[end] == REMOVED:
+                end -= 1
+
+        clamped = numbers[start] != first or numbers[end] != last
+        anchor = LineAnchor(
+            file=path,
+            start_line=numbers[start],
+            line=numbers[end],
+            side="RIGHT",
+            hunk=hunk,
+            start_position=file.positions[start],
+            position=file.positions[end],
+            clamped=clamped
+        )
+        return anchor, "clamped" if clamped else "ok"
+
+    @staticmethod
+    def _first_right_line(file: PreprocessedFile, index: int) -> Optional[int]:
+        """Returns the first line at or after an index that is in the new version of the file."""
+        numbers = file.line_numbers
+        while index < len(numbers):
+            # Removed lines come before the line whose number they carry
+            line = bisect_right(numbers, numbers[index]) - 1
+            if file.kinds[line] != REMOVED:
+                return line
+            index = line + 1
+        return None
+
+
+def anchor_suggestions(suggestions: List[Dict], files: List[PreprocessedFile]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Checks the files and line ranges of suggestions against the reviewed diff. Ranges are cut to the lines of
+    one hunk and file names are completed to their path in the pull request.
+
+    Args:
+        suggestions (List[Dict]): Suggestions (see agent_graph.Answered).
+        files (List[PreprocessedFile]): The reviewed files, output of tools.preprocessing_code_pr.
+
+    Returns:
+        Tuple[List[Dict], List[Dict]]: The suggestions with their resolved "file", "lines" and "anchor", and the
+        rejected suggestions.
+    """
+    index = DiffLineIndex(files)
+    anchored, rejected = [], []
+    counts: Dict[str, int] = {}
+    for suggestion in suggestions:
+        anchor, reason = index.resolve(suggestion.get("file"), suggestion.get("lines"))
+        counts[reason] = counts.get(reason, 0) + 1
+        if anchor is None:
+            logger.warning(f"Suggestion {suggestion.get('title')!r} on {suggestion.get('file')} "
+                           f"{suggestion.get('lines')} rejected: {reason}.")
+            rejected.append(suggestion)
+            continue
+        anchored.append({
+            **suggestion,
+            "file": anchor.file,
+            "lines": [anchor.start_line, anchor.line],
+            "anchor": {
+                "side": anchor.side,
+                "hunk": anchor.hunk,
+                "start_position": anchor.start_position,
+                "position": anchor.position
+            }
+        })
+    if suggestions:
+        logger.info(f"Suggestion anchors: {counts}")
+    return anchored, rejected
@@ -0,0 +1,174 @@
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.globals import get_llm_cache, set_llm_cache
+from langchain_core.load import dumps, loads
+
+from logger_setup import logger
+
+# Set inside llm_cache_bypass(): cached responses are ignored and replaced by fresh generations
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+class ReviewLLMCache(BaseCache):
+    """
+    Persistent, content-addressed cache of LLM responses stored in SQLite.
+
+    LangChain calls the cache with the rendered prompt (template, code, context and format instructions)
+    and the serialized model (model name and sampling parameters), the entry key is a hash of both.
+    Entries expire after max_age seconds, least recently used entries are evicted above max_entries.
+    """
+
+    def __init__(self, path: str = ".cache/llm.sqlite3", max_entries: int = 5000, max_age: float = 30 * 24 * 3600):
+        """
+        Args:
+            path (str): Path of the SQLite database file, parent directories are created if needed.
+            max_entries (int): Maximum number of cached responses.
+            max_age (float): Time in seconds after which a cached response expires.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0}
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        """Hashes the rendered prompt and the model parameters into the entry key."""
+        return hashlib.sha256(f"{llm_string}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        """
+        Looks up the cached generations for a prompt and model.
+
+        Args:
+            prompt (str): The serialized prompt messages.
+            llm_string (str): The serialized model and its parameters.
+
+        Returns:
+            Optional[RETURN_VAL_TYPE]: The cached generations, or None on a miss.
+        """
+        # The environment variable is read here: worker threads do not inherit a context variable set at import
+        if _bypass.get() or os.getenv("LLM_CACHE_BYPASS") == "1":
+            self.stats["bypassed"] += 1
+            return None
+
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or time.time() - row[1] > self.max_age:
+                self.stats["misses"] += 1
+                return None
+            self._connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+            self.stats["hits"] += 1
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            return [loads(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        """
+        Stores the generations for a prompt and model and evicts expired and least recently used entries.
+
+        Args:
+            prompt (str): The serialized prompt messages.
+            llm_string (str): The serialized model and its parameters.
+            return_val (RETURN_VAL_TYPE): The generations returned by the model.
+        """
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", LangChainBetaWarning)
+            response = json.dumps([dumps(generation) for generation in return_val])
+
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (self._key(prompt, llm_string), response, now, now)
+            )
+            self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+            self._connection.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self._connection.commit()
+
+    def clear(self, **kwargs: Any) -> None:
+        """Removes all cached responses."""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+
+def configure_llm_cache() -> Optional[BaseCache]:
+    """
+    Installs the persistent LLM response cache as the global LangChain cache, once per process.
+    The cache is stored in LLM_CACHE_PATH (".cache/llm.sqlite3" by default), setting LLM_CACHE_PATH to an
+    empty string disables it. LLM_CACHE_MAX_ENTRIES and LLM_CACHE_MAX_AGE_DAYS bound its size and age.
+
+    Returns:
+        Optional[BaseCache]: The installed cache, or None if caching is disabled.
+    """
+    cache = get_llm_cache()
+    if isinstance(cache, ReviewLLMCache):
+        return cache
+
+    path = os.getenv("LLM_CACHE_PATH", ".cache/llm.sqlite3")
+    if not path:
+        logger.info("LLM response cache disabled.")
+        return None
+
+    cache = ReviewLLMCache(
+        path,
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000")),
+        max_age=float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+    )
+    set_llm_cache(cache)
+    return cache
+
+
+@contextlib.contextmanager
+def llm_cache_bypass() -> Iterator[None]:
+    """
+    Ignores cached responses inside the block, fresh generations still replace the cached ones.
+    The environment variable LLM_CACHE_BYPASS=1 has the same effect for a whole run.
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
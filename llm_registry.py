@@ -0,0 +1,168 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple, Type
+
+import httpx
+from langchain_core.output_parsers import BaseOutputParser, JsonOutputParser, StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+from pydantic import BaseModel
+
+from logger_setup import logger
+
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_llms: Dict[tuple, ChatOpenAI] = {}
+_chains: Dict[tuple, Tuple[Runnable, BaseOutputParser]] = {}
+_lock = threading.RLock()
+
+
+def _http_timeout() -> httpx.Timeout:
+    """Timeout of the OpenAI HTTP clients, from LLM_TIMEOUT_SEC."""
+    return httpx.Timeout(float(os.getenv("LLM_TIMEOUT_SEC", "120")), connect=10.0)
+
+
+def _http_limits() -> httpx.Limits:
+    """Connection pool limits of the OpenAI HTTP clients, from LLM_MAX_CONNECTIONS."""
+    max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+
+class LoopLocalTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport with one connection pool per event loop, like github_client.get_async_github_client.
+    Pooled connections belong to the loop that opened them, so a pool shared between asyncio.run() calls fails
+    with "Event loop is closed" once its first loop is gone.
+    """
+
+    def __init__(self):
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = \
+            weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with _lock:
+            transport = self._transports.get(loop)
+            if transport is None:
+                transport = httpx.AsyncHTTPTransport(limits=_http_limits())
+                self._transports[loop] = transport
+            return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Closes the connections of the running loop."""
+        await self._transport().aclose()
+
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Returns the pooled HTTP clients shared by every model of the process. The sync client has one process-wide
+    pool, the async client keeps a pool per event loop (see LoopLocalTransport).
+
+    Returns:
+        Tuple[httpx.Client, httpx.AsyncClient]: The sync and async clients.
+    """
+    global _http_client, _async_http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(timeout=_http_timeout(), limits=_http_limits())
+            _async_http_client = httpx.AsyncClient(timeout=_http_timeout(), transport=LoopLocalTransport())
+        return _http_client, _async_http_client
+
+
+def get_llm(model: str = "gpt-4o-mini", **params) -> ChatOpenAI:
+    """
+    Returns the shared chat model for a model name and parameters, created on first use.
+
+    Args:
+        model (str): OpenAI model name.
+        **params: Further ChatOpenAI parameters, e.g. temperature.
+
+    Returns:
+        ChatOpenAI: The model.
+
+    Raises:
+        EnvironmentError: If the OPENAI_API_KEY environment variable is not set.
+    """
+    key = (model, tuple(sorted(params.items())))
+    with _lock:
+        llm = _llms.get(key)
+        if llm is None:
+            api_key = os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                logger.error("OPENAI_API_KEY not found in environment variables.")
+                raise EnvironmentError("OPENAI_API_KEY not found in environment variables.")
+
+            http_client, async_http_client = get_http_clients()
+            llm = ChatOpenAI(
+                api_key=api_key,
+                model=model,
+                http_client=http_client,
+                http_async_client=async_http_client,
+                **params
+            )
+            _llms[key] = llm
+        return llm
+
+
+def get_chain(
+        template: str,
+        model: str = "gpt-4o-mini",
+        pydantic_object: Optional[Type[BaseModel]] = None,
+        parser: str = "json"
+) -> Tuple[Runnable, BaseOutputParser]:
+    """
+    Returns the shared prompt | llm | parser chain for a template, model and parser, built on first use.
+
+    Args:
+        template (str): Prompt template.
+        model (str): OpenAI model name.
+        pydantic_object (Optional[Type[BaseModel]]): Schema of the JSON output, used for the format instructions.
+        parser (str): "json" parses the completion with JsonOutputParser, "str" returns the raw text.
+
+    Returns:
+        Tuple[Runnable, BaseOutputParser]: The chain and its output parser.
+    """
+    key = (template, model, pydantic_object, parser)
+    with _lock:
+        chain = _chains.get(key)
+        if chain is None:
+            if parser == "json":
+                output_parser = JsonOutputParser(pydantic_object=pydantic_object)
+            elif parser == "str":
+                output_parser = StrOutputParser()
+            else:
+                logger.error(f"Unknown output parser {parser}.")
+                raise ValueError(f"Unknown output parser {parser}.")
+
+            chain = (PromptTemplate.from_template(template) | get_llm(model) | output_parser, output_parser)
+            _chains[key] = chain
+        return chain
+
+
+def warm_up(connect: bool = True) -> None:
+    """
+    Builds the review chains and opens a connection to the OpenAI API ahead of the first request, to be called
+    when a service starts. Connection errors are logged, not raised.
+
+    Args:
+        connect (bool): Also open a connection with a request to the models endpoint.
+    """
+    # Imported here, importing the graph modules builds their chains through this registry
+    import agent_graph  # noqa: F401
+
+    if not connect:
+        return
+    http_client, _ = get_http_clients()
+    llm = get_llm()
+    base_url = str(llm.openai_api_base or "https://api.openai.com/v1").rstrip("/")
+    try:
+        http_client.get(f"{base_url}/models", headers={"Authorization": f"Bearer {os.getenv('OPENAI_API_KEY')}"})
+        logger.info("OpenAI connection pool warmed up.")
+    except httpx.HTTPError as e:
+        logger.warning(f"OpenAI warm-up request failed: {e}")
@@ -0,0 +1,163 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+HUNK_HEADER_PATTERN = re.compile(r'@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+# A whole hunk header line, captured, to split a patch at its headers
+HUNK_HEADER_LINE_PATTERN = re.compile(r'^(@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@[^\n]*)$', re.MULTILINE)
+
+# How far (in lines) a hunk is searched for around its expected position when its context moved
+MAX_HUNK_OFFSET = 200
+
+
+@dataclass
+class Hunk:
+    """A hunk of a unified diff: its header positions and its " ", "-" and "+" lines."""
+    header: str
+    old_start: int
+    new_start: int
+    lines: List[str] = field(default_factory=list)
+
+
+@dataclass
+class FailedHunk:
+    """A hunk whose context and removed lines were not found in the content."""
+    header: str
+    new_start: int
+    reason: str
+
+
+@dataclass
+class PatchResult:
+    """Content after applying a patch, and the hunks that could not be verified against the content."""
+    content: str
+    failed_hunks: List[FailedHunk] = field(default_factory=list)
+    # The patch was applied by position, without checking its context (see apply_patch_by_position)
+    by_position: bool = False
+
+
+def parse_hunks(diff: str) -> List[Hunk]:
+    """
+    Splits a GitHub "patch" (hunks without the file header lines) into hunks.
+    Lines before the first header form a hunk starting at line 1.
+
+    Args:
+        diff (str): The patch.
+
+    Returns:
+        List[Hunk]: The hunks in patch order.
+    """
+    # [lines before the first header, header, its lines, header, its lines, ...], split by the regex engine
+    # instead of checking every line in Python
+    parts = HUNK_HEADER_LINE_PATTERN.split(diff)
+    hunks: List[Hunk] = []
+    preamble = parts[0].splitlines()
+    if preamble:
+        hunks.append(Hunk(header="", old_start=1, new_start=1, lines=preamble))
+    for index in range(1, len(parts), 2):
+        header, body = parts[index], parts[index + 1]
+        match = HUNK_HEADER_PATTERN.match(header)
+        # The body starts with the newline that ends the header line
+        lines = body[1:].splitlines() if body.startswith("\n") else body.splitlines()
+        hunks.append(Hunk(header=header, old_start=int(match.group(1)), new_start=int(match.group(3)), lines=lines))
+    # "\ No newline at end of file" is not a line of the file
+    if "\\" in diff:
+        for hunk in hunks:
+            hunk.lines = [line for line in hunk.lines if not line.startswith('\\')]
+    return hunks
+
+
+def apply_patch_by_position(content: str, diff: str) -> str:
+    """
+    Applies a patch by the line numbers of its hunk headers alone, as utils.apply_diff always did: added lines are
+    inserted at their new-file position, removed lines are dropped where they are expected and context lines are not
+    checked. It is the only way to replay a patch on a file that is not known before it, e.g. a file that existed
+    before the pull request, replayed from an empty file.
+
+    Args:
+        content (str): The content before the patch, every line prefixed with "+".
+        diff (str): The patch.
+
+    Returns:
+        str: The content after the patch.
+    """
+    content_lines = content.splitlines()
+    line_index = 0
+    for line in diff.splitlines():
+        if line.startswith('@@'):
+            match = HUNK_HEADER_PATTERN.match(line)
+            if match:
+                line_index = int(match.group(3)) - 1
+        elif line.startswith('+'):
+            content_lines.insert(line_index, "+" + line[1:])
+            line_index += 1
+        elif line.startswith('-'):
+            if line_index < len(content_lines):
+                content_lines.pop(line_index)
+        else:
+            line_index += 1
+    return '\n'.join(content_lines)
+
+
+def _find_hunk(old_lines: List[str], expected: List[str], expected_start: int, position: int,
+               max_offset: int) -> Optional[int]:
+    """Finds where the context and removed lines of a hunk are in the old content, nearest to its position first."""
+    last = len(old_lines) - len(expected)
+    for distance in range(max_offset + 1):
+        for candidate in ((expected_start + distance, expected_start - distance) if distance else (expected_start,)):
+            if position <= candidate <= last and old_lines[candidate:candidate + len(expected)] == expected:
+                return candidate
+    return None
+
+
+def apply_patch(content: str, diff: str, max_offset: int = MAX_HUNK_OFFSET) -> PatchResult:
+    """
+    Applies a patch to a file reconstructed from patches, in one pass over the file.
+
+    The content has every line prefixed with "+" (the format of tools.process_pull_request_diffs). Hunks are placed
+    by their new-file start line, the context and removed lines are verified against the content and a hunk whose
+    context moved is searched up to max_offset lines around its position.
+
+    Files are replayed from an empty file, so the patches of a file that existed before the pull request have
+    context the content lacks. If a hunk matches nowhere, the whole patch is applied by position instead
+    (apply_patch_by_position, the previous behaviour) and the hunks are reported.
+
+    Args:
+        content (str): The content before the patch.
+        diff (str): The patch.
+        max_offset (int): Maximum distance in lines a hunk is searched from its expected position.
+
+    Returns:
+        PatchResult: The content after the patch and the hunks that could not be verified.
+    """
+    old_lines = content.splitlines()
+    new_lines: List[str] = []
+    failed_hunks: List[FailedHunk] = []
+    position = 0  # Next line of old_lines that was not copied to new_lines
+
+    for hunk in parse_hunks(diff):
+        # Lines the hunk expects in the old content: context lines and removed lines, in order, as stored
+        expected = ["+" + line[1:] for line in hunk.lines if line[:1] != '+']
+
+        expected_start = position + max(hunk.new_start - 1 - len(new_lines), 0)
+        start = _find_hunk(old_lines, expected, expected_start, position, max_offset)
+        if start is None:
+            failed_hunks.append(FailedHunk(
+                header=hunk.header, new_start=hunk.new_start,
+                reason=f"context does not match within {max_offset} lines of line {expected_start + 1}"
+            ))
+            continue
+        if failed_hunks:
+            continue
+
+        # Copy the unchanged lines up to the hunk, then the hunk's context and added lines: the context lines
+        # were verified, they are the same as in the content
+        new_lines.extend(old_lines[position:start])
+        new_lines.extend(["+" + line[1:] for line in hunk.lines if line[:1] != '-'])
+        position = start + len(expected)
+
+    if failed_hunks:
+        return PatchResult(content=apply_patch_by_position(content, diff), failed_hunks=failed_hunks, by_position=True)
+
+    new_lines.extend(old_lines[position:])
+    return PatchResult(content='\n'.join(new_lines), failed_hunks=failed_hunks)
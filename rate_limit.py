@@ -0,0 +1,116 @@
+import threading
+import time
+from typing import Mapping, Optional
+
+from logger_setup import logger
+
+
+class RateLimitScheduler:
+    """
+    Paces GitHub API requests using the X-RateLimit-* and Retry-After response headers.
+
+    Requests run at full speed while plenty of quota is left. Once the remaining quota drops to the reserve,
+    the remaining requests are spread evenly until the quota resets. Primary and secondary rate limit
+    responses put every thread sharing the scheduler on hold for the time GitHub asks for.
+    """
+
+    def __init__(self, reserve: int = 100, max_retries: int = 5, base_backoff: float = 60, max_backoff: float = 900):
+        """
+        Args:
+            reserve (int): Remaining quota below which requests start being spread until the reset.
+            max_retries (int): How many times a rate limited request is retried.
+            base_backoff (float): First backoff in seconds for secondary rate limits without Retry-After.
+            max_backoff (float): Upper bound in seconds for a single backoff.
+        """
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.blocked_until = 0.0
+        # Earliest time the next paced request may be sent, advanced by one interval per reservation
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def delay_before_request(self) -> float:
+        """
+        Reserves one request from the quota and returns how long to wait before sending it.
+
+        Returns:
+            float: Delay in seconds, 0 if the request can be sent right away.
+        """
+        with self._lock:
+            now = time.time()
+            delay = max(0.0, self.blocked_until - now)
+
+            if self.remaining is not None and self.reset_at is not None and now < self.reset_at:
+                if self.remaining <= 0:
+                    delay = max(delay, self.reset_at - now)
+                elif self.remaining <= self.reserve:
+                    # Concurrent reservations get consecutive slots instead of the same delay
+                    interval = (self.reset_at - now) / self.remaining
+                    slot = max(self.next_slot, now + delay)
+                    delay = slot - now
+                    self.next_slot = slot + interval
+                self.remaining -= 1
+            return delay
+
+    def wait(self) -> None:
+        """Blocks until the next request may be sent."""
+        delay = self.delay_before_request()
+        if delay > 0:
+            logger.info(f"GitHub rate limit pacing, waiting {delay:.1f}s.")
+            time.sleep(delay)
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """
+        Updates the known quota from the headers of a GitHub API response.
+
+        Args:
+            headers (Mapping[str, str]): Response headers.
+        """
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        with self._lock:
+            self.remaining = int(remaining)
+            self.reset_at = float(reset)
+
+    def backoff_delay(self, status_code: int, headers: Mapping[str, str], body: str, attempt: int) -> Optional[float]:
+        """
+        Checks whether a response was rate limited and, if so, how long to back off before retrying.
+        Every thread sharing the scheduler is held back for that time.
+
+        Args:
+            status_code (int): HTTP status code of the response.
+            headers (Mapping[str, str]): Response headers.
+            body (str): Response body, used to recognise secondary rate limits.
+            attempt (int): Number of the attempt that got this response, starting with 0.
+
+        Returns:
+            Optional[float]: Delay in seconds, or None if the response is not rate limited
+            or the retries are exhausted.
+        """
+        if status_code not in (403, 429) or attempt >= self.max_retries:
+            return None
+
+        retry_after = headers.get("Retry-After")
+        if retry_after is not None:
+            delay = float(retry_after)
+        elif headers.get("X-RateLimit-Remaining") == "0" and headers.get("X-RateLimit-Reset"):
+            delay = float(headers["X-RateLimit-Reset"]) - time.time() + 1
+        elif status_code == 429 or "secondary rate limit" in body.lower():
+            # No hint from GitHub, back off exponentially
+            delay = self.base_backoff * 2 ** attempt
+        else:
+            # A plain permission error, not a rate limit
+            return None
+
+        delay = min(max(delay, 1.0), self.max_backoff)
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.time() + delay)
+        logger.warning(f"GitHub API rate limited (status {status_code}), retrying in {delay:.0f}s.")
+        return delay
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from logger_setup import logger
+from chunking import file_hunks
+from utils import parse_code_line_number
+
+
+@dataclass
+class ReviewState:
+    """What was reviewed for a pull request: the head commit, the hunks of every file and the comments made."""
+    head_sha: Optional[str]
+    hunks: Dict[str, List[Dict]] = field(default_factory=dict)
+    comments: List[Dict] = field(default_factory=list)
+
+
+def hunk_hash(filename: str, lines: List[str]) -> str:
+    """
+    Hashes a hunk of a preprocessed file without its line numbers, so that hunks moved by changes above them
+    keep their hash.
+
+    Args:
+        filename (str): Path of the file.
+        lines (List[str]): Numbered lines of the hunk (see utils.format_code_line).
+
+    Returns:
+        str: Hex digest of the hunk.
+    """
+    content = "\n".join(line.split(" ", 1)[-1] for line in lines)
+    return hashlib.sha1(f"{filename}\n{content}".encode("utf-8")).hexdigest()
+
+
+def index_hunks(files: List[Dict[str, str]]) -> Dict[str, List[Dict]]:
+    """
+    Splits preprocessed files into hunks.
+
+    Args:
+        files (List[Dict[str, str]]): Output of tools.preprocessing_code_pr.
+
+    Returns:
+        Dict[str, List[Dict]]: For every file, its hunks with "hash", "start" and "end" line numbers and "lines".
+    """
+    hunks = {}
+    for file in files:
+        hunks[file["filename"]] = [
+            {
+                "hash": hunk_hash(file["filename"], lines),
+                "start": parse_code_line_number(lines[0]),
+                "end": parse_code_line_number(lines[-1]),
+                "lines": lines
+            }
+            for lines in file_hunks(file)
+        ]
+    return hunks
+
+
+def files_changed_since(commits: List[Dict], head_sha: str) -> Optional[Set[str]]:
+    """
+    Collects the files modified by the commits pushed after a reviewed head.
+
+    Args:
+        commits (List[Dict]): Output of tools.get_pull_request_commits_content, oldest commit first.
+        head_sha (str): The head that was reviewed.
+
+    Returns:
+        Optional[Set[str]]: The changed files, None if the head is no longer part of the pull request
+        (e.g. after a force push).
+    """
+    shas = [commit.get("commit_sha") for commit in commits]
+    if head_sha not in shas:
+        return None
+    return {file["filename"] for commit in commits[shas.index(head_sha) + 1:] for file in commit.get("files", [])}
+
+
+def plan_incremental_review(
+        files: List[Dict[str, str]],
+        previous: ReviewState,
+        changed_files: Optional[Set[str]] = None
+) -> tuple:
+    """
+    Selects the hunks that need a review and carries the previous comments on unchanged hunks forward,
+    shifted to the new line numbers of their hunk.
+
+    Args:
+        files (List[Dict[str, str]]): Output of tools.preprocessing_code_pr for the new head.
+        previous (ReviewState): State of the previous review.
+        changed_files (Optional[Set[str]]): Files modified since the previous review (see files_changed_since),
+            other files are known to be unchanged. None compares the hunks of every file.
+
+    Returns:
+        tuple: The preprocessed files restricted to new or changed hunks, and the carried forward comments.
+    """
+    changed_code = []
+    # Hash of an unchanged hunk -> line offset between its previous and its new position
+    unchanged: Dict[str, Dict[str, int]] = {}
+    for filename, hunks in index_hunks(files).items():
+        previous_starts = {hunk["hash"]: hunk["start"] for hunk in previous.hunks.get(filename, [])}
+        untouched = changed_files is not None and filename not in changed_files and filename in previous.hunks
+
+        changed_lines = []
+        for hunk in hunks:
+            if hunk["hash"] in previous_starts:
+                unchanged.setdefault(filename, {})[hunk["hash"]] = hunk["start"] - previous_starts[hunk["hash"]]
+            elif not untouched:
+                changed_lines.extend(hunk["lines"])
+        if changed_lines:
+            changed_code.append({"filename": filename, "content": "\n".join(changed_lines)})
+
+    carried_comments = []
+    for comment in previous.comments:
+        lines = [line for line in comment.get("lines") or [] if isinstance(line, int)]
+        offsets = unchanged.get(comment.get("file"), {})
+        for hunk in previous.hunks.get(comment.get("file"), []):
+            if lines and hunk["hash"] in offsets and hunk["start"] <= min(lines) and max(lines) <= hunk["end"]:
+                carried_comments.append({**comment, "lines": [line + offsets[hunk["hash"]] for line in lines]})
+                break
+
+    logger.info(f"Incremental review: {len(changed_code)} files with new hunks, "
+                f"{len(carried_comments)}/{len(previous.comments)} comments carried forward.")
+    return changed_code, carried_comments
+
+
+class ReviewStateStore:
+    """Per pull request review states stored in SQLite."""
+
+    def __init__(self, path: str = ".cache/review_state.sqlite3"):
+        """
+        Args:
+            path (str): Path of the SQLite database file, parent directories are created if needed.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reviews (
+                pull_request_link TEXT PRIMARY KEY,
+                head_sha TEXT,
+                hunks TEXT NOT NULL,
+                comments TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.commit()
+
+    def get(self, pull_request_link: str) -> Optional[ReviewState]:
+        """
+        Returns the last review state of a pull request.
+
+        Args:
+            pull_request_link (str): The pull request URL.
+
+        Returns:
+            Optional[ReviewState]: The state, or None if the pull request was not reviewed yet.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT head_sha, hunks, comments FROM reviews WHERE pull_request_link = ?", (pull_request_link,)
+            ).fetchone()
+        if row is None:
+            return None
+        return ReviewState(head_sha=row[0], hunks=json.loads(row[1]), comments=json.loads(row[2]))
+
+    def put(self, pull_request_link: str, state: ReviewState) -> None:
+        """
+        Stores the review state of a pull request. Only hunk hashes and ranges are kept, not the code.
+
+        Args:
+            pull_request_link (str): The pull request URL.
+            state (ReviewState): The state after the review.
+        """
+        hunks = {
+            filename: [{key: hunk[key] for key in ("hash", "start", "end")} for hunk in hunks_of_file]
+            for filename, hunks_of_file in state.hunks.items()
+        }
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO reviews VALUES (?, ?, ?, ?, ?)",
+                (pull_request_link, state.head_sha, json.dumps(hunks), json.dumps(state.comments, ensure_ascii=False),
+                 time.time())
+            )
+            self._connection.commit()
+
+
+_store: Optional[ReviewStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_review_state_store() -> ReviewStateStore:
+    """Returns the shared review state store, stored in REVIEW_STATE_PATH (".cache/review_state.sqlite3")."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReviewStateStore(os.getenv("REVIEW_STATE_PATH", ".cache/review_state.sqlite3"))
+        return _store
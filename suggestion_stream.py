@@ -0,0 +1,104 @@
+import json
+from typing import AsyncIterator, Dict, Iterator, List
+
+from langchain_core.runnables import Runnable
+
+from logger_setup import logger
+
+
+class SuggestionStreamParser:
+    """
+    Incremental parser for the JSON completion of the review chain ({"suggestions": [{...}, {...}]}).
+    Text chunks are fed as they arrive and every suggestion object is returned as soon as its closing brace
+    is received. Text around the JSON object (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._start = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """
+        Consumes the next chunk of the completion.
+
+        Args:
+            chunk (str): The new text.
+
+        Returns:
+            List[Dict]: The suggestions completed by this chunk.
+        """
+        completed = []
+        self._text += chunk
+        for index in range(self._position, len(self._text)):
+            char = self._text[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"' and self._stack:
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(char)
+                # An object directly inside the array of the top-level object is a suggestion
+                if self._stack == ["{", "[", "{"]:
+                    self._start = index
+            elif char in "}]" and self._stack:
+                self._stack.pop()
+                if char == "}" and self._stack == ["{", "["] and self._start is not None:
+                    suggestion = self._parse(self._text[self._start:index + 1])
+                    if suggestion is not None:
+                        completed.append(suggestion)
+                    self._start = None
+        self._position = len(self._text)
+        return completed
+
+    @staticmethod
+    def _parse(text: str):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            logger.error(f"Skipping malformed suggestion in the review stream: {e}")
+            return None
+
+
+def stream_suggestions(chain: Runnable, inputs: Dict) -> Iterator[Dict]:
+    """
+    Streams a text-producing review chain (prompt | llm | StrOutputParser) and yields every suggestion as soon
+    as it is complete.
+
+    Args:
+        chain (Runnable): Chain that streams the raw JSON completion.
+        inputs (Dict): Inputs of the chain.
+
+    Yields:
+        Dict: Suggestions in the order they are generated.
+    """
+    stream_parser = SuggestionStreamParser()
+    for chunk in chain.stream(inputs):
+        yield from stream_parser.feed(chunk)
+
+
+async def astream_suggestions(chain: Runnable, inputs: Dict) -> AsyncIterator[Dict]:
+    """
+    Async version of stream_suggestions.
+
+    Args:
+        chain (Runnable): Chain that streams the raw JSON completion.
+        inputs (Dict): Inputs of the chain.
+
+    Yields:
+        Dict: Suggestions in the order they are generated.
+    """
+    stream_parser = SuggestionStreamParser()
+    async for chunk in chain.astream(inputs):
+        for suggestion in stream_parser.feed(chunk):
+            yield suggestion
@@ -0,0 +1,255 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List
+
+from langchain_core.documents import Document
+
+from logger_setup import logger
+from chunking import count_tokens
+from utils import TTLCache
+
+# Sections with review hints are always part of the context
+HINT_PATTERN = re.compile(r"подсказ|ревью|ревьюер|обрати(те)? внимание|критери|частые ошибки|hint|review", re.IGNORECASE)
+
+WORD_PATTERN = re.compile(r"[A-Za-zА-Яа-яЁё_][A-Za-zА-Яа-яЁё0-9_]*")
+
+# Java keywords and common words that say nothing about the part of the task a file implements
+STOP_WORDS = {
+    "public", "private", "protected", "static", "final", "class", "void", "return", "new", "import", "package",
+    "int", "long", "string", "boolean", "this", "null", "true", "false", "for", "if", "else", "while", "java",
+    "util", "main", "args", "var", "get", "set", "и", "в", "на", "не", "что", "это", "для", "с", "по", "как"
+}
+
+# Words are cut to this length: a crude stemmer for Russian endings and Java naming variants
+STEM_LENGTH = 6
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase terms, breaking camelCase and snake_case identifiers into words.
+
+    Args:
+        text (str): Task text or code.
+
+    Returns:
+        List[str]: The terms.
+    """
+    terms = []
+    for word in WORD_PATTERN.findall(text):
+        for part in re.findall(r"[A-ZА-ЯЁ]?[a-zа-яё0-9]+|[A-ZА-ЯЁ]+(?![a-zа-яё])", word.replace("_", " ")):
+            part = part.lower()
+            if len(part) > 1 and part not in STOP_WORDS:
+                terms.append(part[:STEM_LENGTH])
+    return terms
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    return 0 < len(stripped) <= 80 and not line.startswith("\t") and not stripped.endswith((".", ",", ";"))
+
+
+def split_sections(text: str, max_tokens: int = 300) -> List[str]:
+    """
+    Splits a Notion page into sections at heading-like lines (short lines without a final period), splitting
+    sections longer than max_tokens between lines. Parts of a split section repeat its heading.
+
+    Args:
+        text (str): Text of the page as loaded by NotionDBLoader.
+        max_tokens (int): Maximum size of a section.
+
+    Returns:
+        List[str]: The sections in page order.
+    """
+    sections: List[List[str]] = []
+    for line in text.split("\n"):
+        if not line.strip():
+            continue
+        if not sections or (_is_heading(line) and len(sections[-1]) > 1):
+            sections.append([])
+        sections[-1].append(line)
+
+    parts = []
+    for lines in sections:
+        heading, current = lines[0], [lines[0]]
+        heading_tokens = count_tokens(heading)
+        current_tokens = heading_tokens
+        for line in lines[1:]:
+            # Every line is counted once, with the newline that joins it to the section
+            line_tokens = count_tokens("\n" + line)
+            if len(current) > 1 and current_tokens + line_tokens > max_tokens:
+                parts.append("\n".join(current))
+                current = [heading]
+                current_tokens = heading_tokens
+            current.append(line)
+            current_tokens += line_tokens
+        parts.append("\n".join(current))
+    return parts
+
+
+class BM25Index:
+    """Okapi BM25 index over a small collection of text sections."""
+
+    def __init__(self, sections: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            sections (List[str]): The indexed texts.
+            k1 (float): Term frequency saturation.
+            b (float): Length normalization.
+        """
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(section)) for section in sections]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        total = len(sections)
+        self.idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        """
+        Scores every section against a query.
+
+        Args:
+            query (List[str]): Query terms (see tokenize), repeated terms weigh more.
+
+        Returns:
+            List[float]: The score of every section, in index order.
+        """
+        query_counts = Counter(term for term in query if term in self.idf)
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            for term, weight in query_counts.items():
+                frequency = counts.get(term, 0)
+                if frequency:
+                    norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+                    score += weight * self.idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            results.append(score)
+        return results
+
+
+def code_query(files: List[Dict[str, str]]) -> List[str]:
+    """
+    Builds the retrieval query of a pull request from its file names and the identifiers of its code.
+
+    Args:
+        files (List[Dict[str, str]]): Files with "filename" and "content".
+
+    Returns:
+        List[str]: Query terms.
+    """
+    query = []
+    for file in files:
+        query.extend(tokenize(file["filename"].rsplit("/", 1)[-1].rsplit(".", 1)[0]) * 3)
+        query.extend(tokenize(file["content"]))
+    return query
+
+
+class TaskContextIndex:
+    """
+    The sections of a task description with their sizes and BM25 index. It is built once per description and
+    only scores the sections against the files of every review batch.
+    """
+
+    def __init__(self, docs: List[Document]):
+        """
+        Args:
+            docs (List[Document]): Task description pages (see tools.get_notion_docs).
+        """
+        self.docs = docs
+        self.sections = [
+            (doc_index, section) for doc_index, doc in enumerate(docs) for section in split_sections(doc.page_content)
+        ]
+        self.texts = [section for _, section in self.sections]
+        self.sizes = [count_tokens(section) for section in self.texts]
+        self.index = BM25Index(self.texts)
+        # The first section of every page and the sections with review hints
+        self.required = {
+            index for index, (doc_index, text) in enumerate(self.sections)
+            if HINT_PATTERN.search(text) or index == 0 or self.sections[index - 1][0] != doc_index
+        }
+        self.required_tokens = sum(self.sizes[index] for index in self.required)
+
+    def select(self, files: List[Dict[str, str]], max_tokens: int = 1500) -> List[Document]:
+        """
+        Keeps the parts of the task description relevant to the reviewed files within a token budget.
+        The first section of every page (the task statement) and the sections with review hints are always kept,
+        the other sections are added by BM25 relevance to the file names and identifiers of the code.
+        The kept sections stay in page order.
+
+        Args:
+            files (List[Dict[str, str]]): The reviewed files with "filename" and "content".
+            max_tokens (int): Token budget of the context.
+
+        Returns:
+            List[Document]: One document per page with the selected sections and the page metadata.
+        """
+        if not self.sections:
+            return self.docs
+
+        selected = set(self.required)
+        used = self.required_tokens
+        if used > max_tokens:
+            logger.warning(f"Task statement and review hints take {used} tokens, above the budget of {max_tokens}.")
+
+        scores = self.index.scores(code_query(files))
+        for index in sorted(range(len(self.texts)), key=lambda i: scores[i], reverse=True):
+            if index in selected or scores[index] <= 0:
+                continue
+            if used + self.sizes[index] <= max_tokens:
+                selected.add(index)
+                used += self.sizes[index]
+
+        logger.info(f"Task context: {len(selected)}/{len(self.texts)} sections, {used}/{sum(self.sizes)} tokens.")
+        return [
+            Document(
+                page_content="\n".join(text for index, (doc_index, text) in enumerate(self.sections)
+                                       if doc_index == page and index in selected),
+                metadata=doc.metadata
+            )
+            for page, doc in enumerate(self.docs)
+        ]
+
+
+# Indices of the task descriptions reviewed recently, the same assignment is reviewed for many pull requests
+task_context_indices = TTLCache(max_entries=64, ttl=24 * 60 * 60)
+
+
+def get_task_context_index(docs: List[Document]) -> TaskContextIndex:
+    """
+    Returns the index of a task description, built on first use. Pages are identified by their Notion id and
+    their text, so an edited page is indexed again.
+
+    Args:
+        docs (List[Document]): Task description pages (see tools.get_notion_docs).
+
+    Returns:
+        TaskContextIndex: The index.
+    """
+    key = tuple((doc.metadata.get("id"), hash(doc.page_content)) for doc in docs)
+    index = task_context_indices.get(key)
+    if index is None:
+        index = TaskContextIndex(docs)
+        task_context_indices.set(key, index)
+    return index
+
+
+def select_task_context(docs: List[Document], files: List[Dict[str, str]], max_tokens: int = 1500) -> List[Document]:
+    """
+    Keeps the parts of the task description relevant to the reviewed files within a token budget
+    (see TaskContextIndex.select).
+
+    Args:
+        docs (List[Document]): Task description pages (see tools.get_notion_docs).
+        files (List[Dict[str, str]]): The reviewed files with "filename" and "content".
+        max_tokens (int): Token budget of the context.
+
+    Returns:
+        List[Document]: One document per page with the selected sections and the page metadata.
+    """
+    return get_task_context_index(docs).select(files, max_tokens)
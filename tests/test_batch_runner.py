@@ -0,0 +1,33 @@
+from batch_runner import CheckpointWriter, load_checkpoint, run_batch
+
+
+def test_partial_last_line_does_not_swallow_the_next_record(tmp_path):
+    path = tmp_path / "results.jsonl"
+    # An interrupted run stopped in the middle of its second record
+    path.write_text('{"url": "a", "status": "ok"}\n{"url": "b", "sta', encoding="utf-8")
+
+    writer = CheckpointWriter(str(path))
+    writer.write({"url": "c", "status": "ok"})
+    writer.close()
+
+    lines = path.read_text(encoding="utf-8").split("\n")
+    assert lines == ['{"url": "a", "status": "ok"}', '{"url": "b", "sta', '{"url": "c", "status": "ok"}', ""]
+    assert load_checkpoint(str(path)) == {"a", "c"}
+
+
+def test_run_batch_resumes_and_retries_failures(tmp_path):
+    path = tmp_path / "out" / "results.jsonl"
+    pull_requests = [{"url": url, "task_name": "task", "content": []} for url in ("a", "b", "c")]
+    path.parent.mkdir()
+    path.write_text('{"url": "a", "status": "ok"}\n{"url": "b", "status": "error"}\n', encoding="utf-8")
+
+    reviewed = []
+
+    def review(pull_request):
+        reviewed.append(pull_request["url"])
+        return {"suggestions": []}
+
+    counts = run_batch(pull_requests, str(path), concurrency=2, review_fn=review)
+    assert counts == {"skipped": 1, "ok": 2, "error": 0}
+    assert sorted(reviewed) == ["b", "c"]
+    assert load_checkpoint(str(path)) == {"a", "b", "c"}
@@ -0,0 +1,25 @@
+import copy
+import json
+
+from benchmarks.preprocessing import legacy_preprocessing_code_pr
+from code_lines import PreprocessedFile, preprocess_files
+
+DIFF = "@@ -1,3 +1,3 @@ class A {\n a\n-b\n+c\n\\ No newline at end of file\n\n@@ -10 +10,2 @@\n x\n+y"
+
+
+def test_rendering_matches_the_previous_preprocessing_on_data_json():
+    with open("data.json", "r") as f:
+        code = [file for pull_request in json.load(f) for file in pull_request["content"]]
+    files = preprocess_files(code)
+    assert [file.to_dict() for file in files] == legacy_preprocessing_code_pr(copy.deepcopy(code))
+
+
+def test_line_indices():
+    file = PreprocessedFile.from_diff("A.java", DIFF)
+    assert file.lines() == ["1  | a", "2 -| b", "2 +| c", "3  | ", "10  | x", "11 +| y"]
+    assert list(file.line_numbers) == [1, 2, 2, 3, 10, 11]
+    assert file.kinds == " -+  +"
+    assert list(file.positions) == [1, 2, 3, 5, 7, 8]
+    assert list(file.hunk_starts) == [0, 4]
+    assert [file.line(index) for index in range(len(file))] == file.lines()
+    assert file.find_lines(2) == (1, 3)
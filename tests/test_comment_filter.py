@@ -0,0 +1,15 @@
+from comment_filter import classify_comment
+
+
+def test_java_class_comment_is_not_praise():
+    suggestion = {
+        "file": "src/main/java/faang/school/User.java",
+        "lines": [3, 10],
+        "title": "Класс User",
+        "suggestion": "Класс User не соответствует заданию"
+    }
+    assert classify_comment(suggestion) != "drop"
+
+
+def test_standalone_exclamation_is_praise():
+    assert classify_comment({"file": "User.java", "lines": [3], "title": "", "suggestion": "Класс!"}) == "drop"
@@ -0,0 +1,21 @@
+from comment_index import CommentIndex, comment_fingerprint
+
+SUGGESTION = {"file": "Main.java", "lines": [3, 5], "title": "Close the stream", "suggestion": "Use try-with-resources."}
+
+
+def test_fingerprint_ignores_case_punctuation_and_whitespace():
+    rewritten = {**SUGGESTION, "title": "close  the stream!", "suggestion": "use try with resources"}
+    assert comment_fingerprint(rewritten) == comment_fingerprint(SUGGESTION)
+
+
+def test_fingerprint_uses_the_line_range():
+    assert comment_fingerprint({**SUGGESTION, "lines": [5, 4, 3]}) == comment_fingerprint(SUGGESTION)
+    assert comment_fingerprint({**SUGGESTION, "lines": [3, 6]}) != comment_fingerprint(SUGGESTION)
+    assert comment_fingerprint({**SUGGESTION, "file": "Util.java"}) != comment_fingerprint(SUGGESTION)
+    assert comment_fingerprint({**SUGGESTION, "lines": None}) != comment_fingerprint(SUGGESTION)
+
+
+def test_index_matches_by_location_only_when_asked():
+    rewritten = {**SUGGESTION, "suggestion": "Resources leak here."}
+    assert rewritten not in CommentIndex([SUGGESTION])
+    assert rewritten in CommentIndex([SUGGESTION], match_location=True)
@@ -0,0 +1,51 @@
+import json
+import random
+
+from benchmarks.apply_diff import legacy_apply_diff, make_patch, mutate
+from dataset_store import DatasetStore, reconstruct_files
+
+DATASET_PATH = "data.json"
+
+
+def legacy_reconstruct_files(content):
+    """The previous tools.process_pull_request_diffs loop over utils.apply_diff."""
+    files_content = {}
+    for timestamp, contents in content.items():
+        for change in contents:
+            files_content[change["filename"]] = legacy_apply_diff(files_content.get(change["filename"], ""),
+                                                                  change["changes"])
+    return [{"filename": filename, "content": file_content} for filename, file_content in files_content.items()]
+
+
+def commit_history(pull_request, rng):
+    """
+    Per-commit patches in the format of dataset.collect_pull_request for the files of a data.json pull request.
+    Every other file existed before the pull request: its first patch has context the empty start lacks.
+    """
+    previous, content = {}, {}
+    for commit in range(4):
+        changes = []
+        for index, file in enumerate(pull_request["content"]):
+            lines = [line[1:] for line in file["content"].split("\n")]
+            old = previous.get(file["filename"], lines if index % 2 else [])
+            new = mutate(old or lines, rng, edits=rng.randint(1, 6))
+            changes.append({"filename": file["filename"], "changes": make_patch(old, new)})
+            previous[file["filename"]] = new
+        content[f"2024-01-0{commit + 1} 00:00:00"] = changes
+    return content
+
+
+def test_reconstruct_files_matches_apply_diff_on_every_dataset_pull_request():
+    with open(DATASET_PATH, "r", encoding="utf-8") as f:
+        pull_requests = json.load(f)
+    rng = random.Random(0)
+    for pull_request in pull_requests:
+        content = commit_history(pull_request, rng)
+        assert reconstruct_files(content) == legacy_reconstruct_files(content), pull_request["url"]
+
+
+def test_reconstructed_files_are_returned_as_copies():
+    store = DatasetStore(DATASET_PATH)
+    files = store.get_files(0)
+    files[0]["content"] = ""
+    assert store.get_files(store.pull_requests[0]["url"])[0]["content"] == store.pull_requests[0]["content"][0]["content"]
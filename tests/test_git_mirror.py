@@ -0,0 +1,93 @@
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from git_mirror import GitMirror
+from tools import get_commit_details
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+MAIN_V1 = "class Main {\n    void run() {\n    }\n}\n"
+MAIN_V2 = "class Main {\n    void run() {\n        new Util().help();\n    }\n}\n"
+UTIL = "class Util {\n    void help() {\n    }\n}\n"
+
+
+def git(repository, *args, date="2024-01-01T10:00:00Z"):
+    env = {**os.environ, "GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date,
+           "GIT_AUTHOR_NAME": "student", "GIT_AUTHOR_EMAIL": "student@example.com",
+           "GIT_COMMITTER_NAME": "student", "GIT_COMMITTER_EMAIL": "student@example.com"}
+    return subprocess.run(["git", "-C", str(repository), *args], check=True, capture_output=True, text=True,
+                          env=env).stdout.strip()
+
+
+def commit(repository, files, message, date):
+    for name, content in files.items():
+        (repository / name).write_text(content)
+    git(repository, "add", "-A")
+    git(repository, "commit", "-q", "-m", message, date=date)
+    return git(repository, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def pull_request(tmp_path):
+    """A repository with Main.java on main and pull request 1 adding Util.java and changing Main.java."""
+    repository = tmp_path / "repo"
+    repository.mkdir()
+    git(repository, "init", "-q", "-b", "main")
+    commit(repository, {"Main.java": MAIN_V1}, "initial", "2024-01-01T10:00:00Z")
+    git(repository, "checkout", "-q", "-b", "feature")
+    first = commit(repository, {"Util.java": UTIL}, "add util", "2024-01-02T10:00:00Z")
+    second = commit(repository, {"Main.java": MAIN_V2}, "use util", "2024-01-03T10:00:00Z")
+    git(repository, "update-ref", "refs/pull/1/head", second)
+    git(repository, "checkout", "-q", "main")
+
+    mirror = GitMirror(str(repository), str(tmp_path / "mirror.git"))
+    mirror.sync()
+    return mirror, first, second
+
+
+class FakeGitHubClient:
+    """Answers the commit endpoint of the REST API the way GitHub does for the commits of the fixture."""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url):
+        return self.responses[url.rsplit("/", 1)[-1]]
+
+
+def test_pull_request_content_has_the_rest_patch_format(pull_request):
+    mirror, _, second = pull_request
+    assert mirror.get_pull_request_head("1") == second
+    assert mirror.get_pull_request_content("1") == [
+        {"filename": "Main.java",
+         "content": "@@ -1,4 +1,5 @@\n class Main {\n     void run() {\n+        new Util().help();\n     }\n }"},
+        {"filename": "Util.java",
+         "content": "@@ -0,0 +1,4 @@\n+class Util {\n+    void help() {\n+    }\n+}"},
+    ]
+
+
+def test_commit_details_match_the_rest_backend(pull_request):
+    mirror, first, second = pull_request
+    rest_client = FakeGitHubClient({
+        first: {
+            "commit": {"author": {"date": "2024-01-02T10:00:00Z"}},
+            "files": [{"filename": "Util.java", "status": "added", "additions": 4, "deletions": 0,
+                       "patch": "@@ -0,0 +1,4 @@\n+class Util {\n+    void help() {\n+    }\n+}"}]
+        },
+        second: {
+            "commit": {"author": {"date": "2024-01-03T10:00:00Z"}},
+            "files": [{"filename": "Main.java", "status": "modified", "additions": 1, "deletions": 0,
+                       "patch": "@@ -1,4 +1,5 @@\n class Main {\n     void run() {\n"
+                                "+        new Util().help();\n     }\n }"}]
+        },
+    })
+    for sha in (first, second):
+        mirrored = mirror.get_commit_details(sha)
+        assert re.fullmatch(r"\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ", mirrored["commit_date"])
+        assert mirrored == get_commit_details("o", "r", sha, client=rest_client)
+
+    assert [details["commit_sha"] for details in mirror.get_pull_request_commits_content("1")] == [first, second]
@@ -0,0 +1,58 @@
+from code_lines import PreprocessedFile
+from line_index import DiffLineIndex, anchor_suggestions
+
+# Lines 1-4 with line 2 added, then lines 11-13 with line 12 replaced
+DIFF = "@@ -1,3 +1,4 @@\n a\n+b\n c\n d\n@@ -10,3 +11,3 @@\n x\n-y\n+z\n w"
+
+
+def index(*filenames):
+    return DiffLineIndex([PreprocessedFile.from_diff(filename, DIFF) for filename in filenames or ["src/Main.java"]])
+
+
+def test_range_inside_a_hunk():
+    anchor, reason = index().resolve("src/Main.java", [2, 3])
+    assert reason == "ok"
+    assert (anchor.start_line, anchor.line, anchor.hunk) == (2, 3, 0)
+    assert (anchor.start_position, anchor.position) == (2, 3)
+
+
+def test_range_is_clamped_to_the_lines_of_the_hunk():
+    anchor, reason = index().resolve("src/Main.java", [0, 2])
+    assert reason == "clamped" and (anchor.start_line, anchor.line) == (1, 2)
+
+    anchor, reason = index().resolve("src/Main.java", [13, 20])
+    assert reason == "clamped" and (anchor.start_line, anchor.line, anchor.hunk) == (13, 13, 1)
+
+
+def test_range_across_hunks_is_cut_to_the_first_hunk():
+    anchor, reason = index().resolve("src/Main.java", [3, 12])
+    assert reason == "clamped"
+    assert (anchor.start_line, anchor.line, anchor.hunk) == (3, 4, 0)
+    assert anchor.position == 4
+
+
+def test_removed_lines_are_skipped():
+    # Line 12 is the added "z", the removed "y" before it carries the same number
+    anchor, reason = index().resolve("src/Main.java", [12])
+    assert reason == "ok"
+    assert (anchor.start_line, anchor.line, anchor.position) == (12, 12, 8)
+
+
+def test_rejected_ranges():
+    assert index().resolve("src/Main.java", [6, 9]) == (None, "outside diff")
+    assert index().resolve("src/Main.java", []) == (None, "no lines")
+    assert index().resolve("src/Other.java", [1]) == (None, "unknown file")
+
+
+def test_file_is_found_by_the_end_of_its_path():
+    assert index().resolve_file("Main.java") == "src/Main.java"
+    assert index().resolve_file("./src/Main.java") == "src/Main.java"
+    assert index("a/Main.java", "b/Main.java").resolve_file("Main.java") is None
+
+
+def test_anchor_suggestions():
+    suggestions = [{"title": "t", "file": "Main.java", "lines": [3, 12]}, {"title": "u", "file": "Main.java", "lines": [7]}]
+    anchored, rejected = anchor_suggestions(suggestions, [PreprocessedFile.from_diff("src/Main.java", DIFF)])
+    assert anchored == [{"title": "t", "file": "src/Main.java", "lines": [3, 4],
+                         "anchor": {"side": "RIGHT", "hunk": 0, "start_position": 3, "position": 4}}]
+    assert rejected == [suggestions[1]]
@@ -0,0 +1,65 @@
+from benchmarks.apply_diff import legacy_apply_diff, make_patch
+from patching import apply_patch, parse_hunks
+
+
+def plus(lines):
+    return "\n".join("+" + line for line in lines)
+
+
+def test_new_file_is_added():
+    result = apply_patch("", "@@ -0,0 +1,2 @@\n+class A {\n+}")
+    assert result.content == "+class A {\n+}"
+    assert not result.failed_hunks and not result.by_position
+
+
+def test_hunk_is_verified_against_the_content():
+    old = [f"line {index}" for index in range(20)]
+    new = old[:5] + ["inserted"] + old[5:15] + old[16:]
+    result = apply_patch(plus(old), make_patch(old, new))
+    assert result.content == plus(new)
+    assert not result.by_position
+
+
+def test_hunk_with_moved_context_is_found_around_its_position():
+    old = [f"line {index}" for index in range(40)]
+    new = old[:30] + ["inserted"] + old[30:]
+    # The content has three more lines at the top than the file the patch was made against
+    content = plus(["extra 1", "extra 2", "extra 3"] + old)
+    result = apply_patch(content, make_patch(old, new))
+    assert result.content == plus(["extra 1", "extra 2", "extra 3"] + new)
+    assert not result.failed_hunks
+
+
+def test_first_patch_of_an_existing_file_keeps_the_added_lines():
+    # The file existed before the pull request, it is replayed from an empty file
+    diff = ("@@ -10,6 +10,8 @@ public class Main {\n"
+            "     private int a;\n"
+            "     private int b;\n"
+            "     private int c;\n"
+            "+    int added1;\n"
+            "+    int added2;\n"
+            "     private int d;\n"
+            "     private int e;\n"
+            "     private int f;")
+    result = apply_patch("", diff)
+    assert result.content == legacy_apply_diff("", diff) == "+    int added1;\n+    int added2;"
+    assert result.by_position
+    assert [hunk.new_start for hunk in result.failed_hunks] == [10]
+
+
+def test_two_commit_history_of_an_existing_file_matches_the_previous_implementation():
+    base = [f"    line {index};" for index in range(30)]
+    first = base[:12] + ["    int added1;", "    int added2;"] + base[12:]
+    second = first[:3] + first[4:20] + ["    int added3;"] + first[20:]
+    content = legacy = ""
+    for old, new in ((base, first), (first, second)):
+        content = apply_patch(content, make_patch(old, new)).content
+        legacy = legacy_apply_diff(legacy, make_patch(old, new))
+    assert content == legacy
+    assert "+    int added1;" in content and "+    int added3;" in content
+
+
+def test_no_newline_marker_is_not_a_line():
+    hunks = parse_hunks("@@ -1 +1 @@\n-a\n\\ No newline at end of file\n+b\n\\ No newline at end of file")
+    assert [hunk.lines for hunk in hunks] == [["-a", "+b"]]
+    assert apply_patch("+a", "@@ -1 +1 @@\n-a\n\\ No newline at end of file\n+b").content == "+b"
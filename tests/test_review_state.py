@@ -0,0 +1,34 @@
+from code_lines import preprocess_files
+from review_state import ReviewState, index_hunks, plan_incremental_review
+
+PREVIOUS = "@@ -1,2 +1,3 @@\n a\n+b\n c\n@@ -20,2 +21,3 @@\n x\n+y\n z"
+# One more line added in the first hunk, the second hunk moves down by one line
+CURRENT = "@@ -1,2 +1,4 @@\n a\n+b\n+b2\n c\n@@ -20,2 +22,3 @@\n x\n+y\n z"
+
+COMMENTS = [{"file": "Main.java", "lines": [2, 2], "title": "on the changed hunk"},
+            {"file": "Main.java", "lines": [21, 22], "title": "on the moved hunk"}]
+
+
+def previous_state():
+    files = preprocess_files([{"filename": "Main.java", "content": PREVIOUS}])
+    return ReviewState(head_sha="old", hunks=index_hunks(files), comments=COMMENTS)
+
+
+def test_only_changed_hunks_are_reviewed_and_comments_follow_their_hunk():
+    files = preprocess_files([{"filename": "Main.java", "content": CURRENT}])
+    changed_code, carried = plan_incremental_review(files, previous_state())
+    assert changed_code == [{"filename": "Main.java", "content": "1  | a\n2 +| b\n3 +| b2\n4  | c"}]
+    assert carried == [{"file": "Main.java", "lines": [22, 23], "title": "on the moved hunk"}]
+
+
+def test_files_untouched_since_the_previous_review_are_skipped():
+    files = preprocess_files([{"filename": "Main.java", "content": CURRENT}])
+    changed_code, _ = plan_incremental_review(files, previous_state(), changed_files=set())
+    assert changed_code == []
+
+
+def test_new_file_is_reviewed_whole():
+    files = preprocess_files([{"filename": "Util.java", "content": "@@ -0,0 +1,2 @@\n+class Util {\n+}"}])
+    changed_code, carried = plan_incremental_review(files, previous_state(), changed_files={"Util.java"})
+    assert changed_code == [{"filename": "Util.java", "content": "1 +| class Util {\n2 +| }"}]
+    assert carried == []
@@ -0,0 +1,26 @@
+from suggestion_stream import SuggestionStreamParser
+
+COMPLETION = ('```json\n{"suggestions": [\n'
+              '  {"title": "Quote \\"}\\" in a string", "lines": [1, 2]},\n'
+              '  {"title": "Path \\\\", "lines": [3]}\n'
+              ']}\n```')
+
+
+def test_suggestions_are_returned_as_soon_as_they_are_closed():
+    parser = SuggestionStreamParser()
+    first_end = COMPLETION.index("]},") + 2
+    assert parser.feed(COMPLETION[:first_end - 1]) == []
+    assert parser.feed(COMPLETION[first_end - 1:first_end]) == [{"title": 'Quote "}" in a string', "lines": [1, 2]}]
+    assert parser.feed(COMPLETION[first_end:]) == [{"title": "Path \\", "lines": [3]}]
+
+
+def test_chunk_boundaries_do_not_matter():
+    parser = SuggestionStreamParser()
+    suggestions = [suggestion for char in COMPLETION for suggestion in parser.feed(char)]
+    assert [suggestion["title"] for suggestion in suggestions] == ['Quote "}" in a string', "Path \\"]
+
+
+def test_nested_objects_belong_to_their_suggestion():
+    parser = SuggestionStreamParser()
+    completion = '```json\n{"suggestions": [{"title": "t", "meta": {"a": [1, {"b": 2}]}}]}\n```'
+    assert parser.feed(completion) == [{"title": "t", "meta": {"a": [1, {"b": 2}]}}]
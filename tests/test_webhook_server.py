@@ -0,0 +1,45 @@
+from webhook_server import ReviewJob, ReviewService
+
+LINK = "https://github.com/o/r/pull/1"
+
+
+def make_job(head_sha: str, delivery_id: str = "d") -> ReviewJob:
+    return ReviewJob(delivery_id, "synchronize", LINK, head_sha, "student", 3)
+
+
+def test_job_rejected_by_a_full_queue_does_not_supersede_the_queued_one():
+    reviewed = []
+    service = ReviewService(review_fn=lambda job: reviewed.append(job.head_sha) or {}, max_queue=1)
+    assert service.submit(make_job("h1"))
+    assert not service.submit(make_job("h2"))
+    service._process(service.jobs.get_nowait())
+    assert reviewed == ["h1"]
+
+
+def test_review_results_are_handed_to_the_sink_with_their_new_comments():
+    suggestion = {"file": "Main.java", "lines": [3, 5], "title": "Имя", "suggestion": "Переименуй переменную x"}
+    results = []
+    service = ReviewService(
+        review_fn=lambda job: {"filtered_comments": {"suggestions": [suggestion]}},
+        on_result=lambda job, result: results.append((job.head_sha, result["new_comments"]))
+    )
+    for head_sha in ("h1", "h2"):
+        service.submit(make_job(head_sha))
+        service._process(service.jobs.get_nowait())
+    assert results == [("h1", [suggestion]), ("h2", [])]
+
+
+def test_comments_are_recorded_as_posted_only_after_a_successful_post():
+    suggestion = {"file": "Main.java", "lines": [3], "title": "Имя", "suggestion": "Переименуй переменную x"}
+    posted = []
+
+    def post(job, result):
+        if job.head_sha == "h1":
+            raise RuntimeError("GitHub is down")
+        posted.append(result["new_comments"])
+
+    service = ReviewService(review_fn=lambda job: {"filtered_comments": {"suggestions": [suggestion]}}, on_result=post)
+    for head_sha in ("h1", "h2", "h3"):
+        service.submit(make_job(head_sha))
+        service._process(service.jobs.get_nowait())
+    assert posted == [[suggestion], []]
@@ -1,5 +1,9 @@
+import asyncio
+import contextlib
 import os
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Set, Tuple
 
 import requests
 from langchain_community.document_loaders import NotionDBLoader
@@ -9,33 +13,159 @@ from logger_setup import *
 from rich import print as pp
 from dotenv import load_dotenv
 
-from utils import parse_github_pull_request_url, make_github_api_request, apply_diff, normalize_id
+from utils import parse_github_pull_request_url, normalize_id, TTLCache
+from dataset_store import get_dataset_store
+from code_lines import preprocess_files
+from github_client import GitHubClient, AsyncGitHubClient, GITHUB_API_URL, get_github_client, get_async_github_client
+from diff_stream import iter_diff_files, aiter_diff_files, files_missing_patches
+from git_mirror import get_git_mirror
+from github_graphql import fetch_pull_request_overview, get_commits_from_overview, get_comments_from_overview
 
 from datetime import datetime
 
-import json
 import re
 
 load_dotenv()
 
+NOTION_PAGE_URL = "https://api.notion.com/v1/pages/{page_id}"
 
-def get_commit_details(owner: str, repo: str, sha: str, headers: Dict[str, str]) -> Dict[str, str]:
+# page_id -> last_edited_time, within the TTL the page is assumed unchanged and Notion is not asked at all
+notion_page_versions = TTLCache(max_entries=256, ttl=int(os.getenv("NOTION_CACHE_TTL_SEC", "300")))
+# (page_id, last_edited_time) -> Document, shared by all reviews of the same assignment
+notion_page_documents = TTLCache(max_entries=64, ttl=24 * 60 * 60)
+# page_id -> [lock, number of threads holding or waiting for it], an entry only lives while the page is fetched
+notion_page_locks: Dict[str, list] = {}
+notion_page_locks_guard = threading.Lock()
+
+
+@contextlib.contextmanager
+def notion_page_lock(page_id: str) -> Iterator[None]:
+    """
+    Serializes the fetches of one Notion page. The lock of a page is dropped once no thread needs it, so the
+    locks do not pile up with every page ever reviewed.
+    """
+    with notion_page_locks_guard:
+        entry = notion_page_locks.setdefault(page_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with notion_page_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del notion_page_locks[page_id]
+
+
+def read_missing_patches(client: GitHubClient, diff_url: str, missing: Set[str]) -> Dict[str, str]:
+    """
+    Reads the patches GitHub left out of the files of a pull request or a commit from its unified diff.
+    The diff is streamed and parsed file by file, and reading stops once every missing file is found.
+
+    Args:
+        client (GitHubClient): GitHub client.
+        diff_url (str): API URL of the pull request or the commit.
+        missing (Set[str]): Files whose patch is missing or truncated (see diff_stream.files_missing_patches).
+
+    Returns:
+        Dict[str, str]: Patches by file name. Files not found in the diff, or all of them if the diff cannot be
+        read, are left out.
+    """
+    patches: Dict[str, str] = {}
+    if not missing:
+        return patches
+
+    logger.info(f"{len(missing)} patches missing or truncated, reading the diff of {diff_url}")
+    lines = client.iter_lines(diff_url)
+    try:
+        for file in iter_diff_files(lines):
+            if file["filename"] in missing and file["patch"]:
+                patches[file["filename"]] = file["patch"]
+                if len(patches) == len(missing):
+                    break
+    except Exception as e:
+        logger.error(f"Error reading the diff of {diff_url}: {e}")
+    finally:
+        # Closes the response when reading stopped early
+        lines.close()
+    return patches
+
+
+async def aread_missing_patches(client: AsyncGitHubClient, diff_url: str, missing: Set[str]) -> Dict[str, str]:
+    """
+    Asynchronous version of read_missing_patches.
+
+    Args:
+        client (AsyncGitHubClient): Async GitHub client.
+        diff_url (str): API URL of the pull request or the commit.
+        missing (Set[str]): Files whose patch is missing or truncated.
+
+    Returns:
+        Dict[str, str]: Patches by file name.
+    """
+    patches: Dict[str, str] = {}
+    if not missing:
+        return patches
+
+    logger.info(f"{len(missing)} patches missing or truncated, reading the diff of {diff_url}")
+    lines = client.iter_lines(diff_url)
+    try:
+        async for file in aiter_diff_files(lines):
+            if file["filename"] in missing and file["patch"]:
+                patches[file["filename"]] = file["patch"]
+                if len(patches) == len(missing):
+                    break
+    except Exception as e:
+        logger.error(f"Error reading the diff of {diff_url}: {e}")
+    finally:
+        await lines.aclose()
+    return patches
+
+
+def select_patches(files: List[Dict], patches: Dict[str, str]) -> List[Tuple[str, str]]:
+    """
+    Pairs the files of a pull request or a commit with their patch, the one read from the unified diff first.
+    Files without a patch (binary files, or patches that could not be read) have no code to review and are
+    left out.
+
+    Args:
+        files (List[Dict]): Files of the GitHub API.
+        patches (Dict[str, str]): Patches read from the unified diff (see read_missing_patches).
+
+    Returns:
+        List[Tuple[str, str]]: File names and patches, in the order of the files.
+    """
+    selected = []
+    for file in files:
+        filename = file.get('filename')
+        patch = patches.get(filename) or file.get('patch')
+        if patch:
+            selected.append((filename, patch))
+        else:
+            logger.info(f"{filename}: no patch (binary file or diff unavailable), left out of the review")
+    return selected
+
+
+def get_commit_details(owner: str, repo: str, sha: str, client: Optional[GitHubClient] = None) -> Dict[str, str]:
     """
     Retrieves detailed information about a specific commit in a GitHub repository.
     Args:
         owner (str): The repository owner.
         repo (str): The repository name.
         sha (str): The commit SHA identifier.
-        headers (Dict[str, str]): Headers for the GitHub API request.
+        client (Optional[GitHubClient]): GitHub client to use, the shared client by default.
     Returns:
         Dict[str, str]: A dictionary with commit details including the commit date and modified files.
     """
-    commit_url = f'https://api.github.com/repos/{owner}/{repo}/commits/{sha}'
-    commit_response = requests.get(commit_url, headers=headers)
-
-    if commit_response.status_code == 200:
-        commit_details = commit_response.json()
+    client = client or get_github_client()
+    commit_url = f'{GITHUB_API_URL}/repos/{owner}/{repo}/commits/{sha}'
+    try:
+        commit_details = client.get(commit_url)
+    except Exception as e:
+        logger.error(f"Error fetching commit details for {sha}: {e}")
+        commit_details = None
 
+    if commit_details:
         commit_info = {
             "commit_sha": sha,
             "commit_date": commit_details['commit']['author']['date'],
@@ -50,64 +180,78 @@ def get_commit_details(owner: str, repo: str, sha: str, headers: Dict[str, str])
         # Update the commit info with filtered files
         commit_details["files"] = filtered_files
 
-        for file in commit_details.get('files', []):
-            file_info = {
-                "filename": file['filename'],
-                "changes": file.get('patch', 'No changes (binary file or new file)')
-            }
-            commit_info["files"].append(file_info)
+        # Patches GitHub left out or truncated are read from the diff of the commit
+        patches = read_missing_patches(client, commit_url, files_missing_patches(commit_details["files"]))
+        for filename, patch in select_patches(commit_details["files"], patches):
+            commit_info["files"].append({"filename": filename, "changes": patch})
 
         return commit_info
     else:
-        logger.error(f"Error fetching commit details for {sha}: {commit_response.status_code}, {commit_response.text}")
         return {}
 
 
-def get_pull_request_commits_content(url: str) -> Dict[str, Dict[str, str]]:
+def get_pull_request_commits_content(
+        url: str,
+        max_workers: int = 8,
+        backend: str = "rest",
+        overview: Optional[Dict] = None
+) -> Dict[str, Dict[str, str]]:
     """
     Fetches commit details for a given pull request from a GitHub repository.
+    Commit details are requested concurrently, the result keeps the order of the commits in the pull request.
     Args:
         url (str): The URL of the GitHub pull request.
+        max_workers (int): Maximum number of concurrent commit detail requests (1 fetches them sequentially).
+        backend (str): "rest" lists the commits with the REST API, "graphql" with a single GraphQL query,
+            "git" computes the commit details from a local mirror of the repository.
+        overview (Optional[Dict]): Pull request overview already fetched with the "commits" connection
+            (see github_graphql.fetch_pull_request_overview), used by the "graphql" backend instead of a new query.
     Returns:
         Dict[str, Dict[str, str]]: A dictionary where each key is a commit SHA,
         and each value is another dictionary containing details of that commit.
     """
     logger.info('get_pull_request_commits_content() called')
 
-    # Retrieve the GitHub API key from environment variables
-    api_key = os.getenv("GITHUB_API_KEY")
-    if not api_key:
-        logger.error('GitHub API key not found in environment variables.')
-        raise EnvironmentError('GitHub API key not found in environment variables.')
-
-    headers = {
-        "Accept": "application/vnd.github+json",
-        'Authorization': f'Bearer {api_key}'
-    }
-
     # Parse the GitHub pull request URL to extract owner, repo, and pull number
 
     owner, repo, pull_number = parse_github_pull_request_url(url)
 
     logger.info(f"Owner: {owner}, Repo: {repo}, Pull Number: {pull_number}")
 
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pull_number}/commits"
+    if backend == "git":
+        return get_git_mirror(owner, repo).get_pull_request_commits_content(pull_number)
+
+    # Shared GitHub client, raises EnvironmentError if the API key is missing
+    client = get_github_client()
 
-    # Make the API request to GitHub
-    commits = make_github_api_request(api_url, headers)
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}/commits"
+
+    # Make the API request to GitHub, reading every page of the commit list
+    if backend == "graphql":
+        if overview is None:
+            overview = fetch_pull_request_overview(owner, repo, pull_number, connections=("commits",), client=client)
+        commits = get_commits_from_overview(overview)
+    else:
+        commits = client.get_all(api_url)
     if not commits:
         logger.error(f'No commits were found at {api_url}')
         return {}
 
     commits_info = []
 
+    shas = []
     for commit in commits:
         sha = commit.get("sha")
         if not sha:
             logger.warning("No SHA found for commit, skipping.")
             continue
+        shas.append(sha)
 
-        commit_info = get_commit_details(owner, repo, sha, headers)
+    # Fetch commit details concurrently, map() yields results in the order of the SHAs
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        commit_details = list(executor.map(lambda commit_sha: get_commit_details(owner, repo, commit_sha, client), shas))
+
+    for sha, commit_info in zip(shas, commit_details):
         if commit_info:
             # Filter out deleted files
             filtered_files = [
@@ -123,12 +267,14 @@ def get_pull_request_commits_content(url: str) -> Dict[str, Dict[str, str]]:
 
 
 # Needs to be changed to webhook in the future
-def get_pull_request_content(url: str) -> List[Dict[str, str]]:
+def get_pull_request_content(url: str, backend: str = "rest") -> List[Dict[str, str]]:
     """
     Fetch the content of files changed in a GitHub pull request.
 
     Args:
         url (str): The URL of the GitHub pull request.
+        backend (str): "rest" reads the changed files from the REST API,
+            "git" computes them from a local mirror of the repository.
 
     Returns:
         List[Dict[str, str]]: A list of dictionaries containing filenames and their content changes.
@@ -140,78 +286,123 @@ def get_pull_request_content(url: str) -> List[Dict[str, str]]:
     """
     logger.info('get_pull_request_content() called')
 
-    # Retrieve the GitHub API key from environment variables
-    api_key = os.getenv("GITHUB_API_KEY")
-    if not api_key:
-        logger.error('GitHub API key not found in environment variables.')
-        raise EnvironmentError('GitHub API key not found in environment variables.')
-
-    headers = {
-        "Accept": "application/vnd.github+json",
-        'Authorization': f'Bearer {api_key}'
-    }
-
     # Parse the GitHub pull request URL to extract owner, repo, and pull number
     owner, repo, pull_number = parse_github_pull_request_url(url)
 
     logger.info(f"Owner: {owner}, Repo: {repo}, Pull Number: {pull_number}")
 
-    api_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pull_number}/files"
+    if backend == "git":
+        return get_git_mirror(owner, repo).get_pull_request_content(pull_number)
 
-    # Make the API request to GitHub Process the response data
-    files_data = make_github_api_request(api_url, headers)
-    code = []
-    for file in files_data:
-        filename = file.get('filename')
-        patch = file.get('patch', 'No changes (binary file or new file)')
-        code.append({'filename': filename, 'content': patch})
+    # Shared GitHub client, raises EnvironmentError if the API key is missing
+    client = get_github_client()
+
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}/files"
+
+    # Stream the changed files page by page
+    files = list(client.iter_pages(api_url))
+
+    # Patches GitHub left out or truncated are read from the unified diff of the pull request
+    pull_request_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}"
+    patches = read_missing_patches(client, pull_request_url, files_missing_patches(files))
+
+    return [{'filename': filename, 'content': patch} for filename, patch in select_patches(files, patches)]
+
+
+async def aget_pull_request_content(url: str, backend: str = "rest") -> List[Dict[str, str]]:
+    """
+    Asynchronous version of get_pull_request_content, the REST backend uses the pooled async GitHub client.
+
+    Args:
+        url (str): The URL of the GitHub pull request.
+        backend (str): "rest" reads the changed files from the REST API,
+            "git" computes them from a local mirror of the repository (in a worker thread).
+
+    Returns:
+        List[Dict[str, str]]: A list of dictionaries containing filenames and their content changes.
+    """
+    if backend == "git":
+        return await asyncio.to_thread(get_pull_request_content, url, backend)
+
+    logger.info('aget_pull_request_content() called')
+
+    owner, repo, pull_number = parse_github_pull_request_url(url)
+    client = get_async_github_client()
+
+    api_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}/files"
+
+    files = await client.get_all(api_url)
+
+    pull_request_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}"
+    patches = await aread_missing_patches(client, pull_request_url, files_missing_patches(files))
+
+    return [{'filename': filename, 'content': patch} for filename, patch in select_patches(files, patches)]
+
+
+def get_pull_request_head_sha(url: str, backend: str = "rest") -> str:
+    """
+    Retrieves the SHA of the head commit of a pull request.
+
+    Args:
+        url (str): The URL of the GitHub pull request.
+        backend (str): "rest" reads it from the pull request details (a conditional request when unchanged),
+            "git" from the pull request head ref of the local mirror.
 
-    return code
+    Returns:
+        str: The head commit SHA.
+    """
+    owner, repo, pull_number = parse_github_pull_request_url(url)
+    if backend == "git":
+        return get_git_mirror(owner, repo).get_pull_request_head(pull_number)
+    pull_request = get_github_client().get(f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}")
+    return pull_request["head"]["sha"]
 
 
-def get_pull_request_comments(url: str) -> List[Dict[str, str]]:
+def get_pull_request_comments(url: str, backend: str = "rest", overview: Optional[Dict] = None) -> List[Dict[str, str]]:
     """
     Retrieves comments from a pull request along with the code they are related to and the comment's date.
 
     Args:
         url (str): The URL of the GitHub pull request.
+        backend (str): "rest" makes three REST calls (details, code and general comments),
+            "graphql" fetches the same data with a single GraphQL query.
+        overview (Optional[Dict]): Pull request overview already fetched with the "reviewThreads" and "comments"
+            connections, used by the "graphql" backend instead of a new query.
 
     Returns:
         List[Dict[str, str]]: A list of dictionaries containing the comment text, code snippet, and the date.
     """
     logger.info('get_pull_request_comments() called')
 
-    # Retrieve the GitHub API key from environment variables
-    api_key = os.getenv("GITHUB_API_KEY")
-    if not api_key:
-        logger.error('GitHub API key not found in environment variables.')
-        raise EnvironmentError('GitHub API key not found in environment variables.')
-
-    headers = {
-        "Accept": "application/vnd.github+json",
-        'Authorization': f'Bearer {api_key}',
-        "X-GitHub-Api-Version": "2022-11-28"
-    }
+    # Shared GitHub client, raises EnvironmentError if the API key is missing
+    client = get_github_client()
 
     # Parse the URL to extract the owner, repository name, and pull request number
     owner, repo, pull_number = parse_github_pull_request_url(url)
 
     logger.info(f"Owner: {owner}, Repo: {repo}, Pull Number: {pull_number}")
 
+    if backend == "graphql":
+        if overview is None:
+            overview = fetch_pull_request_overview(
+                owner, repo, pull_number, connections=("reviewThreads", "comments"), client=client
+            )
+        return get_comments_from_overview(overview)
+
     # Fetch pull request details to get the creator's username
-    pr_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pull_number}"
-    pull_request_data = make_github_api_request(pr_url, headers)
+    pr_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}"
+    pull_request_data = client.get(pr_url)
     pr_creator = pull_request_data["user"]["login"]
 
     # URL to get code comments from the pull request
-    code_comments_url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pull_number}/comments"
+    code_comments_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}/comments"
 
     # URL to get general comments from the pull request (via issue comments API)
-    issue_comments_url = f"https://api.github.com/repos/{owner}/{repo}/issues/{pull_number}/comments"
+    issue_comments_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/issues/{pull_number}/comments"
 
-    # Make a request to GitHub API to get both code and general comments
-    code_comments_data = make_github_api_request(code_comments_url, headers)
-    issue_comments_data = make_github_api_request(issue_comments_url, headers)
+    # Make a request to GitHub API to get both code and general comments (all pages)
+    code_comments_data = client.get_all(code_comments_url)
+    issue_comments_data = client.get_all(issue_comments_url)
 
     comments_info = []
 
@@ -240,12 +431,74 @@ def get_pull_request_comments(url: str) -> List[Dict[str, str]]:
     return comments_info
 
 
+def get_notion_page_summary(loader: NotionDBLoader, page_id: str) -> Dict:
+    """
+    Retrieves the properties of a single Notion page without its blocks.
+
+    Args:
+        loader (NotionDBLoader): Loader of the database the page belongs to.
+        page_id (str): The hyphenated ID of the page.
+
+    Returns:
+        Dict: The page object from the Notion API.
+
+    Raises:
+        ValueError: If the page does not exist or does not belong to the loader's database.
+    """
+    response = requests.get(NOTION_PAGE_URL.format(page_id=page_id), headers=loader.headers,
+                            timeout=loader.request_timeout_sec)
+    if response.status_code == 404:
+        logger.error("No documents found with page_id: %s", page_id)
+        raise ValueError(f"No documents found with page_id: {page_id}")
+    response.raise_for_status()
+    page_summary = response.json()
+
+    parent_database_id = page_summary.get("parent", {}).get("database_id") or ""
+    if parent_database_id.replace("-", "") != loader.database_id.replace("-", ""):
+        logger.error("No documents found with page_id: %s", page_id)
+        raise ValueError(f"No documents found with page_id: {page_id}")
+    return page_summary
+
+
+def get_notion_page(loader: NotionDBLoader, page_id: str) -> Document:
+    """
+    Fetches a single page of a Notion database together with its blocks.
+    Pages are cached by page id and last_edited_time, so an edited page is loaded again.
+
+    Args:
+        loader (NotionDBLoader): Loader of the database the page belongs to.
+        page_id (str): The hyphenated ID of the page.
+
+    Returns:
+        Document: The page as returned by NotionDBLoader.load().
+    """
+    # Concurrent reviews of the same assignment wait for one fetch instead of repeating it
+    with notion_page_lock(page_id):
+        page_summary = None
+        last_edited_time = notion_page_versions.get(page_id)
+        if last_edited_time is None:
+            page_summary = get_notion_page_summary(loader, page_id)
+            last_edited_time = page_summary["last_edited_time"]
+            notion_page_versions.set(page_id, last_edited_time)
+
+        doc = notion_page_documents.get((page_id, last_edited_time))
+        if doc is not None:
+            logger.info("Document with page_id %s served from cache.", page_id)
+            return doc
+
+        page_summary = page_summary or get_notion_page_summary(loader, page_id)
+        doc = loader.load_page(page_summary)
+        notion_page_documents.set((page_id, page_summary["last_edited_time"]), doc)
+        return doc
+
+
 def get_notion_docs(
         database_id: str,
         page_id: Optional[str] = None
 ) -> List[Document]:
     """
     Fetch documents from a Notion database, optionally filtering by a specific page ID.
+    With a page ID only that page and its blocks are requested, and the result is cached.
 
     Args:
         database_id (str): The ID of the Notion database to query.
@@ -274,21 +527,17 @@ def get_notion_docs(
             database_id=database_id,
             request_timeout_sec=30  # Optional, defaults to 10
         )
-        docs = loader.load()
+        if page_id is None:
+            docs = loader.load()
     except Exception as e:
         logger.error("Error while initiating NotionDBLoader: %s", e)
         raise
 
+    # Fetch only the requested page if page_id is provided
     if page_id is not None:
         page_id = normalize_id(page_id)
-    # Filter documents by page_id if provided
-    if page_id is not None:
-        docs = [doc for doc in docs if doc.metadata.get('id') == page_id]
-        if docs:
-            logger.info("Document with page_id %s found.", page_id)
-        else:
-            logger.error("No documents found with page_id: %s", page_id)
-            raise ValueError(f"No documents found with page_id: {page_id}")
+        docs = [get_notion_page(loader, page_id)]
+        logger.info("Document with page_id %s found.", page_id)
 
     # Check if any documents were loaded
     if not docs:
@@ -299,49 +548,41 @@ def get_notion_docs(
     return docs
 
 
+async def aget_notion_docs(
+        database_id: str,
+        page_id: Optional[str] = None
+) -> List[Document]:
+    """
+    Asynchronous version of get_notion_docs.
+    NotionDBLoader only offers blocking requests, so the fetch runs in a worker thread. Cached pages are returned
+    without any request, which makes repeated reviews of the same assignment cheap either way.
+
+    Args:
+        database_id (str): The ID of the Notion database to query.
+        page_id (Optional[str]): The ID of the specific page to retrieve.
+
+    Returns:
+        List[Document]: A list of Document objects retrieved from the Notion database.
+    """
+    return await asyncio.to_thread(get_notion_docs, database_id, page_id)
+
+
 def preprocessing_code_pr(code: list) -> list:
     """
     Processes a list of dictionaries representing files and their content in a pull request diff format.
-    It removes specific diff markers, assigns line numbers to each line, and excludes lines starting with '-'.
+    It removes specific diff markers and renders every line compactly as "<line number> <marker>| <code>",
+    where the marker is "+" for added, "-" for removed and " " for unchanged lines (see utils.format_code_line).
+    Removed lines carry the number of the line that follows them in the new version of the file.
+    The input is left untouched.
 
     Args:
         code (List[Dict[str, str]]): A list of dictionaries where each dictionary represents a file with its content.
 
     Returns:
-        List[Dict[str, List[Dict[str, str]]]]: A list of dictionaries where each dictionary contains the file name
-        and the list of its lines, each with a line number and content.
-    """
-    pattern_diff = re.compile(r"@@ -(\d+,?\d*) \+(\d+,?\d*) @@")
-    pattern_minus = re.compile(r"^-")  # Matches lines starting with '-'
-    pattern_plus = re.compile(r"^\+")  # Matches lines starting with '-'
-    pattern_number = re.compile(r"(\d+),?(\d*)")  # Matches numbers
-
-    # Iterate through each file in the code dictionary
-    for file in code:
-        # Remove diff markers (lines starting with '@@' and ending with '@@')
-        lines = file["content"].split("\n")
-
-        # Prepare to hold the new content with line numbers
-        new_content = []
-        count = 1
-
-        for line in lines:
-            if pattern_diff.match(line):
-                diff_lines = pattern_diff.match(line)
-                file_start_new_version = int(pattern_number.match(diff_lines.group(2)).group(1))
-                count = file_start_new_version
-                continue
-            line_numb = {
-                "line_number": count,
-                "content": line
-            }
-            if not pattern_minus.match(line):
-                count += 1
-            new_content.append(line_numb)  #
-
-        file["content"] = new_content
-
-    return code
+        List[PreprocessedFile]: The numbered files (see code_lines.PreprocessedFile), read like dictionaries
+        with the file name and its numbered lines joined with newlines.
+    """
+    return preprocess_files(code)
 
 
 def get_commits_before_date_comment(commits: List[Dict], date: datetime) -> List[Dict]:
@@ -363,6 +604,8 @@ def get_commits_before_date_comment(commits: List[Dict], date: datetime) -> List
 def process_pull_request_diffs(index: int, filepath: str) -> List[Dict[str, str]]:
     """
     Process the diffs from the pull request and reconstruct the file content.
+    The dataset file is parsed once per process and the files of a pull request are reconstructed once
+    (see dataset_store.DatasetStore).
 
     Args:
         index (int): Index of the pull request to process.
@@ -371,26 +614,4 @@ def process_pull_request_diffs(index: int, filepath: str) -> List[Dict[str, str]
     Returns:
         List[Dict[str, str]]: A list of dictionaries with filename and content.
     """
-
-    # Load the JSON file
-    with open(filepath, "r") as f:
-        result = json.load(f)
-
-    # Extract the specific pull request by index
-    pull_request = result[index]
-
-    files_content = {}
-
-    # Apply diffs to the corresponding files
-    for timestamp, contents in pull_request["content"].items():
-        for content in contents:
-            filename = content["filename"]
-            diff = content["changes"]
-            # Use setdefault to initialize the file content if not present
-            files_content.setdefault(filename, "")
-            # Apply the diff to the file content
-            files_content[filename] = apply_diff(files_content[filename], diff)
-
-    # Construct the list of files with their contents using list comprehension
-    return [{"filename": filename, "content": content} for filename, content in files_content.items()]
-
+    return get_dataset_store(filepath).get_files(index)
@@ -1,9 +1,12 @@
 from urllib.parse import urlparse
-import requests
 from logger_setup import logger
+from patching import apply_patch
 import re
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-from typing import List, Dict
+from typing import Any, Hashable, List, Dict, Optional
 from datetime import datetime
 from uuid import UUID
 
@@ -42,40 +45,6 @@ def parse_github_pull_request_url(url: str) -> tuple[str, str, str]:
         raise ValueError('Invalid GitHub pull request URL.') from e
 
 
-def make_github_api_request(api_url:str , headers: dict) -> dict:
-    """
-    Makes a GET request to the GitHub API and handles possible errors.
-
-    Args:
-        api_url (str): The URL for the request to the GitHub API.
-        headers (dict): The headers for the request, including the authorization token.
-
-    Returns:
-        dict: The response data if the request is successful.
-
-    Raises:
-        Exception: If an error occurs corresponding to the processed status code.
-    """
-    try:
-        response = requests.get(api_url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as e:
-        status_code = e.response.status_code
-        if status_code == 403:
-            logger.error('GitHub API rate limit exceeded.')
-            raise Exception('GitHub API rate limit exceeded.') from e
-        elif status_code == 404:
-            logger.error('Pull request not found.')
-            raise Exception('Pull request not found.') from e
-        else:
-            logger.error(f'HTTP error occurred: {e}')
-            raise
-    except requests.exceptions.RequestException as e:
-        logger.error(f'HTTP request failed: {e}')
-        raise
-
-
 # def preprocessing_code_pr(code: list) -> list:
 #     """
 #     Processes a list of dictionaries representing files and their content in a pull request diff format.
@@ -132,6 +101,8 @@ def get_first_comment_date(comments: List[Dict]) -> datetime:
 def apply_diff(content, diff) -> str:
     """
     Apply a diff to the given content.
+    Hunks are verified and applied in one pass by patching.apply_patch. A patch with hunks whose context is not in
+    the content (e.g. the first patch of a file that existed before the pull request) is applied by position.
 
     Args:
     content (str): The original content before applying the diff.
@@ -140,30 +111,10 @@ def apply_diff(content, diff) -> str:
     Returns:
     str: The content after applying the diff.
     """
-    content_lines = content.splitlines()
-    diff_lines = diff.splitlines()
-
-    line_index = 0
-
-    for line in diff_lines:
-        if line.startswith('@@'):
-            # Parse the line number range from the diff header (e.g., @@ -0,0 +1,29 @@)
-            match = re.match(r'@@ -\d+(,\d+)? \+(\d+)(,\d+)? @@', line)
-            if match:
-                line_index = int(match.group(2)) - 1  # Starting index for the change
-        elif line.startswith('+'):
-            # Add a new line from the diff
-            content_lines.insert(line_index, "+"+line[1:])
-            line_index += 1
-        elif line.startswith('-'):
-            # Remove a line (if it exists at the specified index)
-            if line_index < len(content_lines):
-                content_lines.pop(line_index)
-        else:
-            # Move past unchanged lines in the diff
-            line_index += 1
-
-    return '\n'.join(content_lines)
+    result = apply_patch(content, diff)
+    if result.by_position:
+        logger.info(f"{len(result.failed_hunks)} hunks do not match the content, the patch was applied by position.")
+    return result.content
 
 
 def normalize_id(notion_id: str) -> str:
@@ -182,5 +133,97 @@ def normalize_id(notion_id: str) -> str:
         return notion_id  # Return as-is if length isn't valid for UUID
 
 
+def format_code_line(line_number: int, line: str) -> str:
+    """
+    Renders a diff line for the review prompt as "<line number> <marker>| <code>", e.g. "12 +| return x;".
+
+    Args:
+        line_number (int): Number of the line in the new version of the file.
+        line (str): The diff line, starting with "+", "-" or " ".
+
+    Returns:
+        str: The numbered line.
+    """
+    if line[:1] in ("+", "-", " "):
+        return f"{line_number} {line[0]}| {line[1:]}"
+    return f"{line_number}  | {line}"
+
+
+def parse_code_line_number(line: str) -> int:
+    """Returns the line number of a line rendered by format_code_line."""
+    return int(line.split(" ", 1)[0])
 
 
+def render_code(files: List[Dict[str, str]]) -> str:
+    """
+    Renders preprocessed files for the review prompt: a "### <filename>" header per file followed by its lines.
+
+    Args:
+        files (List[Dict[str, str]]): Output of tools.preprocessing_code_pr.
+
+    Returns:
+        str: The code as it is shown to the model.
+    """
+    return "\n\n".join(f"### {file['filename']}\n{file['content']}" for file in files)
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory cache with a time to live per entry and least recently used eviction.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 300):
+        """
+        Args:
+            max_entries (int): Maximum number of entries, the least recently used entry is evicted first.
+            ttl (float): Time in seconds after which an entry expires.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = {"hits": 0, "misses": 0}
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the cached value, or None if the key is missing or expired.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            Optional[Any]: The cached value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Removes an entry if it is cached.
+
+        Args:
+            key (Hashable): The cache key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Stores a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,453 @@
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from logger_setup import logger
+from comment_index import CommentIndex, dedupe_suggestions
+from utils import TTLCache, parse_github_pull_request_url
+
+load_dotenv()
+
+# pull_request actions that change the code under review
+REVIEWED_ACTIONS = ("opened", "synchronize", "reopened")
+
+# Pull requests whose posted comments are remembered, and for how long after their last review
+POSTED_COMMENTS_MAX_PULL_REQUESTS = int(os.getenv("POSTED_COMMENTS_MAX_PULL_REQUESTS", "1000"))
+POSTED_COMMENTS_TTL_SEC = int(os.getenv("POSTED_COMMENTS_TTL_DAYS", "14")) * 24 * 3600
+
+
+@dataclass
+class ReviewJob:
+    """A pull request review requested by a webhook delivery."""
+    delivery_id: str
+    action: str
+    pull_request_link: str
+    head_sha: str
+    author: str
+    changed_files: int
+
+
+def verify_signature(secret: str, body: bytes, signature_header: Optional[str]) -> bool:
+    """
+    Verifies the X-Hub-Signature-256 header of a webhook delivery.
+
+    Args:
+        secret (str): The webhook secret configured on GitHub.
+        body (bytes): The raw request body.
+        signature_header (Optional[str]): Value of the X-Hub-Signature-256 header.
+
+    Returns:
+        bool: True if the signature matches the body.
+    """
+    if not signature_header or not signature_header.startswith("sha256="):
+        return False
+    expected = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header)
+
+
+def parse_pull_request_event(event: str, payload: Dict, delivery_id: str) -> Optional[ReviewJob]:
+    """
+    Turns a webhook delivery into a review job.
+
+    Args:
+        event (str): Value of the X-GitHub-Event header.
+        payload (Dict): The decoded webhook payload.
+        delivery_id (str): Value of the X-GitHub-Delivery header.
+
+    Returns:
+        Optional[ReviewJob]: The review job, or None if the delivery does not need a review.
+    """
+    if event != "pull_request" or payload.get("action") not in REVIEWED_ACTIONS:
+        return None
+
+    pull_request = payload["pull_request"]
+    if pull_request.get("state") != "open" or pull_request.get("draft"):
+        return None
+
+    return ReviewJob(
+        delivery_id=delivery_id,
+        action=payload["action"],
+        pull_request_link=pull_request["html_url"],
+        head_sha=pull_request["head"]["sha"],
+        author=pull_request["user"]["login"],
+        changed_files=pull_request.get("changed_files", 0)
+    )
+
+
+def review_pull_request(job: ReviewJob) -> Dict:
+    """
+    Runs the review graph for a webhook job.
+    Notion ids of the task description are taken from NOTION_DB_ID and NOTION_DOC_ID.
+    The graph reviews the pull request as it is when the job runs, not the head of the delivery: a later push has
+    queued its own job, which supersedes this one.
+
+    Args:
+        job (ReviewJob): The review job.
+
+    Returns:
+        Dict: The graph output.
+    """
+    # Imported lazily, building the graph sets up the LLM clients
+    from agent_graph import graph
+
+    return graph.invoke({
+        "pull_request_link": job.pull_request_link,
+        "notion_db_id": os.getenv("NOTION_DB_ID"),
+        "notion_doc_id": os.getenv("NOTION_DOC_ID")
+    })
+
+
+def review_comment(suggestion: Dict) -> Dict:
+    """
+    Builds a comment of the GitHub pull request reviews API from an anchored suggestion
+    (see line_index.anchor_suggestions).
+
+    Args:
+        suggestion (Dict): The suggestion with its resolved "file" and "lines".
+
+    Returns:
+        Dict: The review comment.
+    """
+    start_line, line = suggestion["lines"][0], suggestion["lines"][-1]
+    comment = {
+        "path": suggestion["file"],
+        "line": line,
+        "side": "RIGHT",
+        "body": f"**{suggestion.get('title', '')}**\n\n{suggestion.get('suggestion', '')}"
+    }
+    if start_line != line:
+        comment["start_line"] = start_line
+        comment["start_side"] = "RIGHT"
+    return comment
+
+
+def post_review_comments(job: ReviewJob, result: Dict) -> None:
+    """
+    Posts the new comments of a review to the pull request as one GitHub review, a result sink of ReviewService.
+    The review is made on the latest commit of the pull request, the one the graph reviewed.
+
+    Args:
+        job (ReviewJob): The review job.
+        result (Dict): The graph output with "new_comments".
+    """
+    comments = result.get("new_comments") or []
+    if not comments:
+        logger.info(f"No new comments for {job.pull_request_link}.")
+        return
+
+    # Imported lazily like the graph, the client needs the GitHub API key
+    from github_client import GITHUB_API_URL, get_github_client
+
+    owner, repo, pull_number = parse_github_pull_request_url(job.pull_request_link)
+    get_github_client().post(f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pull_number}/reviews", {
+        "event": "COMMENT",
+        "comments": [review_comment(suggestion) for suggestion in comments]
+    })
+    logger.info(f"Posted {len(comments)} comments on {job.pull_request_link}.")
+
+
+def log_review_result(job: ReviewJob, result: Dict) -> None:
+    """
+    Logs the new comments of a review, the default result sink of ReviewService.
+
+    Args:
+        job (ReviewJob): The review job.
+        result (Dict): The graph output with "new_comments".
+    """
+    for suggestion in result.get("new_comments") or []:
+        logger.info(f"{job.pull_request_link} {suggestion.get('file')} {suggestion.get('lines')}: "
+                    f"{suggestion.get('title')} - {suggestion.get('suggestion')}")
+
+
+class ReviewService:
+    """
+    Queue of review jobs processed by a pool of worker threads.
+
+    Only the newest head SHA of a pull request is reviewed: jobs that were superseded by a later push while
+    waiting in the queue, and heads that were already reviewed, are skipped. Every result gets a "new_comments"
+    list without the comments already delivered for the pull request and is handed to the result sink (e.g.
+    post_review_comments); comments are remembered as delivered once the sink returns. What is remembered about
+    a pull request is dropped when it is closed.
+    """
+
+    def __init__(
+            self,
+            review_fn: Callable[[ReviewJob], Dict] = review_pull_request,
+            on_result: Callable[[ReviewJob, Dict], None] = log_review_result,
+            workers: int = 4,
+            max_queue: int = 100
+    ):
+        """
+        Args:
+            review_fn (Callable[[ReviewJob], Dict]): Function that reviews a pull request.
+            on_result (Callable[[ReviewJob, Dict], None]): Result sink, called with the job and the graph output
+                of every review, e.g. post_review_comments. A failing sink lets a redelivery retry the review.
+            workers (int): Number of worker threads.
+            max_queue (int): Maximum number of queued jobs, further jobs are rejected.
+        """
+        self.review_fn = review_fn
+        self.on_result = on_result
+        self.workers = workers
+        self.jobs: queue.Queue = queue.Queue(maxsize=max_queue)
+
+        self._latest_head: Dict[str, str] = {}
+        self._reviewed_head: Dict[str, str] = {}
+        # Pull request link -> CommentIndex, bounded and cleared when the pull request is closed
+        self._posted_comments = TTLCache(max_entries=POSTED_COMMENTS_MAX_PULL_REQUESTS, ttl=POSTED_COMMENTS_TTL_SEC)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def submit(self, job: ReviewJob) -> bool:
+        """
+        Queues a review job.
+
+        Args:
+            job (ReviewJob): The review job.
+
+        Returns:
+            bool: False if the queue is full.
+        """
+        # The job becomes the latest head only once it is queued: a rejected job must not supersede the queued one.
+        # The lock is held across both, so a worker cannot see the job before its head is recorded
+        with self._lock:
+            try:
+                self.jobs.put_nowait(job)
+            except queue.Full:
+                logger.error(f"Review queue is full, dropping delivery {job.delivery_id}.")
+                return False
+            self._latest_head[job.pull_request_link] = job.head_sha
+        logger.info(f"Queued review of {job.pull_request_link} at {job.head_sha} ({job.action}).")
+        return True
+
+    def forget(self, pull_request_link: str) -> None:
+        """
+        Drops what is remembered about a pull request, called when it is closed.
+
+        Args:
+            pull_request_link (str): Link to the pull request.
+        """
+        with self._lock:
+            self._latest_head.pop(pull_request_link, None)
+            self._reviewed_head.pop(pull_request_link, None)
+            self._posted_comments.delete(pull_request_link)
+
+    def start(self) -> None:
+        """Starts the worker threads."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"review-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Waits for the queued jobs and stops the worker threads."""
+        for _ in self._threads:
+            self.jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self) -> None:
+        """Worker loop, reviews queued jobs until it receives None."""
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                self._process(job)
+            finally:
+                self.jobs.task_done()
+
+    def _process(self, job: ReviewJob) -> None:
+        """Reviews a job unless it is stale or its head was already reviewed."""
+        with self._lock:
+            if self._latest_head.get(job.pull_request_link) != job.head_sha:
+                logger.info(f"Skipping {job.pull_request_link} at {job.head_sha}, superseded by a newer push.")
+                return
+            if self._reviewed_head.get(job.pull_request_link) == job.head_sha:
+                logger.info(f"Skipping {job.pull_request_link} at {job.head_sha}, already reviewed.")
+                return
+            self._reviewed_head[job.pull_request_link] = job.head_sha
+
+        if job.changed_files == 0:
+            logger.info(f"Skipping {job.pull_request_link}, no changed files.")
+            return
+
+        try:
+            result = self.review_fn(job) or {}
+            suggestions = (result.get("filtered_comments") or {}).get("suggestions", [])
+            with self._lock:
+                posted = self._posted_comments.get(job.pull_request_link)
+            result["new_comments"] = [
+                suggestion for suggestion in dedupe_suggestions(suggestions)
+                if posted is None or suggestion not in posted
+            ]
+            self.on_result(job, result)
+
+            # Comments count as posted only once the sink accepted them, a failed post is repeated by the next review
+            with self._lock:
+                posted = self._posted_comments.get(job.pull_request_link)
+                if posted is None:
+                    posted = CommentIndex()
+                for suggestion in result["new_comments"]:
+                    posted.add(suggestion)
+                # Stored again to restart its time to live
+                self._posted_comments.set(job.pull_request_link, posted)
+            logger.info(f"Reviewed {job.pull_request_link} at {job.head_sha}.")
+        except Exception as e:
+            logger.error(f"Review of {job.pull_request_link} failed: {e}")
+            with self._lock:
+                # Allow a redelivery of the same head to retry the review
+                if self._reviewed_head.get(job.pull_request_link) == job.head_sha:
+                    del self._reviewed_head[job.pull_request_link]
+
+
+def make_handler(secret: str, service: ReviewService) -> type:
+    """
+    Creates the request handler class for the webhook endpoint.
+
+    Args:
+        secret (str): The webhook secret configured on GitHub.
+        service (ReviewService): Service the review jobs are submitted to.
+
+    Returns:
+        type: A BaseHTTPRequestHandler subclass.
+    """
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            if not verify_signature(secret, body, self.headers.get("X-Hub-Signature-256")):
+                logger.warning("Webhook delivery with an invalid signature rejected.")
+                self._respond(401, "invalid signature")
+                return
+
+            try:
+                payload = json.loads(body)
+            except json.JSONDecodeError:
+                self._respond(400, "invalid JSON")
+                return
+
+            job = parse_pull_request_event(
+                self.headers.get("X-GitHub-Event", ""), payload, self.headers.get("X-GitHub-Delivery", "")
+            )
+            if (self.headers.get("X-GitHub-Event") == "pull_request" and payload.get("action") == "closed"
+                    and payload.get("pull_request", {}).get("html_url")):
+                service.forget(payload["pull_request"]["html_url"])
+                self._respond(200, "forgotten")
+            elif job is None:
+                self._respond(200, "ignored")
+            elif service.submit(job):
+                self._respond(202, "queued")
+            else:
+                self._respond(503, "queue full")
+
+        def _respond(self, status: int, message: str) -> None:
+            data = message.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.info("Webhook: " + format % args)
+
+    return WebhookHandler
+
+
+def make_server(host: str, port: int, secret: str, service: ReviewService) -> ThreadingHTTPServer:
+    """
+    Creates the webhook HTTP server.
+
+    Args:
+        host (str): Interface to listen on.
+        port (int): Port to listen on.
+        secret (str): The webhook secret configured on GitHub.
+        service (ReviewService): Service the review jobs are submitted to.
+
+    Returns:
+        ThreadingHTTPServer: The server, not yet serving.
+    """
+    return ThreadingHTTPServer((host, port), make_handler(secret, service))
+
+
+def replay_payload(path: str, url: str, secret: str, event: str = "pull_request") -> requests.Response:
+    """
+    Posts a recorded webhook payload to a running webhook server, signed like a GitHub delivery.
+
+    Args:
+        path (str): Path to the JSON payload.
+        url (str): URL of the webhook endpoint, e.g. http://localhost:8080/.
+        secret (str): The webhook secret the server was started with.
+        event (str): Value of the X-GitHub-Event header.
+
+    Returns:
+        requests.Response: The server response.
+    """
+    with open(path, "rb") as f:
+        body = f.read()
+
+    signature = "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    headers = {
+        "Content-Type": "application/json",
+        "X-GitHub-Event": event,
+        "X-GitHub-Delivery": f"replay-{os.path.basename(path)}",
+        "X-Hub-Signature-256": signature
+    }
+    return requests.post(url, data=body, headers=headers, timeout=30)
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="GitHub webhook receiver for pull request reviews.")
+    subparsers = arg_parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the webhook server.")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--workers", type=int, default=4)
+    serve_parser.add_argument("--post-comments", action="store_true",
+                              help="Post the new comments to the pull request instead of logging them.")
+
+    replay_parser = subparsers.add_parser("replay", help="Post a recorded payload to a running server.")
+    replay_parser.add_argument("payload")
+    replay_parser.add_argument("--url", default="http://localhost:8080/")
+    replay_parser.add_argument("--event", default="pull_request")
+
+    args = arg_parser.parse_args()
+
+    webhook_secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not webhook_secret:
+        logger.error("GITHUB_WEBHOOK_SECRET not found in environment variables.")
+        raise EnvironmentError("GITHUB_WEBHOOK_SECRET not found in environment variables.")
+
+    if args.command == "serve":
+        # Build the review chains and open the OpenAI connection before the first delivery arrives
+        from llm_registry import warm_up
+        warm_up()
+
+        review_service = ReviewService(
+            on_result=post_review_comments if args.post_comments else log_review_result,
+            workers=args.workers
+        )
+        review_service.start()
+        server = make_server(args.host, args.port, webhook_secret, review_service)
+        logger.info(f"Webhook server listening on {args.host}:{args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+            review_service.stop()
+    else:
+        reply = replay_payload(args.payload, args.url, webhook_secret, args.event)
+        print(reply.status_code, reply.text)